@@ -1,17 +1,280 @@
 # artifacts.py
-import os, uuid
+"""
+Store d'artefacts adressé par contenu (sha256).
+
+- objets dans artifacts/cas/<2 premiers hex>/<sha256>, métadonnées à côté (<sha256>.json)
+- écriture en streaming depuis un objet fichier (gzip optionnel), dédup des contenus identiques
+- métadonnées : size, content_type, created_at, last_access
+- GC en tâche de fond : âge max depuis le dernier accès, puis budget total (LRU).
+  Pas de comptage de références : les exécutions vivent en mémoire et ne libèrent
+  jamais leurs artefacts, seuls les quotas décident. Un lecteur qui tient à un
+  objet (cache de résultats) le garde frais avec touch().
+"""
+from __future__ import annotations
+import hashlib, io, json, mimetypes, os, re, tempfile, threading, time, zlib
 from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+from settings import settings
 
 _BASE = Path(__file__).resolve().parent / "artifacts"
 _BASE.mkdir(parents=True, exist_ok=True)
+_CAS = _BASE / "cas"
+_CAS.mkdir(parents=True, exist_ok=True)
+_TMP = _BASE / "tmp"
+_TMP.mkdir(parents=True, exist_ok=True)
+
+_COPY_BUF = 1024 * 1024
+# formats déjà compressés : inutile de les repasser dans gzip
+_NO_COMPRESS = {".gz", ".zip", ".jar", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".br", ".zst"}
+_SHA_RE = re.compile(r"^[0-9a-f]{64}$")
+_META_LOCK = threading.Lock()
+_gc_thread: Optional[threading.Thread] = None
+
+def _obj_path(sha: str) -> Path:
+    return _CAS / sha[:2] / sha
+
+def _meta_path(sha: str) -> Path:
+    return _CAS / sha[:2] / f"{sha}.json"
+
+def _read_meta(sha: str) -> Optional[Dict]:
+    try:
+        return json.loads(_meta_path(sha).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _write_meta(sha: str, meta: Dict) -> None:
+    p = _meta_path(sha)
+    tmp = p.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, p)
+
+def _guess_type(suffix: str, content_type: Optional[str]) -> str:
+    if content_type:
+        return content_type
+    return mimetypes.guess_type(f"x{suffix}")[0] or "application/octet-stream"
+
+def save_stream(src: BinaryIO, suffix: str = "", content_type: Optional[str] = None, compress: bool = False) -> str:
+    """
+    Copie src par blocs dans le store en calculant le sha256 au fil de l'eau.
+    compress=True stocke le contenu en gzip (servi avec Content-Encoding: gzip) ;
+    l'en-tête gzip n'a pas de mtime, donc la dédup reste valable.
+    Si le contenu existe déjà, le fichier temporaire est jeté et last_access rafraîchi.
+    Renvoie l'identifiant (sha256 hex).
+    """
+    h = hashlib.sha256()
+    size = raw_size = 0
+    z = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    fd, tmp_name = tempfile.mkstemp(dir=_TMP)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                buf = src.read(_COPY_BUF)
+                if not buf:
+                    break
+                raw_size += len(buf)
+                if z:
+                    buf = z.compress(buf)
+                h.update(buf)
+                out.write(buf)
+                size += len(buf)
+            if z:
+                buf = z.flush()
+                h.update(buf)
+                out.write(buf)
+                size += len(buf)
+        sha = h.hexdigest()
+        now = time.time()
+        with _META_LOCK:
+            meta = _read_meta(sha)
+            if meta and _obj_path(sha).exists():
+                meta["last_access"] = now
+                _write_meta(sha, meta)
+                return sha
+            _obj_path(sha).parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_name, _obj_path(sha))
+            tmp_name = None
+            _write_meta(sha, {
+                "id": sha,
+                "size": size,
+                "content_type": _guess_type(suffix, content_type),
+                "suffix": suffix,
+                "encoding": "gzip" if compress else None,
+                "raw_size": raw_size,
+                "created_at": now,
+                "last_access": now,
+            })
+            return sha
+    finally:
+        if tmp_name:
+            try: os.unlink(tmp_name)
+            except FileNotFoundError: pass
+
+def save_file(path: str, suffix: Optional[str] = None, content_type: Optional[str] = None, compress: bool = False) -> str:
+    with open(path, "rb") as f:
+        return save_stream(f, suffix=Path(path).suffix if suffix is None else suffix,
+                           content_type=content_type, compress=compress)
+
+def save_bytes(data: bytes, suffix: str = "", content_type: Optional[str] = None, compress: bool = False) -> str:
+    return save_stream(io.BytesIO(data), suffix=suffix, content_type=content_type, compress=compress)
+
+def register_file(path: str, name: Optional[str] = None, compress: bool = True) -> Dict:
+    """
+    Ingère un fichier produit par un runner (avant nettoyage du workspace) et
+    renvoie l'entrée d'artefact à poser sur l'exécution : {name,url,size,...}.
+    """
+    suffix = Path(path).suffix.lower()
+    art_id = save_file(path, compress=compress and suffix not in _NO_COMPRESS)
+    meta = stat(art_id)
+    return {
+        "name": name or Path(path).name,
+        "url": f"/artifact/{art_id}",
+        "artifact_id": art_id,
+        "size": meta.get("raw_size", meta["size"]),
+        "stored_size": meta["size"],
+        "content_type": meta["content_type"],
+    }
 
-def save_bytes(data: bytes, suffix: str = "") -> str:
-    name = f"{uuid.uuid4().hex}{suffix}"
-    (_BASE / name).write_bytes(data)
-    return name
+def register_dir(root: str, prefix: str = "", compress: bool = True) -> List[Dict]:
+    """register_file sur tous les fichiers de root (récursif), noms relatifs à root."""
+    out: List[Dict] = []
+    if not os.path.isdir(root):
+        return out
+    for dirpath, _dirs, files in os.walk(root):
+        for fn in sorted(files):
+            full = os.path.join(dirpath, fn)
+            rel = os.path.relpath(full, root).replace(os.sep, "/")
+            out.append(register_file(full, name=f"{prefix}{rel}", compress=compress))
+    return out
+
+def _normalize_id(artifact_id: str) -> str:
+    # "<sha>.xml" est accepté : l'extension n'est qu'un confort pour le navigateur
+    return (artifact_id or "").split(".", 1)[0].lower()
+
+def stat(artifact_id: str) -> Dict:
+    """Métadonnées d'un artefact ; FileNotFoundError si absent."""
+    sha = _normalize_id(artifact_id)
+    if _SHA_RE.match(sha):
+        meta = _read_meta(sha)
+        if meta and _obj_path(sha).exists():
+            return meta
+        raise FileNotFoundError(artifact_id)
+    # anciens artefacts (noms uuid à plat dans artifacts/)
+    p = open_path(artifact_id)
+    st = p.stat()
+    return {"id": artifact_id, "size": st.st_size, "content_type": _guess_type(p.suffix, None),
+            "suffix": p.suffix, "created_at": st.st_mtime, "last_access": st.st_mtime}
 
 def open_path(artifact_id: str) -> Path:
-    p = _BASE / artifact_id
-    if not p.exists():
+    sha = _normalize_id(artifact_id)
+    if _SHA_RE.match(sha):
+        p = _obj_path(sha)
+    else:
+        if "/" in artifact_id or "\\" in artifact_id or artifact_id.startswith("."):
+            raise FileNotFoundError(artifact_id)
+        p = _BASE / artifact_id
+    if not p.is_file():
         raise FileNotFoundError(artifact_id)
     return p
+
+def touch(artifact_id: str) -> None:
+    sha = _normalize_id(artifact_id)
+    if not _SHA_RE.match(sha):
+        return
+    with _META_LOCK:
+        meta = _read_meta(sha)
+        if meta:
+            meta["last_access"] = time.time()
+            _write_meta(sha, meta)
+
+def iter_range(artifact_id: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """Lit les octets [start, end] (end inclus) par blocs."""
+    p = open_path(artifact_id)
+    last = p.stat().st_size - 1 if end is None else end
+    with open(p, "rb") as f:
+        f.seek(start)
+        remaining = last - start + 1
+        while remaining > 0:
+            buf = f.read(min(_COPY_BUF, remaining))
+            if not buf:
+                break
+            remaining -= len(buf)
+            yield buf
+
+def iter_decoded(artifact_id: str) -> Iterator[bytes]:
+    """Contenu d'un artefact gzip décompressé au fil de l'eau (clients sans Accept-Encoding: gzip)."""
+    z = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for buf in iter_range(artifact_id):
+        out = z.decompress(buf)
+        if out:
+            yield out
+    tail = z.flush()
+    if tail:
+        yield tail
+
+def read_bytes(artifact_id: str) -> bytes:
+    """Contenu décompressé d'un artefact (petits objets uniquement : logs, rapports)."""
+    data = open_path(artifact_id).read_bytes()
+    if stat(artifact_id).get("encoding") == "gzip":
+        data = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    return data
+
+def _delete(sha: str) -> None:
+    for p in (_obj_path(sha), _meta_path(sha)):
+        try: p.unlink()
+        except FileNotFoundError: pass
+
+def gc(max_bytes: Optional[int] = None, max_age_s: Optional[float] = None) -> Dict[str, int]:
+    """
+    Passe de GC : supprime les objets dont le dernier accès dépasse l'âge max,
+    puis les moins récemment utilisés jusqu'à revenir sous le budget total.
+    """
+    budget = settings.ARTIFACT_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    max_age = settings.ARTIFACT_MAX_AGE_DAYS * 86400 if max_age_s is None else max_age_s
+    now = time.time()
+    stats = {"expired": 0, "evicted": 0, "total_bytes": 0}
+    with _META_LOCK:
+        metas = []
+        for sub in _CAS.iterdir():
+            if not sub.is_dir():
+                continue
+            for mp in sub.glob("*.json"):
+                meta = _read_meta(mp.stem)
+                if meta:
+                    metas.append(meta)
+        alive = []
+        for m in metas:
+            if max_age > 0 and now - float(m.get("last_access") or m.get("created_at") or now) > max_age:
+                _delete(m["id"]); stats["expired"] += 1
+            else:
+                alive.append(m)
+        total = sum(int(m.get("size", 0)) for m in alive)
+        if budget > 0 and total > budget:
+            for m in sorted(alive, key=lambda m: float(m.get("last_access") or 0)):
+                if total <= budget:
+                    break
+                _delete(m["id"]); total -= int(m.get("size", 0)); stats["evicted"] += 1
+        stats["total_bytes"] = total
+    # temporaires orphelins (crash pendant une écriture)
+    for t in _TMP.iterdir():
+        try:
+            if now - t.stat().st_mtime > 3600:
+                t.unlink()
+        except FileNotFoundError:
+            pass
+    return stats
+
+def _gc_loop() -> None:
+    while True:
+        time.sleep(max(1, settings.ARTIFACT_GC_INTERVAL_S))
+        try:
+            gc()
+        except Exception as e:
+            print("ERROR artifacts.gc:", repr(e))
+
+def start_gc() -> None:
+    """Démarre (une seule fois) le thread de GC en arrière-plan."""
+    global _gc_thread
+    if _gc_thread is None or not _gc_thread.is_alive():
+        _gc_thread = threading.Thread(target=_gc_loop, name="artifacts-gc", daemon=True)
+        _gc_thread.start()
@@ -1,27 +1,178 @@
-import re, time
+import queue, random, re, threading, time
+from datetime import datetime
+from typing import Dict, List, Optional
 from fastapi import Request
-from database import db
+from pymongo import ASCENDING
+from database import db, ensure_ttl_index
+from metrics import gauge
+from settings import settings
 
 PII_RE = re.compile(r"(?i)(password|secret|token|api_key|bearer\s+[a-z0-9\-_.=]+)")
 
+audit_col = db["audit_logs"]
+
+# File bornée + écriture par lots en tâche de fond : la requête ne paie plus
+# l'aller-retour Mongo, seulement un put_nowait.
+_queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max(1, settings.AUDIT_QUEUE_MAX))
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_start_lock = threading.Lock()
+_stats = {"enqueued": 0, "written": 0, "dropped": 0, "sampled_out": 0, "batches": 0, "flush_errors": 0,
+          "failed": 0, "backfilled": 0, "last_error": None}
+_STATS_LOCK = threading.Lock()  # compteurs incrémentés par les requêtes et par le writer
+_routes: Dict[int, str] = {}
+UNMATCHED = "(non routé)"
+
 def mask_pii(s: str) -> str:
     if not s: return s
     return PII_RE.sub("[REDACTED]", s)
 
+def ensure_indexes() -> None:
+    audit_col.create_index([("ts", ASCENDING)])
+    ensure_ttl_index(audit_col, "created_at", settings.AUDIT_TTL_DAYS * 86400)
+
+def _count(key: str, amount: int = 1) -> None:
+    with _STATS_LOCK:
+        _stats[key] += amount
+
+# Documents antérieurs à l'index TTL : sans `created_at`, le TTL ne les purge jamais.
+# Rattrapage par lots depuis `ts` (secondes epoch), entre deux écritures du writer.
+_BACKFILL_BATCH = 1000
+_CREATED_FROM_TS = [{"$set": {"created_at": {"$ifNull": [{"$toDate": {"$multiply": ["$ts", 1000]}}, "$$NOW"]}}}]
+
+def _backfill_batch() -> int:
+    """Pose created_at sur un lot d'anciens documents ; 0 quand il n'en reste plus."""
+    ids = [d["_id"] for d in audit_col.find({"created_at": {"$exists": False}}, {"_id": 1}).limit(_BACKFILL_BATCH)]
+    if ids:
+        audit_col.update_many({"_id": {"$in": ids}}, _CREATED_FROM_TS)
+        _count("backfilled", len(ids))
+    return len(ids)
+
+def route_template(request: Request) -> str:
+    """
+    Gabarit de la route résolue ("/executions/{exec_id}") plutôt que le chemin brut :
+    cardinalité bornée pour les agrégats. Les chemins sans route sont regroupés.
+    """
+    endpoint = request.scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED
+    tpl = _routes.get(id(endpoint))
+    if tpl is None:
+        app = request.scope.get("app")
+        for r in getattr(app, "routes", None) or []:
+            ep = getattr(r, "endpoint", None) or getattr(r, "app", None)
+            if ep is not None:
+                _routes.setdefault(id(ep), getattr(r, "path", "") or UNMATCHED)
+        tpl = _routes.get(id(endpoint), UNMATCHED)
+    return tpl
+
+def _flush(batch: List[Dict]) -> None:
+    if not batch:
+        return
+    try:
+        audit_col.insert_many(batch, ordered=False)
+        _count("written", len(batch))
+        _count("batches")
+    except Exception as e:
+        # un seul nouvel essai : l'audit ne doit pas bloquer le flusher indéfiniment
+        try:
+            audit_col.insert_many(batch, ordered=False)
+            _count("written", len(batch))
+            _count("batches")
+        except Exception:
+            _count("flush_errors")
+            _count("failed", len(batch))
+            if _stats["last_error"] != repr(e):
+                print("ERROR audit flush:", repr(e))
+            _stats["last_error"] = repr(e)
+
+def _run() -> None:
+    size = max(1, settings.AUDIT_BATCH_SIZE)
+    interval = max(0.05, settings.AUDIT_FLUSH_INTERVAL_S)
+    try:
+        ensure_indexes()
+    except Exception as e:
+        print("ERROR audit indexes:", repr(e))
+    backfill = True
+    while not _stop.is_set() or not _queue.empty():
+        batch: List[Dict] = []
+        deadline = time.monotonic() + interval
+        while len(batch) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _flush(batch)
+        if backfill and not _stop.is_set():
+            try:
+                backfill = _backfill_batch() > 0
+            except Exception as e:
+                backfill = False
+                print("ERROR audit backfill:", repr(e))
+
+def start() -> None:
+    global _thread
+    with _start_lock:
+        if _thread and _thread.is_alive():
+            return
+        _stop.clear()
+        _thread = threading.Thread(target=_run, name="audit-writer", daemon=True)
+        _thread.start()
+
+def stop(timeout: float = 10.0) -> None:
+    """Vide la file (arrêt de l'API)."""
+    _stop.set()
+    if _thread:
+        _thread.join(timeout)
+
+def record(doc: Dict) -> bool:
+    """
+    Met un enregistrement en file. Politique de débordement (AUDIT_OVERFLOW) :
+    - "drop"   : file pleine -> enregistrement perdu (compté) ;
+    - "sample" : au-delà de 80 % de remplissage, on n'en garde qu'un sur
+                 AUDIT_SAMPLE_EVERY (avec le poids "sample" pour les agrégats),
+                 puis drop si la file est pleine.
+    """
+    if _thread is None:
+        start()
+    if settings.AUDIT_OVERFLOW == "sample" and _queue.qsize() >= 0.8 * _queue.maxsize:
+        n = max(1, settings.AUDIT_SAMPLE_EVERY)
+        if random.random() >= 1.0 / n:
+            _count("sampled_out")
+            return False
+        doc["sample"] = n
+    try:
+        _queue.put_nowait(doc)
+        _count("enqueued")
+        return True
+    except queue.Full:
+        _count("dropped")
+        return False
+
+def stats() -> Dict:
+    with _STATS_LOCK:
+        counters = dict(_stats)
+    return {**counters, "queued": _queue.qsize(), "capacity": _queue.maxsize, "policy": settings.AUDIT_OVERFLOW,
+            "running": bool(_thread and _thread.is_alive())}
+
+gauge("audit_queue_depth", "Enregistrements d'audit en attente d'écriture", _queue.qsize)
+
 async def audit_middleware(request: Request, call_next):
-    start = time.time()
+    start_t = time.time()
     resp = await call_next(request)
-    duration = time.time() - start
-    try:
-        db["audit_logs"].insert_one({
-            "ts": time.time(),
-            "ip": request.client.host if request.client else None,
-            "method": request.method,
-            "path": request.url.path,
-            "status": resp.status_code,
-            "ua": mask_pii(request.headers.get("user-agent","")),
-            "dur_ms": int(duration*1000),
-        })
-    except Exception:
-        pass
+    duration = time.time() - start_t
+    record({
+        "ts": time.time(),
+        "created_at": datetime.utcnow(),
+        "ip": request.client.host if request.client else None,
+        "method": request.method,
+        "path": request.url.path,
+        "route": route_template(request),
+        "status": resp.status_code,
+        "ua": mask_pii(request.headers.get("user-agent","")),
+        "dur_ms": round(duration*1000, 2),
+    })
     return resp
@@ -0,0 +1,225 @@
+# backend/baselines.py
+"""
+Baselines de tirs de charge et détection automatique de régression.
+
+Une baseline est épinglée par scénario (kind + simulation/jmx, ou params["scenario"]).
+Chaque nouveau tir du même scénario est comparé à la baseline :
+- percentiles / débit / taux d'erreur vs tolérances configurables ;
+- test de Mann-Whitney sur les histogrammes de latence (décalage significatif ?) ;
+- test z à deux proportions sur le taux d'erreur.
+Un écart n'est retenu que s'il dépasse la tolérance ET est significatif.
+"""
+from __future__ import annotations
+import math
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from database import db
+from exec_store import get_execution, update_execution
+from load_report import LatencyHistogram, load_histograms
+from settings import settings
+
+baselines_col = db["load_baselines"]
+
+_LATENCY_KEYS = ("p50", "p95", "p99")
+
+def default_tolerances() -> Dict[str, float]:
+    return {
+        "latency_pct": settings.LOAD_TOL_LATENCY_PCT,
+        "throughput_pct": settings.LOAD_TOL_THROUGHPUT_PCT,
+        "error_rate_abs": settings.LOAD_TOL_ERROR_RATE_ABS,
+        "alpha": settings.LOAD_STAT_ALPHA,
+    }
+
+def scenario_key(rec: Dict) -> str:
+    params = rec.get("params") or {}
+    if params.get("scenario"):
+        return str(params["scenario"])
+    target = params.get("simulation") or params.get("jmx") or "default"
+    return f"{rec.get('kind')}:{target}"
+
+# ============================
+# 1) Tests statistiques sur histogrammes
+# ============================
+
+def mann_whitney(base: LatencyHistogram, cur: LatencyHistogram) -> Optional[Dict]:
+    """
+    U de Mann-Whitney calculé directement sur les buckets (rangs moyens pour
+    les ex æquo, correction de variance). z > 0 : le tir courant est plus lent.
+    """
+    n1, n2 = base.count, cur.count
+    if not n1 or not n2:
+        return None
+    a = dict(base.buckets())
+    b = dict(cur.buckets())
+    rank = 0
+    r2 = 0.0
+    ties = 0.0
+    for v in sorted(set(a) | set(b)):
+        ca, cb = a.get(v, 0), b.get(v, 0)
+        t = ca + cb
+        r2 += cb * (rank + (t + 1) / 2.0)
+        ties += t ** 3 - t
+        rank += t
+    n = n1 + n2
+    u2 = r2 - n2 * (n2 + 1) / 2.0
+    mean = n1 * n2 / 2.0
+    var = n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1) if n > 1 else 1))
+    if var <= 0:
+        return {"u": u2, "z": 0.0, "p_value": 1.0, "prob_slower": 0.5}
+    z = (u2 - mean) / math.sqrt(var)
+    return {"u": u2, "z": round(z, 4), "p_value": math.erfc(abs(z) / math.sqrt(2)),
+            "prob_slower": round(u2 / (n1 * n2), 4)}
+
+def two_proportions(e1: int, n1: int, e2: int, n2: int) -> Optional[Dict]:
+    if not n1 or not n2:
+        return None
+    p = (e1 + e2) / (n1 + n2)
+    se = math.sqrt(p * (1 - p) * (1 / n1 + 1 / n2))
+    if se == 0:
+        return {"z": 0.0, "p_value": 1.0}
+    z = (e2 / n2 - e1 / n1) / se
+    return {"z": round(z, 4), "p_value": math.erfc(abs(z) / math.sqrt(2))}
+
+# ============================
+# 2) Comparaison
+# ============================
+
+def _pct(base: Optional[float], cur: Optional[float]) -> Optional[float]:
+    if base is None or cur is None or base == 0:
+        return None
+    return round((cur - base) / base * 100.0, 2)
+
+def _compare_stats(b: Dict, c: Dict, hb: Optional[LatencyHistogram], hc: Optional[LatencyHistogram],
+                   tol: Dict) -> Tuple[str, Dict]:
+    alpha = tol["alpha"]
+    out: Dict = {"metrics": {}}
+    regressed = improved = False
+
+    mw = mann_whitney(hb, hc) if hb is not None and hc is not None else None
+    out["latency_test"] = mw
+    lat_significant = mw is None or mw["p_value"] < alpha
+    for k in _LATENCY_KEYS:
+        bv, cv = (b.get("percentiles_ms") or {}).get(k), (c.get("percentiles_ms") or {}).get(k)
+        d = _pct(bv, cv)
+        flag = None
+        if d is not None and lat_significant:
+            if d > tol["latency_pct"]:
+                flag, regressed = "regressed", True
+            elif d < -tol["latency_pct"]:
+                flag, improved = "improved", True
+        out["metrics"][k] = {"baseline": bv, "current": cv, "delta_pct": d, "flag": flag}
+
+    d = _pct(b.get("throughput_rps"), c.get("throughput_rps"))
+    flag = None
+    if d is not None:
+        if d < -tol["throughput_pct"]:
+            flag, regressed = "regressed", True
+        elif d > tol["throughput_pct"]:
+            flag, improved = "improved", True
+    out["metrics"]["throughput_rps"] = {"baseline": b.get("throughput_rps"), "current": c.get("throughput_rps"),
+                                        "delta_pct": d, "flag": flag}
+
+    be, ce = b.get("error_rate") or 0.0, c.get("error_rate") or 0.0
+    pt = two_proportions(b.get("errors") or 0, b.get("count") or 0, c.get("errors") or 0, c.get("count") or 0)
+    out["error_test"] = pt
+    delta = round(ce - be, 6)
+    flag = None
+    if pt is None or pt["p_value"] < alpha:
+        if delta > tol["error_rate_abs"]:
+            flag, regressed = "regressed", True
+        elif delta < -tol["error_rate_abs"]:
+            flag, improved = "improved", True
+    out["metrics"]["error_rate"] = {"baseline": be, "current": ce, "delta_abs": delta, "flag": flag}
+
+    verdict = "regressed" if regressed else ("improved" if improved else "pass")
+    return verdict, out
+
+def compare_reports(base_doc: Dict, report: Dict, cur_hists=None) -> Dict:
+    tol = {**default_tolerances(), **(base_doc.get("tolerances") or {})}
+    base_report = base_doc.get("report") or {}
+    bh = base_doc.get("histograms") or {}
+    hb_overall = LatencyHistogram.from_dict(bh["overall"]) if bh.get("overall") else None
+    hb_labels = {k: LatencyHistogram.from_dict(v) for k, v in (bh.get("labels") or {}).items()}
+    hc_overall, hc_labels = cur_hists if cur_hists else (None, {})
+
+    verdict, overall = _compare_stats(base_report.get("overall") or {}, report.get("overall") or {},
+                                      hb_overall, hc_overall, tol)
+    labels = {}
+    for name, cur in (report.get("labels") or {}).items():
+        base = (base_report.get("labels") or {}).get(name)
+        if not base:
+            continue
+        v, detail = _compare_stats(base, cur, hb_labels.get(name), hc_labels.get(name), tol)
+        labels[name] = {"verdict": v, **detail}
+    # une régression sur un sampler suffit à marquer le tir
+    if verdict != "regressed" and any(l["verdict"] == "regressed" for l in labels.values()):
+        verdict = "regressed"
+    return {
+        "scenario": base_doc.get("scenario"),
+        "baseline_exec_id": base_doc.get("exec_id"),
+        "tolerances": tol,
+        "verdict": verdict,
+        "overall": overall,
+        "labels": labels,
+        "compared_at": datetime.utcnow().isoformat() + "Z",
+    }
+
+# ============================
+# 3) Gestion des baselines
+# ============================
+
+def _to_api(doc: Optional[Dict]) -> Optional[Dict]:
+    if not doc:
+        return None
+    out = {k: v for k, v in doc.items() if k not in ("_id", "histograms")}
+    if isinstance(out.get("pinned_at"), datetime):
+        out["pinned_at"] = out["pinned_at"].isoformat()
+    return out
+
+def pin_baseline(exec_id: str, tolerances: Optional[Dict] = None) -> Dict:
+    """Épingle une exécution comme baseline de son scénario (remplace la précédente)."""
+    rec = get_execution(exec_id)
+    if not rec:
+        raise KeyError(exec_id)
+    report = rec.get("load_report")
+    if not report:
+        raise ValueError("Exécution sans rapport de charge")
+    scenario = scenario_key(rec)
+    hists = load_histograms(report)
+    doc = {
+        "scenario": scenario,
+        "exec_id": exec_id,
+        "kind": rec.get("kind"),
+        "report": report,
+        # copie des histogrammes : la baseline ne doit pas dépendre du GC des artefacts
+        "histograms": {"overall": hists[0].to_dict(), "labels": {k: h.to_dict() for k, h in hists[1].items()}} if hists else None,
+        "tolerances": {k: float(v) for k, v in (tolerances or {}).items() if v is not None},
+        "pinned_at": datetime.utcnow(),
+    }
+    # ancienne baseline renvoyée par le remplacement : son exécution perd le marqueur
+    old = baselines_col.find_one_and_replace({"scenario": scenario}, doc, projection={"exec_id": 1}, upsert=True)
+    if old and old.get("exec_id") != exec_id:
+        update_execution(old["exec_id"], is_baseline=False)
+    update_execution(exec_id, is_baseline=True)
+    return _to_api(doc)
+
+def get_baseline(scenario: str) -> Optional[Dict]:
+    return baselines_col.find_one({"scenario": scenario})
+
+def list_baselines() -> List[Dict]:
+    return [_to_api(d) for d in baselines_col.find({}, {"histograms": 0}).sort("pinned_at", -1)]
+
+def evaluate_execution(exec_id: str, cur_hists=None) -> Optional[Dict]:
+    """Compare une exécution à la baseline de son scénario et pose le verdict."""
+    rec = get_execution(exec_id)
+    if not rec or not rec.get("load_report"):
+        return None
+    base = get_baseline(scenario_key(rec))
+    if not base or base.get("exec_id") == exec_id:
+        return None
+    if cur_hists is None:
+        cur_hists = load_histograms(rec["load_report"])
+    cmp = compare_reports(base, rec["load_report"], cur_hists)
+    update_execution(exec_id, perf_verdict=cmp["verdict"], baseline_comparison=cmp)
+    return cmp
@@ -0,0 +1,190 @@
+# backend/bench.py
+"""
+Micro-benchmarks ad hoc (pas de suite de tests dans le dépôt) :
+    python bench.py audit [n]
+    python bench.py metrics [n]
+    python bench.py rate_limit [n]
+"""
+from __future__ import annotations
+import asyncio, functools, statistics, sys, time
+from typing import Callable, Dict
+
+def _timeit(fn: Callable[[], None], n: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    samples.sort()
+    return {"n": n, "mean_us": round(statistics.fmean(samples), 2), "p50_us": round(samples[n // 2], 2),
+            "p99_us": round(samples[int(n * 0.99) - 1], 2)}
+
+_RTT_S = 0.0005  # aller-retour Mongo simulé (réseau local)
+
+class _SlowCollection:
+    """Collection en mémoire qui paie _RTT_S par appel : mesure reproductible sans serveur."""
+
+    def __init__(self) -> None:
+        self.docs: list = []
+        self.calls = 0
+
+    def insert_one(self, doc: Dict) -> None:
+        time.sleep(_RTT_S)
+        self.calls += 1
+        self.docs.append(doc)
+
+    def insert_many(self, docs, ordered: bool = True) -> None:
+        time.sleep(_RTT_S)
+        self.calls += 1
+        self.docs.extend(docs)
+
+def bench_audit(n: int = 2000) -> Dict[str, object]:
+    """
+    Coût ajouté à la requête : insert_one inline (avant) vs mise en file (après),
+    les deux contre la même collection à aller-retour simulé ; Mongo réel en plus s'il répond.
+    """
+    import audit
+
+    class _Req:
+        method, client, scope = "GET", None, {}
+        class url: path = "/bench"
+        headers = {"user-agent": "bench"}
+
+    class _Resp:
+        status_code = 200
+
+    async def _next(_req):
+        return _Resp()
+
+    async def _inline_middleware(request, call_next):
+        # middleware d'avant : insert_one dans la requête
+        resp = await call_next(request)
+        col.insert_one(_doc())
+        return resp
+
+    def _doc() -> Dict:
+        return {"ts": time.time(), "ip": None, "method": "GET", "path": "/bench", "status": 200, "ua": "bench", "dur_ms": 0}
+
+    out: Dict[str, object] = {"simulated_rtt_ms": _RTT_S * 1000}
+    col = _SlowCollection()
+    real_col, audit.audit_col = audit.audit_col, col
+    audit.ensure_indexes = lambda: None  # pas de serveur : index hors mesure
+    loop = asyncio.new_event_loop()
+    try:
+        out["before_inline_middleware"] = _timeit(lambda: loop.run_until_complete(_inline_middleware(_Req(), _next)), n)
+        inline_calls = col.calls
+        col.calls = 0
+        out["after_queued_middleware"] = _timeit(lambda: loop.run_until_complete(audit.audit_middleware(_Req(), _next)), n)
+        out["after_queued_record"] = _timeit(lambda: audit.record(_doc()), n)
+        audit.stop()
+        out["round_trips"] = {"before": inline_calls, "after": col.calls}
+        out["writer"] = audit.stats()
+    finally:
+        audit.audit_col = real_col
+        loop.close()
+    try:
+        real_col.database.client.admin.command("ping")
+        out["live_inline_insert_one"] = _timeit(lambda: real_col.insert_one(_doc()), min(n, 500))
+    except Exception as e:
+        out["live_inline_insert_one"] = {"skipped": repr(e)[:120]}
+    return out
+
+def _per_call_ns(fn: Callable[[], None], n: int) -> float:
+    """Coût moyen d'un appel, boucle à vide déduite (le chronométrage par appel fausserait la mesure)."""
+    def empty() -> None:
+        pass
+    t0 = time.perf_counter()
+    for _ in range(n):
+        empty()
+    base = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return round(max(0.0, time.perf_counter() - t0 - base) / n * 1e9, 1)
+
+def bench_metrics(n: int = 200000) -> Dict[str, object]:
+    """Surcoût de l'instrumentation sur le chemin chaud + coût d'un scrape."""
+    import metrics
+    c = metrics.Counter("bench_total", "bench", ("kind",))
+    h = metrics.Histogram("bench_seconds", "bench", ("kind",))
+
+    def timer() -> None:
+        with child.time():
+            pass
+
+    @metrics.timed(h, "y")
+    def decorated() -> None:
+        pass
+
+    child = h.labels("x")
+    cc = c.labels("x")
+    out: Dict[str, object] = {
+        "counter_inc_ns": _per_call_ns(cc.inc, n),
+        "histogram_observe_ns": _per_call_ns(functools.partial(child.observe, 0.0123), n),
+        "histogram_observe_by_labels_ns": _per_call_ns(functools.partial(h.observe, 0.0123, "x"), n),
+        "timer_block_ns": _per_call_ns(timer, n),
+        "timed_decorator_ns": _per_call_ns(decorated, n),
+    }
+    t0 = time.perf_counter()
+    body = metrics.render()
+    out["render_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    out["render_lines"] = body.count("\n")
+    return out
+
+def bench_rate_limit(n: int = 200000) -> Dict[str, object]:
+    """GCRA (O(1), un flottant par clé, LRU) vs ancienne liste d'horodatages par clé."""
+    import tracemalloc
+    import rate_limit
+
+    def legacy(limit: int):
+        buckets: Dict[str, list] = {}
+
+        def hit(key: str) -> bool:
+            now = time.time()
+            ts = [t for t in buckets.get(key, []) if now - t < 60.0]
+            if len(ts) >= limit:
+                return False
+            ts.append(now)
+            buckets[key] = ts
+            return True
+        return hit, buckets
+
+    out: Dict[str, object] = {}
+    for limit in (60, 1000):
+        interval, tau = 60.0 / limit, 60.0
+        g = rate_limit.GCRA(100000)
+        old, _ = legacy(limit)
+        out[f"hot_key_limit_{limit}"] = {
+            "gcra_ns": _per_call_ns(functools.partial(g.hit, "ip:1.2.3.4:generate", interval, tau), n),
+            "legacy_ns": _per_call_ns(functools.partial(old, "ip:1.2.3.4:generate"), n),
+        }
+
+    # une requête par clé distincte : coût et mémoire par client
+    keys = [f"ip:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}:generate" for i in range(n)]
+    for name, make in (("gcra", lambda: rate_limit.GCRA(n)), ("legacy", lambda: legacy(60)[0])):
+        tracemalloc.start()
+        h = make()
+        fn = (lambda k: h.hit(k, 1.0, 60.0)) if name == "gcra" else h
+        t0 = time.perf_counter()
+        for k in keys:
+            fn(k)
+        dt = time.perf_counter() - t0
+        mem = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        out[f"distinct_keys_{name}"] = {"keys": n, "ns_per_hit": round(dt / n * 1e9, 1),
+                                        "bytes_per_key": round(mem / n, 1)}
+
+    g = rate_limit.GCRA(1000)
+    for k in keys:
+        g.hit(k, 1.0, 60.0)
+    out["lru_bound"] = {"max_keys": 1000, "hits": n, "keys_kept": len(g)}
+    return out
+
+if __name__ == "__main__":
+    import json
+    what = sys.argv[1] if len(sys.argv) > 1 else "audit"
+    benches = {"audit": (bench_audit, 2000), "metrics": (bench_metrics, 200000),
+               "rate_limit": (bench_rate_limit, 200000)}
+    fn, default_n = benches[what]
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else default_n
+    print(json.dumps(fn(n), indent=2))
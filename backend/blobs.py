@@ -0,0 +1,223 @@
+# backend/blobs.py
+"""
+Corps des test cases (code source, test généré) hors des documents test_cases.
+
+- collection `blobs` adressée par sha256 du texte UTF-8 : un même contrôleur
+  n'est stocké qu'une fois, quel que soit le nombre de générations ;
+- gzip au-delà de BLOB_MIN_COMPRESS octets, `refs` = nombre de références ;
+- test_cases ne garde que `<champ>_sha` + `<champ>_size` ; `hydrate*` remet
+  `code` / `generated_test` dans la forme d'origine (lot unique $in par page) ;
+- cache LRU des corps décompressés (BLOB_CACHE_MB) ;
+- migration des documents existants par lots : `python blobs.py migrate [taille]`.
+"""
+from __future__ import annotations
+import gzip, hashlib, sys, threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson import Binary
+from pymongo import UpdateOne
+
+from database import async_db, db, deadline
+from settings import settings
+
+BODY_FIELDS = ("code", "generated_test")
+
+blobs_col = db["blobs"]
+
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+def sha_of(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def _encode(text: str) -> Tuple[str, Dict]:
+    raw = (text or "").encode("utf-8")
+    sha = hashlib.sha256(raw).hexdigest()
+    if len(raw) >= settings.BLOB_MIN_COMPRESS:
+        data, encoding = gzip.compress(raw, compresslevel=settings.BLOB_GZIP_LEVEL), "gzip"
+    else:
+        data, encoding = raw, "identity"
+    return sha, {"data": Binary(data), "encoding": encoding, "size": len(raw), "stored_size": len(data),
+                 "created_at": datetime.utcnow()}
+
+def _decode(doc: Dict) -> str:
+    data = bytes(doc["data"])
+    if doc.get("encoding") == "gzip":
+        data = gzip.decompress(data)
+    return data.decode("utf-8")
+
+def _cache_get(sha: str) -> Optional[str]:
+    with _cache_lock:
+        text = _cache.get(sha)
+        if text is not None:
+            _cache.move_to_end(sha)
+        return text
+
+def _cache_put(sha: str, text: str) -> None:
+    global _cache_bytes
+    limit = settings.BLOB_CACHE_MB * 1024 * 1024
+    if len(text) > limit // 4:
+        return
+    with _cache_lock:
+        if sha in _cache:
+            return
+        _cache[sha] = text
+        _cache_bytes += len(text)
+        while _cache_bytes > limit and _cache:
+            _k, old = _cache.popitem(last=False)
+            _cache_bytes -= len(old)
+
+def _upserts(texts: Iterable[str]) -> Tuple[List[str], List[UpdateOne]]:
+    """Une opération par référence (refs exact), corps écrit seulement à la création."""
+    shas, ops = [], []
+    for text in texts:
+        sha, doc = _encode(text)
+        shas.append(sha)
+        ops.append(UpdateOne({"_id": sha}, {"$setOnInsert": doc, "$inc": {"refs": 1}}, upsert=True))
+        _cache_put(sha, text or "")
+    return shas, ops
+
+def _body_fields(shas: List[str], texts: List[str]) -> Dict:
+    out: Dict = {}
+    for field, sha, text in zip(BODY_FIELDS, shas, texts):
+        out[f"{field}_sha"] = sha
+        out[f"{field}_size"] = len((text or "").encode("utf-8"))
+    return out
+
+def store_bodies(doc: Dict) -> Dict:
+    """Remplace code / generated_test par leurs empreintes (écrit les blobs)."""
+    texts = [doc.get(f) or "" for f in BODY_FIELDS]
+    shas, ops = _upserts(texts)
+    blobs_col.bulk_write(ops, ordered=False)
+    out = {k: v for k, v in doc.items() if k not in BODY_FIELDS}
+    out.update(_body_fields(shas, texts))
+    return out
+
+async def store_bodies_async(doc: Dict) -> Dict:
+    return (await store_bodies_many_async([doc]))[0]
+
+async def store_bodies_many_async(docs: List[Dict]) -> List[Dict]:
+    """store_bodies pour un lot : un seul bulk_write de blobs."""
+    out, all_ops = [], []
+    for doc in docs:
+        texts = [doc.get(f) or "" for f in BODY_FIELDS]
+        shas, ops = _upserts(texts)
+        all_ops += ops
+        d = {k: v for k, v in doc.items() if k not in BODY_FIELDS}
+        d.update(_body_fields(shas, texts))
+        out.append(d)
+    if all_ops:
+        with deadline():
+            await async_db()["blobs"].bulk_write(all_ops, ordered=False)
+    return out
+
+async def unref_bodies_many_async(docs: List[Dict]) -> None:
+    """Annule les références posées par store_bodies_many_async pour des documents finalement non écrits."""
+    ops = [UpdateOne({"_id": d[f"{f}_sha"]}, {"$inc": {"refs": -1}}) for d in docs for f in BODY_FIELDS
+           if d.get(f"{f}_sha")]
+    if ops:
+        with deadline():
+            await async_db()["blobs"].bulk_write(ops, ordered=False)
+
+# ============================
+# Hydratation
+# ============================
+
+def _wanted(docs: List[Dict]) -> Tuple[Dict[str, Optional[str]], List[str]]:
+    found: Dict[str, Optional[str]] = {}
+    missing: List[str] = []
+    for d in docs:
+        for f in BODY_FIELDS:
+            sha = d.get(f"{f}_sha")
+            if sha and sha not in found:
+                found[sha] = _cache_get(sha)
+                if found[sha] is None:
+                    missing.append(sha)
+    return found, missing
+
+def _fill(docs: List[Dict], found: Dict[str, Optional[str]]) -> List[Dict]:
+    for d in docs:
+        for f in BODY_FIELDS:
+            sha = d.pop(f"{f}_sha", None)
+            d.pop(f"{f}_size", None)
+            if sha:
+                d[f] = found.get(sha) or ""
+    return docs
+
+def _loaded(rows: Iterable[Dict], found: Dict[str, Optional[str]]) -> None:
+    for b in rows:
+        text = _decode(b)
+        found[b["_id"]] = text
+        _cache_put(b["_id"], text)
+
+def hydrate_many(docs: List[Dict]) -> List[Dict]:
+    """Remet code / generated_test (forme d'origine) ; documents non migrés inchangés."""
+    found, missing = _wanted(docs)
+    if missing:
+        _loaded(blobs_col.find({"_id": {"$in": missing}}, {"data": 1, "encoding": 1}), found)
+    return _fill(docs, found)
+
+async def hydrate_many_async(docs: List[Dict]) -> List[Dict]:
+    found, missing = _wanted(docs)
+    if missing:
+        with deadline():
+            rows = await async_db()["blobs"].find({"_id": {"$in": missing}}, {"data": 1, "encoding": 1}
+                                                  ).to_list(length=len(missing))
+        _loaded(rows, found)
+    return _fill(docs, found)
+
+def strip_bodies(doc: Dict) -> Dict:
+    """Variante « métadonnées seules » : ni corps ni empreintes."""
+    for f in BODY_FIELDS:
+        doc.pop(f, None)
+        doc.pop(f"{f}_sha", None)
+    return doc
+
+# ============================
+# Migration
+# ============================
+
+def migrate(batch_size: int = 200, dry_run: bool = False) -> Dict:
+    """
+    Convertit les test_cases qui embarquent encore leurs corps, par lots triés
+    par _id (reprise possible après interruption : seuls les non migrés sont relus).
+    """
+    tests = db["test_cases"]
+    query = {"$or": [{f: {"$exists": True}} for f in BODY_FIELDS]}
+    stats = {"docs": 0, "blobs_refs": 0, "bytes_before": 0, "batches": 0}
+    last_id = None
+    while True:
+        q = dict(query) if last_id is None else {"$and": [query, {"_id": {"$gt": last_id}}]}
+        batch = list(tests.find(q, {f: 1 for f in BODY_FIELDS}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        blob_ops: List[UpdateOne] = []
+        doc_ops: List[UpdateOne] = []
+        for d in batch:
+            texts = [d.get(f) or "" for f in BODY_FIELDS]
+            shas, ops = _upserts(texts)
+            blob_ops += ops
+            stats["bytes_before"] += sum(len(t.encode("utf-8")) for t in texts)
+            doc_ops.append(UpdateOne({"_id": d["_id"]},
+                                     {"$set": _body_fields(shas, texts), "$unset": {f: "" for f in BODY_FIELDS}}))
+        if not dry_run:
+            # blobs d'abord : un document ne référence jamais un blob absent
+            blobs_col.bulk_write(blob_ops, ordered=False)
+            tests.bulk_write(doc_ops, ordered=False)
+        stats["docs"] += len(batch)
+        stats["blobs_refs"] += len(blob_ops)
+        stats["batches"] += 1
+        print(f"[blobs] lot {stats['batches']} : {stats['docs']} documents", file=sys.stderr)
+    stats["distinct_blobs"] = blobs_col.estimated_document_count()
+    return stats
+
+if __name__ == "__main__":
+    import json
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        sys.exit("usage: python blobs.py migrate [taille_lot] [--dry-run]")
+    size = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else 200
+    print(json.dumps(migrate(size, dry_run="--dry-run" in sys.argv), indent=2))
@@ -0,0 +1,322 @@
+# backend/bulk_io.py
+"""
+Export / import NDJSON (une ligne JSON par enregistrement) des test cases et des exécutions.
+
+- export : lecture du curseur Mongo par lots de BULK_BATCH_SIZE (corps réhydratés
+  par lot via blobs), sérialisé au fil de l'eau, gzip optionnel : mémoire constante ;
+- import : lecture du corps en flux (gzip détecté), lots d'upserts $setOnInsert ;
+  un test case déjà présent (mêmes empreintes code / test, type, langage, ou mêmes
+  textes pour un document non migré) est ignoré, une exécution déjà connue (même id) aussi ;
+  dédoublonnage au mieux entre imports concurrents (index non unique : deux upserts
+  simultanés du même test case peuvent tous deux insérer) ;
+- progression consultable pendant l'import : GET /imports/{import_id}.
+"""
+from __future__ import annotations
+import functools, json, uuid, zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+import blobs
+from database import async_db, bump_version_async, deadline
+from exec_store import import_executions as _store_executions, iter_executions
+from metrics import Counter
+from settings import settings
+
+_ROWS = Counter("bulk_rows_total", "Lignes NDJSON exportées / importées", ("kind", "op", "outcome"))
+
+TEST_CASE_FIELDS = ("code", "generated_test", "test_type", "language", "status", "provider", "model", "created_at")
+_MAX_IMPORTS = 50  # progressions gardées en mémoire
+
+_imports: "OrderedDict[str, Dict]" = OrderedDict()
+_indexes_ready = False
+
+class ImportTooLarge(Exception):
+    pass
+
+def _default(v):
+    if isinstance(v, ObjectId):
+        return str(v)
+    if isinstance(v, datetime):
+        return v.isoformat() + "Z"
+    raise TypeError(f"non sérialisable : {type(v).__name__}")
+
+def _line(doc: Dict) -> bytes:
+    return json.dumps(doc, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+def _parse_dt(v) -> Optional[datetime]:
+    if not isinstance(v, str) or not v:
+        return None
+    try:
+        return datetime.fromisoformat(v[:-1] if v.endswith("Z") else v).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+# ============================
+# Export
+# ============================
+
+async def encode(batches: AsyncIterator[List[Dict]], gzip: bool = False) -> AsyncIterator[bytes]:
+    """Lots de documents -> morceaux NDJSON (un par lot), gzip en flux si demandé."""
+    z = zlib.compressobj(settings.BULK_GZIP_LEVEL, zlib.DEFLATED, 31) if gzip else None
+    async for batch in batches:
+        chunk = b"".join(_line(d) for d in batch)
+        if z is not None:
+            chunk = z.compress(chunk)
+        if chunk:
+            yield chunk
+    if z is not None:
+        yield z.flush()
+
+def test_case_query(test_type: Optional[str] = None, language: Optional[str] = None, status: Optional[str] = None,
+                    provider: Optional[str] = None, since: Optional[datetime] = None,
+                    until: Optional[datetime] = None) -> Dict:
+    query: Dict = {k: v for k, v in (("test_type", test_type), ("language", language), ("status", status),
+                                     ("provider", provider)) if v}
+    if since or until:
+        query["created_at"] = {k: v for k, v in (("$gte", since), ("$lt", until)) if v}
+    return query
+
+async def export_test_cases(query: Dict, limit: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+    """Test cases par lots, triés par _id, dans la forme de GET /test-cases (corps inclus)."""
+    size = max(1, settings.BULK_BATCH_SIZE)
+    cur = async_db()["test_cases"].find(query).sort("_id", ASCENDING)
+    if limit:
+        cur = cur.limit(int(limit))
+    while True:
+        with deadline():
+            batch = await cur.to_list(length=size)
+        if not batch:
+            break
+        await blobs.hydrate_many_async(batch)
+        _ROWS.inc("test_cases", "export", "ok", amount=len(batch))
+        yield batch
+
+async def export_executions(kind: Optional[str] = None, status: Optional[str] = None,
+                            since: Optional[datetime] = None) -> AsyncIterator[List[Dict]]:
+    """Exécutions (store mémoire) par lots ; le log complet reste dans log_store (seule la fin est exportée)."""
+    items = iter_executions(kind, status, since.isoformat() if since else None)
+    size = max(1, settings.BULK_BATCH_SIZE)
+    for i in range(0, len(items), size):
+        batch = items[i:i + size]
+        _ROWS.inc("executions", "export", "ok", amount=len(batch))
+        yield batch
+
+# ============================
+# Lecture du flux d'import
+# ============================
+
+async def iter_lines(chunks: AsyncIterator[bytes], gzip: Optional[bool] = None) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    (numéro, ligne) d'un flux NDJSON, gzip détecté sur les premiers octets si `gzip` vaut None.
+    Lève ImportTooLarge au-delà de IMPORT_MAX_MB (décompressés) ou d'une ligne de IMPORT_MAX_LINE_KB.
+    """
+    max_total = settings.IMPORT_MAX_MB * 1024 * 1024
+    max_line = settings.IMPORT_MAX_LINE_KB * 1024
+    z = None
+    buf = b""
+    total = 0
+    lineno = 0
+    first = True
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if first:
+            first = False
+            if gzip or (gzip is None and chunk[:2] == b"\x1f\x8b"):
+                z = zlib.decompressobj(47)  # gzip ou zlib
+        data = z.decompress(chunk) if z is not None else chunk
+        total += len(data)
+        if total > max_total:
+            raise ImportTooLarge(f"import limité à {settings.IMPORT_MAX_MB} Mo")
+        buf += data
+        start = 0
+        while True:
+            nl = buf.find(b"\n", start)
+            if nl < 0:
+                break
+            lineno += 1
+            if nl - start > max_line:
+                raise ImportTooLarge(f"ligne {lineno} : plus de {settings.IMPORT_MAX_LINE_KB} Ko")
+            line = buf[start:nl].strip()
+            start = nl + 1
+            if line:
+                yield lineno, line
+        buf = buf[start:]
+        if len(buf) > max_line:
+            raise ImportTooLarge(f"ligne {lineno + 1} : plus de {settings.IMPORT_MAX_LINE_KB} Ko")
+    if z is not None:
+        buf += z.flush()
+    if buf.strip():
+        yield lineno + 1, buf.strip()
+
+# ============================
+# Progression
+# ============================
+
+def new_import(kind: str, import_id: Optional[str] = None) -> Dict:
+    prog = {"import_id": import_id or uuid.uuid4().hex, "kind": kind, "state": "running",
+            "lines": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "failed": 0, "batches": 0,
+            "errors": [], "started_at": datetime.utcnow().isoformat() + "Z", "finished_at": None}
+    _imports[prog["import_id"]] = prog
+    while len(_imports) > _MAX_IMPORTS:
+        _imports.popitem(last=False)
+    return prog
+
+def get_import(import_id: str) -> Optional[Dict]:
+    return _imports.get(import_id)
+
+def _invalid(prog: Dict, lineno: int, reason: str) -> None:
+    prog["invalid"] += 1
+    if len(prog["errors"]) < 20:
+        prog["errors"].append({"line": lineno, "error": reason})
+
+def _done(prog: Dict, state: str) -> Dict:
+    prog["state"] = state
+    prog["finished_at"] = datetime.utcnow().isoformat() + "Z"
+    _ROWS.inc(prog["kind"], "import", "inserted", amount=prog["inserted"])
+    _ROWS.inc(prog["kind"], "import", "duplicate", amount=prog["duplicates"])
+    _ROWS.inc(prog["kind"], "import", "invalid", amount=prog["invalid"])
+    return prog
+
+async def _run_import(lines: AsyncIterator[Tuple[int, bytes]], prog: Dict, parse, flush) -> Dict:
+    size = max(1, settings.BULK_BATCH_SIZE)
+    batch: List[Dict] = []
+    try:
+        async for lineno, raw in lines:
+            prog["lines"] = lineno
+            try:
+                batch.append(parse(json.loads(raw)))
+            except (ValueError, TypeError, KeyError) as e:
+                _invalid(prog, lineno, str(e))
+                continue
+            if len(batch) >= size:
+                await flush(batch, prog)
+                batch = []
+        if batch:
+            await flush(batch, prog)
+    except ImportTooLarge as e:
+        prog["errors"].append({"line": prog["lines"] + 1, "error": str(e)})
+        return _done(prog, "aborted")
+    except Exception as e:
+        prog["errors"].append({"line": prog["lines"], "error": repr(e)})
+        _done(prog, "failed")
+        raise
+    return _done(prog, "done")
+
+# ============================
+# Import des test cases
+# ============================
+
+def _test_case(obj: Dict) -> Dict:
+    if not isinstance(obj, dict):
+        raise ValueError("objet JSON attendu")
+    for f in ("code", "generated_test", "test_type", "language"):
+        if not isinstance(obj.get(f), str) or not obj[f]:
+            raise ValueError(f"champ '{f}' manquant ou invalide")
+    doc = {f: obj.get(f) for f in TEST_CASE_FIELDS}
+    doc["status"] = doc["status"] or "confirmed"
+    doc["created_at"] = _parse_dt(doc["created_at"]) or datetime.utcnow()
+    return doc
+
+_TC_KEY = ("code_sha", "generated_test_sha", "test_type", "language")
+
+def _tc_key(doc: Dict) -> Tuple:
+    if "code_sha" in doc:
+        return doc["code_sha"], doc.get("generated_test_sha"), doc.get("test_type"), doc.get("language")
+    return blobs.sha_of(doc["code"]), blobs.sha_of(doc["generated_test"]), doc["test_type"], doc["language"]
+
+async def _ensure_indexes() -> None:
+    global _indexes_ready
+    if not _indexes_ready:
+        with deadline():
+            await async_db()["test_cases"].create_index([(f, ASCENDING) for f in _TC_KEY])
+        _indexes_ready = True
+
+async def _has_legacy_bodies() -> bool:
+    """Documents encore au format d'avant blobs (corps embarqués, sans empreintes) ?"""
+    with deadline():
+        return await async_db()["test_cases"].find_one({"code": {"$exists": True}}, {"_id": 1}) is not None
+
+async def _known_keys(batch: List[Dict], keys: List[Tuple], legacy: bool) -> set:
+    col = async_db()["test_cases"]
+    proj = {"_id": 0, **{f: 1 for f in _TC_KEY}}
+    with deadline():
+        known = await col.find({"code_sha": {"$in": list({k[0] for k in keys})}}, proj).to_list(length=None)
+    if legacy:
+        # non migrés : comparaison sur les textes, empreintes recalculées
+        with deadline():
+            known += await col.find({"code": {"$in": list({d["code"] for d in batch})}},
+                                    {"_id": 0, "code": 1, "generated_test": 1, "test_type": 1, "language": 1}
+                                    ).to_list(length=None)
+    return {_tc_key(d) for d in known}
+
+async def _flush_test_cases(batch: List[Dict], prog: Dict, legacy: bool = False) -> None:
+    keys = [_tc_key(d) for d in batch]
+    seen = await _known_keys(batch, keys, legacy)
+    fresh = []
+    for key, doc in zip(keys, batch):
+        if key in seen:
+            prog["duplicates"] += 1
+        else:
+            seen.add(key)  # doublons internes au fichier
+            fresh.append(doc)
+    if fresh:
+        docs = await blobs.store_bodies_many_async(fresh)
+        for d in docs:
+            d["_id"] = ObjectId()  # _id choisi ici : un upsert créé se reconnaît à son _id
+        # upsert : retrouve un document écrit depuis la pré-vérification (au mieux, index non unique)
+        ops = [UpdateOne({f: d[f] for f in _TC_KEY}, {"$setOnInsert": d}, upsert=True) for d in docs]
+        try:
+            with deadline():
+                res = await async_db()["test_cases"].bulk_write(ops, ordered=False)
+            created, errors = set(res.upserted_ids.values()), []
+        except BulkWriteError as e:
+            created = {u["_id"] for u in e.details.get("upserted", [])}
+            errors = e.details.get("writeErrors", [])
+        lost = [d for d in docs if d["_id"] not in created]
+        prog["inserted"] += len(created)
+        prog["duplicates"] += len(lost) - len(errors)
+        prog["failed"] += len(errors)
+        if lost:
+            await blobs.unref_bodies_many_async(lost)
+        if created:
+            await bump_version_async("test_cases")
+    prog["batches"] += 1
+
+async def import_test_cases(lines: AsyncIterator[Tuple[int, bytes]], prog: Dict) -> Dict:
+    await _ensure_indexes()
+    flush = functools.partial(_flush_test_cases, legacy=await _has_legacy_bodies())
+    return await _run_import(lines, prog, _test_case, flush)
+
+# ============================
+# Import des exécutions
+# ============================
+
+def _execution(obj: Dict) -> Dict:
+    if not isinstance(obj, dict):
+        raise ValueError("objet JSON attendu")
+    for f in ("id", "kind"):
+        if not isinstance(obj.get(f), str) or not obj[f]:
+            raise ValueError(f"champ '{f}' manquant ou invalide")
+    rec = dict(obj)
+    # le log complet n'est pas exporté : l'aperçu `logs` devient la seule source
+    rec["logs_summary"] = None
+    rec["logs"] = str(rec.get("logs") or "")
+    rec["logs_url"] = f"/executions/{rec['id']}/logs"
+    rec["artifacts"] = rec.get("artifacts") or []
+    rec["params"] = rec.get("params") or {}
+    return rec
+
+async def _flush_executions(batch: List[Dict], prog: Dict) -> None:
+    added = _store_executions(batch)
+    prog["inserted"] += added
+    prog["duplicates"] += len(batch) - added
+    prog["batches"] += 1
+
+async def import_executions(lines: AsyncIterator[Tuple[int, bytes]], prog: Dict) -> Dict:
+    return await _run_import(lines, prog, _execution, _flush_executions)
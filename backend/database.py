@@ -1,15 +1,77 @@
 # database.py
-from pymongo import MongoClient
+import asyncio
+import pymongo
+from pymongo import MongoClient, ASCENDING, monitoring
+from pymongo.errors import OperationFailure
 from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime
 import os
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from metrics import MONGO_FAILURES, MONGO_SECONDS, STORE_SECONDS, timed
+from settings import settings
 
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-client = MongoClient(MONGO_URI)
+
+class _CommandTimer(monitoring.CommandListener):
+    """Durée de chaque commande Mongo (tous modules confondus), par commande et collection."""
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        v = event.command.get(event.command_name)
+        coll = v if isinstance(v, str) else event.command.get("collection", "")
+        self._pending[event.request_id] = coll if isinstance(coll, str) else ""
+
+    def succeeded(self, event):
+        coll = self._pending.pop(event.request_id, "")
+        MONGO_SECONDS.observe(event.duration_micros / 1e6, event.command_name, coll)
+
+    def failed(self, event):
+        coll = self._pending.pop(event.request_id, "")
+        MONGO_SECONDS.observe(event.duration_micros / 1e6, event.command_name, coll)
+        MONGO_FAILURES.inc(event.command_name, coll)
+
+_listener = _CommandTimer()
+_POOL_OPTS = dict(
+    maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+    minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+    serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+    event_listeners=[_listener],
+)
+
+client = MongoClient(MONGO_URI, **_POOL_OPTS)
 db = client[ os.getenv("MONGO_DB", "llm_tests") ]
 collection = db["test_cases"]
+versions_col = db["versions"]  # compteur de modifications par collection (ETag des listes)
+
+# Client async (Motor) pour les handlers `async def` : les lectures n'occupent plus
+# le threadpool des endpoints synchrones (pool d'exécution Motor : MOTOR_MAX_WORKERS).
+# Motor se lie à la boucle qui l'utilise : un client par boucle (une seule sous uvicorn).
+_async: Dict = {"loop": None, "client": None}
+
+def async_db():
+    loop = asyncio.get_running_loop()
+    if _async["loop"] is not loop:
+        if _async["client"] is not None:
+            _async["client"].close()
+        _async["client"] = AsyncIOMotorClient(MONGO_URI, **_POOL_OPTS)
+        _async["loop"] = loop
+    return _async["client"][os.getenv("MONGO_DB", "llm_tests")]
+
+def ensure_ttl_index(col, field: str, seconds: int):
+    """Index TTL sur `field` ; met à jour expireAfterSeconds s'il existe déjà avec une autre durée."""
+    try:
+        col.create_index([(field, ASCENDING)], expireAfterSeconds=int(seconds))
+    except OperationFailure:
+        col.database.command("collMod", col.name,
+                             index={"keyPattern": {field: 1}, "expireAfterSeconds": int(seconds)})
 
 def _to_dict(doc):
     if not doc: return {}
@@ -20,15 +82,84 @@ def _to_dict(doc):
         out["created_at"] = out["created_at"].isoformat()
     return out
 
+# Les corps (code / generated_test) vivent dans blobs.py, qui importe ce module :
+# import local pour éviter le cycle.
+
+@timed(STORE_SECONDS, "database", "save_test_case")
 def save_test_case(code, result, test_type, language=None):
-    collection.insert_one({
+    from blobs import store_bodies
+    collection.insert_one(store_bodies({
         "code": code,
         "generated_test": result,
         "test_type": test_type,
         "language": language,
         "created_at": datetime.utcnow()
-    })
+    }))
+    bump_version("test_cases")
 
+def bump_version(name: str) -> None:
+    versions_col.update_one({"_id": name}, {"$inc": {"v": 1}}, upsert=True)
+
+@timed(STORE_SECONDS, "database", "list_test_cases")
 def list_test_cases(limit: int = 50):
+    from blobs import hydrate_many
     cur = collection.find().sort("created_at", -1).limit(int(limit))
-    return [_to_dict(doc) for doc in cur]
+    return [_to_dict(doc) for doc in hydrate_many(list(cur))]
+
+# ============================
+# Accès async (handlers FastAPI)
+# ============================
+
+def deadline(seconds: Optional[float] = None):
+    """Délai global par appel (CSOT pymongo) : `with deadline(): await ...`."""
+    return pymongo.timeout(settings.MONGO_OP_TIMEOUT_S if seconds is None else seconds)
+
+def object_id(value: str) -> Optional[ObjectId]:
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+@timed(STORE_SECONDS, "database", "list_test_cases_async")
+async def list_test_cases_async(limit: int = 50) -> List[Dict]:
+    with deadline():
+        docs = await async_db()["test_cases"].find().sort("created_at", -1).limit(int(limit)).to_list(length=int(limit))
+    return [_to_dict(doc) for doc in docs]
+
+@timed(STORE_SECONDS, "database", "find_test_cases_async")
+async def find_test_cases_async(query: Dict, limit: int) -> List[Dict]:
+    with deadline():
+        return await async_db()["test_cases"].find(query).sort("created_at", -1).limit(int(limit)).to_list(length=int(limit))
+
+@timed(STORE_SECONDS, "database", "get_test_case_async")
+async def get_test_case_async(test_id: str) -> Optional[Dict]:
+    oid = object_id(test_id)
+    if oid is None:
+        return None
+    with deadline():
+        return await async_db()["test_cases"].find_one({"_id": oid})
+
+@timed(STORE_SECONDS, "database", "insert_test_case_async")
+async def insert_test_case_async(doc: Dict) -> str:
+    with deadline():
+        ins = await async_db()["test_cases"].insert_one(doc)
+    await bump_version_async("test_cases")
+    return str(ins.inserted_id)
+
+async def bump_version_async(name: str) -> None:
+    with deadline():
+        await async_db()["versions"].update_one({"_id": name}, {"$inc": {"v": 1}}, upsert=True)
+
+async def get_version_async(name: str) -> int:
+    """Version courante de `name` (0 tant que rien n'a été écrit)."""
+    with deadline():
+        doc = await async_db()["versions"].find_one({"_id": name})
+    return int((doc or {}).get("v") or 0)
+
+@timed(STORE_SECONDS, "database", "get_job_async")
+async def get_job_async(job_id: str) -> Optional[Dict]:
+    oid = object_id(job_id)
+    if oid is None:
+        return None
+    with deadline():
+        return await async_db()["jobs"].find_one({"_id": oid})
@@ -0,0 +1,200 @@
+# backend/exec_backends.py
+"""
+Backends d'exécution des tests et détection de leurs capacités.
+
+- "docker" : conteneur Maven (pool de workers ou `docker run`) ;
+- "local"  : JDK/Maven de l'hôte en sous-processus, sous limites (rlimits via
+             `prlimit`, scope cgroup via systemd-run si disponible, workspace en tmpfs) ;
+- "stub"   : exécution simulée, uniquement si EXEC_ALLOW_STUB (jamais par défaut).
+run_local() sert aussi aux runners natifs pytest/Jest (native_runner).
+
+Les capacités (docker, mvn, java, cgroups, pytest, node/jest) sont sondées une fois puis
+rafraîchies en tâche de fond : plus de `docker version` à chaque run.
+"""
+from __future__ import annotations
+import importlib.util, os, shlex, shutil, signal, subprocess, sys, threading, time
+from typing import Dict, List, Optional, Tuple
+
+from settings import settings
+
+try:
+    import resource  # POSIX uniquement
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+BACKENDS = ("docker", "local", "stub")
+
+_caps: Dict = {"checked_at": 0.0}
+_LOCK = threading.Lock()
+_probe_thread: Optional[threading.Thread] = None
+
+# ============================
+# 1) Sondes
+# ============================
+
+def _cmd_output(cmd: List[str], timeout: float) -> Optional[str]:
+    """Sortie (stdout+stderr) si la commande réussit, sinon None."""
+    if not shutil.which(cmd[0]):
+        return None
+    try:
+        p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=timeout)
+    except Exception:
+        return None
+    return (p.stdout or "").strip() if p.returncode == 0 else None
+
+def _first_line(s: Optional[str]) -> Optional[str]:
+    return s.splitlines()[0].strip() if s else None
+
+def jest_command() -> List[str]:
+    """Binaire Jest : JEST_CMD, sinon `jest` du PATH, sinon npx sans téléchargement."""
+    if settings.JEST_CMD:
+        return shlex.split(settings.JEST_CMD)
+    return ["jest"] if shutil.which("jest") else ["npx", "--no-install", "jest"]
+
+def probe() -> Dict:
+    docker = _cmd_output(["docker", "version", "--format", "{{.Server.Version}}"], 10)
+    mvn = _cmd_output(["mvn", "-v", "-B"], 30)
+    java = _cmd_output(["java", "-version"], 15)
+    cgroup = _cmd_output(["systemd-run", "--user", "--scope", "--quiet", "true"], 10) is not None
+    prlimit = _cmd_output(["prlimit", "--core=0", "--", "true"], 10) is not None
+    pytest = _cmd_output([sys.executable, "-m", "pytest", "--version"], 30)
+    xdist = importlib.util.find_spec("xdist") is not None
+    node = _cmd_output(["node", "--version"], 10)
+    jest = _cmd_output([*jest_command(), "--version"], 60) if node else None
+    caps = {
+        "docker": docker is not None,
+        "maven": mvn is not None,
+        "java": java is not None,
+        "cgroup": cgroup,
+        "prlimit": prlimit,
+        "tmpfs": workspace_root() is not None,
+        "pytest": pytest is not None,
+        "xdist": xdist,
+        "node": node is not None,
+        "jest": jest is not None,
+        "versions": {"docker": docker, "maven": _first_line(mvn), "java": _first_line(java),
+                     "pytest": _first_line(pytest), "node": node, "jest": _first_line(jest)},
+        "checked_at": time.time(),
+    }
+    global _caps
+    with _LOCK:
+        _caps = caps  # une seule affectation : un lecteur concurrent ne voit jamais un dict vide
+    return caps
+
+def capabilities() -> Dict:
+    """Capacités en cache (sonde synchrone uniquement au tout premier appel)."""
+    if not _caps.get("checked_at"):
+        probe()
+    return dict(_caps)
+
+def _probe_loop() -> None:
+    while True:
+        time.sleep(max(5, settings.EXEC_PROBE_INTERVAL_S))
+        try:
+            probe()
+        except Exception as e:
+            print("ERROR exec_backends probe:", repr(e))
+
+def start_probing() -> None:
+    global _probe_thread
+    if _probe_thread and _probe_thread.is_alive():
+        return
+    threading.Thread(target=probe, name="exec-probe-init", daemon=True).start()
+    _probe_thread = threading.Thread(target=_probe_loop, name="exec-probe", daemon=True)
+    _probe_thread.start()
+
+# ============================
+# 2) Sélection
+# ============================
+
+def available(name: str) -> bool:
+    caps = capabilities()
+    if name == "docker":
+        return caps["docker"]
+    if name == "local":
+        return caps["maven"] and caps["java"]
+    if name == "stub":
+        return settings.EXEC_ALLOW_STUB
+    return False
+
+def select(requested: Optional[str] = None) -> Optional[str]:
+    """Backend à utiliser ; None si aucun n'est disponible (jamais de succès simulé implicite)."""
+    pref = (requested or settings.EXEC_BACKEND or "auto").lower()
+    if pref != "auto":
+        return pref if pref in BACKENDS and available(pref) else None
+    for name in BACKENDS:
+        if available(name):
+            return name
+    return None
+
+def toolchain_fingerprint(name: str) -> Optional[str]:
+    """Versions de la chaîne d'outils locale (clé du cache de résultats)."""
+    if name != "local":
+        return None
+    v = capabilities().get("versions") or {}
+    return f"{v.get('maven')}|{v.get('java')}" if v.get("maven") and v.get("java") else None
+
+# ============================
+# 3) Backend local (sous-processus limité)
+# ============================
+
+def workspace_root() -> Optional[str]:
+    """Répertoire tmpfs pour les workspaces locaux (None = tmp par défaut)."""
+    d = settings.LOCAL_RUNNER_TMPFS
+    return d if d and os.path.isdir(d) and os.access(d, os.W_OK) else None
+
+def _limits() -> List[Tuple[str, int]]:
+    # pas de RLIMIT_NPROC : il compte tous les processus de l'uid, pas ceux du run ;
+    # le nombre de tâches est borné par le scope cgroup (TasksMax) quand il existe
+    lim = [("cpu", settings.LOCAL_RUNNER_CPU_S), ("fsize", settings.LOCAL_RUNNER_FSIZE_MB * 1024 * 1024)]
+    return [(n, v) for n, v in lim if v > 0] + [("nofile", 4096), ("core", 0)]
+
+def _prlimit_prefix() -> List[str]:
+    """Limites posées par `prlimit` avant l'exec de la commande (pas de preexec_fn : non sûr avec des threads)."""
+    return ["prlimit", *[f"--{n}={v}" for n, v in _limits()], "--"]
+
+_RLIMITS = {"cpu": "RLIMIT_CPU", "fsize": "RLIMIT_FSIZE", "nofile": "RLIMIT_NOFILE", "core": "RLIMIT_CORE"}
+
+def _limit_pid(pid: int) -> None:
+    """Repli sans binaire prlimit : limites posées juste après le lancement (prlimit(2))."""
+    if resource is None or not hasattr(resource, "prlimit"):
+        return
+    for name, value in _limits():
+        try:
+            resource.prlimit(pid, getattr(resource, _RLIMITS[name]), (value, value))
+        except (ValueError, OSError):
+            pass
+
+def _local_env(extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    env = {k: os.environ[k] for k in ("PATH", "HOME", "JAVA_HOME", "MAVEN_HOME", "LANG", "NODE_PATH") if k in os.environ}
+    # la mémoire est bornée côté JVM (Maven et fork surefire) : RLIMIT_AS casse la JVM
+    env["JAVA_TOOL_OPTIONS"] = f"-Xmx{settings.LOCAL_RUNNER_MEM_MB}m -XX:+UseSerialGC"
+    env.update(extra or {})
+    return env
+
+def run_local(cmd: List[str], cwd: str, timeout: Optional[float] = None,
+              env: Optional[Dict[str, str]] = None) -> Tuple[int, str, str]:
+    """Lance cmd dans cwd sous limites ; (rc, stdout, stderr). rc 124 = timeout."""
+    prefix: List[str] = []
+    if settings.LOCAL_RUNNER_CGROUP and capabilities().get("cgroup"):
+        prefix = ["systemd-run", "--user", "--scope", "--quiet",
+                  "-p", f"MemoryMax={settings.LOCAL_RUNNER_MEM_MB * 2}M",
+                  "-p", f"TasksMax={settings.LOCAL_RUNNER_NPROC}"]
+    use_prlimit = capabilities().get("prlimit")
+    if use_prlimit:
+        prefix += _prlimit_prefix()
+    timeout = timeout or settings.LOCAL_RUNNER_TIMEOUT_S
+    p = subprocess.Popen(prefix + cmd, cwd=cwd, env=_local_env(env), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         text=True, start_new_session=True)
+    if not use_prlimit:
+        _limit_pid(p.pid)
+    try:
+        out, err = p.communicate(timeout=timeout)
+        return p.returncode, out, err
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(p.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        out, err = p.communicate()
+        return 124, out, (err or "") + f"\n[ERROR] Timeout {timeout}s : processus tué\n"
@@ -1,15 +1,36 @@
 # backend/exec_store.py
 from __future__ import annotations
-import uuid
+import threading, uuid
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 
+from settings import settings
+from log_store import save_logs, read_logs
+from metrics import STORE_SECONDS, gauge, timed
+
 # Store mémoire simple
 _EXEC: Dict[str, Dict[str, Any]] = {}
 
+# Version : compteur croissant posé sur l'exécution à chaque modification (champ
+# "version") ; le dernier attribué sert de version du store (ETag des listes).
+# EPOCH distingue les process : les compteurs repartent de zéro au redémarrage.
+EPOCH = uuid.uuid4().hex[:8]
+_version = 0
+_version_lock = threading.Lock()
+
+def _touch(ex: Dict[str, Any]) -> None:
+    global _version
+    with _version_lock:
+        _version += 1
+        ex["version"] = _version
+
+def store_version() -> int:
+    return _version
+
 def _now_iso() -> str:
     return datetime.utcnow().isoformat() + "Z"
 
+@timed(STORE_SECONDS, "exec_store", "create_execution")
 def create_execution(kind: str, params: dict | None = None, test_case_id: str | None = None) -> str:
     exec_id = str(uuid.uuid4())
     _EXEC[exec_id] = {
@@ -22,13 +43,16 @@ def create_execution(kind: str, params: dict | None = None, test_case_id: str |
         "params": params or {},
         "test_case_id": test_case_id,
         "notes": None,
-        "logs": "",          # IMPORTANT: champ toujours présent (string)
+        "logs": "",          # IMPORTANT: champ toujours présent (string) — simple aperçu (fin du log)
         "logs_url": f"/executions/{exec_id}/logs",
+        "logs_summary": None,  # {ref,codec,size,stored_size,lines,chunks} — log complet dans log_store
         "artifacts": [],     # liste de dicts {name,url,size}
         "language": (params or {}).get("language"),
     }
+    _touch(_EXEC[exec_id])
     return exec_id
 
+@timed(STORE_SECONDS, "exec_store", "mark_running")
 def mark_running(exec_id: str, notes: Optional[str] = None) -> None:
     ex = _EXEC.get(exec_id)
     if not ex:
@@ -37,27 +61,88 @@ def mark_running(exec_id: str, notes: Optional[str] = None) -> None:
     ex["started_at"] = _now_iso()
     if notes:
         ex["notes"] = notes
+    _touch(ex)
 
+@timed(STORE_SECONDS, "exec_store", "mark_result")
 def mark_result(exec_id: str, ok: bool, logs: str, artifacts: List[dict] | None = None) -> None:
     ex = _EXEC.get(exec_id)
     if not ex:
         return
     ex["status"] = "success" if ok else "failed"
     ex["finished_at"] = _now_iso()
-    # Toujours poser un string, jamais None
-    ex["logs"] = str(logs or "")
+    # Toujours poser un string, jamais None. Le log complet part dans log_store,
+    # l'enregistrement ne garde que la fin (aperçu) et le résumé.
+    text = str(logs or "")
+    ex["logs_summary"] = save_logs(exec_id, text)
+    tail = settings.LOG_TAIL_CHARS
+    ex["logs"] = text[-tail:] if tail > 0 else ""
     ex["artifacts"] = artifacts or []
+    _touch(ex)
 
+@timed(STORE_SECONDS, "exec_store", "update_execution")
+def update_execution(exec_id: str, **fields: Any) -> None:
+    """Pose des champs additionnels (résumés de résultats, etc.) sur l'exécution."""
+    ex = _EXEC.get(exec_id)
+    if not ex:
+        return
+    ex.update(fields)
+    _touch(ex)
+
+@timed(STORE_SECONDS, "exec_store", "get_execution")
 def get_execution(exec_id: str) -> Optional[Dict[str, Any]]:
     return _EXEC.get(exec_id)
 
+@timed(STORE_SECONDS, "exec_store", "list_executions")
 def list_executions(limit: int = 50) -> List[Dict[str, Any]]:
     # tri inverse par date de création
     items = sorted(_EXEC.values(), key=lambda x: x.get("created_at") or "", reverse=True)
     return items[:limit]
 
-def get_execution_logs_text(exec_id: str) -> Optional[str]:
+@timed(STORE_SECONDS, "exec_store", "get_execution_logs_text")
+def get_execution_logs_text(exec_id: str, start: int = 0, end: Optional[int] = None) -> Optional[str]:
     ex = _EXEC.get(exec_id)
     if not ex:
         return None
-    return ex.get("logs", "")
+    if not ex.get("logs_summary"):
+        # pas encore terminé : rien d'offloadé
+        return ex.get("logs", "")
+    data = read_logs(exec_id, start, end)
+    if data is None:
+        return "[LOGS] Logs purgés par la politique de rétention.\n"
+    return data.decode("utf-8", errors="replace")
+
+@timed(STORE_SECONDS, "exec_store", "get_execution_logs_range")
+def get_execution_logs_range(exec_id: str, start: int, end: int) -> Optional[bytes]:
+    """Octets bruts [start, end] du log offloadé (réponse 206) ; None s'il a été purgé entre-temps."""
+    try:
+        return read_logs(exec_id, start, end)
+    except FileNotFoundError:
+        return None  # chunks supprimés par la rétention pendant la lecture
+
+def iter_executions(kind: Optional[str] = None, status: Optional[str] = None,
+                    since: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Instantané filtré, par date de création croissante (export)."""
+    items = [ex for ex in list(_EXEC.values())
+             if (not kind or ex.get("kind") == kind) and (not status or ex.get("status") == status)
+             and (not since or (ex.get("created_at") or "") >= since)]
+    return sorted(items, key=lambda x: x.get("created_at") or "")
+
+@timed(STORE_SECONDS, "exec_store", "import_executions")
+def import_executions(records: List[Dict[str, Any]]) -> int:
+    """Ajoute les exécutions dont l'id est inconnu ; renvoie le nombre d'ajouts."""
+    added = 0
+    for rec in records:
+        if rec["id"] not in _EXEC:
+            _EXEC[rec["id"]] = rec
+            _touch(rec)
+            added += 1
+    return added
+
+def _count_by_status() -> Dict[tuple, int]:
+    out: Dict[tuple, int] = {}
+    for ex in list(_EXEC.values()):
+        k = (ex.get("status") or "unknown",)
+        out[k] = out.get(k, 0) + 1
+    return out
+
+gauge("executions", "Exécutions en mémoire, par statut", _count_by_status, ("status",))
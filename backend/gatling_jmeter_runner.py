@@ -1,6 +1,18 @@
 # backend/gatling_jmeter_runner.py
-import os, tempfile, subprocess
-from typing import Dict, List, Tuple
+import os, re, sys, json, time, tempfile, subprocess, shutil, tarfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from artifacts import register_file
+from exec_store import update_execution
+from metrics import RUNNER_PHASE
+from load_report import analyze_jtl, analyze_gatling_log, find_simulation_log, store_report, LoadAggregator
+from baselines import evaluate_execution
+from load_scenarios import shard_params
+from settings import settings
+
+# nom qualifié de classe Java (la simulation) : pas de chemin possible
+_CLASS_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
 
 def _run_cmd(cmd, timeout=3600):
     p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
@@ -11,33 +23,223 @@ def _run_cmd(cmd, timeout=3600):
         return 124, out, (err or "") + "\n[timeout]"
     return p.returncode, out, err
 
-def run_gatling(params: Dict) -> Tuple[bool, str, List[Dict]]:
-    sim = params.get("simulation")  # ex: computerdatabase.BasicSimulation si tu montes tes user-files
-    results_dir = tempfile.mkdtemp(prefix="gatling-")
-    cmd = ["docker","run","--rm","-v", f"{results_dir}:/opt/gatling/results","ghcr.io/gatling/gatling"]
-    if sim: cmd += ["-s", sim, "-rm", "local"]
-    rc, out, err = _run_cmd(cmd)
-    logs = (out or "") + ("\n--- STDERR ---\n" + err if err else "")
-    return (rc == 0), (logs or "[GATLING] Aucune sortie"), []
+def _publish_report(exec_id: Optional[str], agg: LoadAggregator, fmt: str, tag: str, unit: str) -> str:
+    """Résumé -> exécution, comparaison à la baseline ; renvoie la ligne de log."""
+    report = store_report(agg, fmt)
+    line = ""
+    if exec_id:
+        update_execution(exec_id, load_report=report)
+        try:
+            hists = (agg.overall.hist, {name: st.hist for name, st in agg.labels.items()})
+            cmp = evaluate_execution(exec_id, cur_hists=hists)
+            if cmp:
+                line = f"[{tag}] Baseline {cmp['baseline_exec_id']}: {cmp['verdict'].upper()}\n"
+        except Exception as e:
+            line = f"[{tag}] Comparaison baseline impossible: {e}\n"
+    o = report["overall"]
+    return (f"\n[{tag}] {o['count']} {unit}, erreurs {o['error_rate']:.2%}, "
+            f"{o['throughput_rps']} req/s, p95 {o['percentiles_ms']['p95']} ms\n") + line
+
+def _archive_dir(src_dir: str, name: str) -> Dict:
+    """tar.gz d'un dossier (rapport HTML) écrit sur disque puis ingéré en streaming."""
+    fd, tmp = tempfile.mkstemp(suffix=".tar.gz")
+    os.close(fd)
+    try:
+        with tarfile.open(tmp, "w:gz") as tar:
+            tar.add(src_dir, arcname=os.path.basename(src_dir.rstrip(os.sep)))
+        return register_file(tmp, name=name, compress=False)
+    finally:
+        os.unlink(tmp)
 
-def run_jmeter(params: Dict) -> Tuple[bool, str, List[Dict]]:
+def _write(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f: f.write(content or "")
+
+def _is_under(base: str, path: str) -> bool:
+    base = os.path.realpath(base)
+    return os.path.commonpath([base, os.path.realpath(path)]) == base
+
+def _prepare_gatling_user_files(params: Dict, work_dir: str) -> Optional[str]:
+    """
+    Simulation générée (load_scenarios) : écrit user-files/simulations/... et
+    resources/feeder.csv, renvoie le dossier user-files à monter (None sinon).
+    Le chemin du source est dérivé du nom de classe, jamais fourni par le client.
+    """
+    src = params.get("simulation_source")
+    if not src:
+        return None
+    sim = params.get("simulation") or "GeneratedSimulation"
+    if not _CLASS_RE.match(sim):
+        raise ValueError(f"nom de simulation invalide : {sim!r}")
+    user_files = os.path.join(work_dir, "user-files")
+    sim_file = os.path.join(user_files, "simulations", *sim.split(".")) + ".java"
+    if not _is_under(user_files, sim_file):
+        raise ValueError(f"nom de simulation invalide : {sim!r}")
+    _write(sim_file, src)
+    if params.get("feeder_csv"):
+        _write(os.path.join(user_files, "resources", "feeder.csv"), params["feeder_csv"])
+    return user_files
+
+def _scenario_jmx(jmx: str) -> Optional[str]:
+    """
+    Plan existant fourni par le client : relatif à JMETER_SCENARIOS_DIR et confiné
+    dedans (son dossier est monté dans le conteneur). Désactivé si le dossier n'est pas configuré.
+    """
+    base = settings.JMETER_SCENARIOS_DIR
+    if not base or os.path.isabs(jmx) or ".." in jmx.replace("\\", "/").split("/"):
+        return None
+    path = os.path.realpath(os.path.join(base, jmx))
+    if not _is_under(base, path) or not path.endswith(".jmx") or not os.path.isfile(path):
+        return None
+    return path
+
+def _prepare_jmeter_plan(params: Dict, work_dir: str) -> Optional[str]:
+    """Chemin du .jmx à exécuter : plan du dossier de scénarios (jmx) ou plan généré (jmx_content)."""
+    if params.get("jmx_content"):
+        jmx = os.path.join(work_dir, "plan", "test.jmx")
+        _write(jmx, params["jmx_content"])
+        if params.get("feeder_csv"):
+            _write(os.path.join(work_dir, "plan", "feeder.csv"), params["feeder_csv"])
+        return jmx
     jmx = params.get("jmx")
-    if not jmx or not os.path.isfile(jmx):
-        return False, "[JMETER] Paramètre 'jmx' manquant ou invalide", []
-    out_dir = tempfile.mkdtemp(prefix="jmeter-")
-    jtl_host = os.path.join(out_dir, "result.jtl")
+    return _scenario_jmx(jmx) if isinstance(jmx, str) and jmx else None
+
+def _jmeter_once(params: Dict, work_dir: str) -> Tuple[int, str, Optional[str]]:
+    jmx = _prepare_jmeter_plan(params, work_dir)
+    if not jmx:
+        return 2, ("[JMETER] Paramètre 'jmx' (relatif à JMETER_SCENARIOS_DIR) ou 'jmx_content' "
+                   "manquant ou invalide\n"), None
+    jtl_host = os.path.join(work_dir, "result.jtl")
     cmd = [
         "docker","run","--rm",
-        "-v", f"{os.path.dirname(jmx)}:/test",
-        "-v", f"{out_dir}:/out",
+        "-v", f"{os.path.dirname(os.path.abspath(jmx))}:/test",
+        "-v", f"{work_dir}:/out",
         "justb4/jmeter",
         "-n","-t", f"/test/{os.path.basename(jmx)}",
         "-l","/out/result.jtl"
     ]
+    if "shard" in params:
+        cmd += [f"-Jgenerator.index={params['shard']}", f"-Jgenerator.count={params['shards']}"]
     rc, out, err = _run_cmd(cmd)
     logs = (out or "") + ("\n--- STDERR ---\n" + err if err else "")
-    arts: List[Dict] = []
-    if os.path.isfile(jtl_host):
-        size = os.path.getsize(jtl_host)
-        arts.append({"name": "result.jtl", "url": None, "size": size})
-    return (rc == 0), (logs or "[JMETER] Aucune sortie"), arts
+    return rc, logs, (jtl_host if os.path.isfile(jtl_host) else None)
+
+def _gatling_once(params: Dict, work_dir: str) -> Tuple[int, str, Optional[str]]:
+    sim = params.get("simulation")  # ex: computerdatabase.BasicSimulation si tu montes tes user-files
+    if sim and not _CLASS_RE.match(sim):
+        return 2, f"[GATLING] Nom de simulation invalide : {sim!r}\n", None
+    results_dir = os.path.join(work_dir, "results")
+    os.makedirs(results_dir, exist_ok=True)
+    cmd = ["docker","run","--rm","-v", f"{results_dir}:/opt/gatling/results"]
+    try:
+        user_files = _prepare_gatling_user_files(params, work_dir)
+    except ValueError as e:
+        return 2, f"[GATLING] {e}\n", None
+    if user_files:
+        cmd += ["-v", f"{user_files}:/opt/gatling/user-files"]
+    cmd += ["ghcr.io/gatling/gatling"]
+    if sim: cmd += ["-s", sim, "-rm", "local"]
+    rc, out, err = _run_cmd(cmd)
+    logs = (out or "") + ("\n--- STDERR ---\n" + err if err else "")
+    return rc, logs, find_simulation_log(results_dir)
+
+_LOCAL_GENERATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "load_generator.py")
+
+def _local_once(params: Dict, work_dir: str) -> Tuple[int, str, Optional[str]]:
+    """Moteur local (load_generator.py en sous-processus) : plans générés uniquement."""
+    if not params.get("endpoints"):
+        return 2, "[LOCAL] Moteur local : plan généré (/load-scenarios) requis\n", None
+    spec_path = os.path.join(work_dir, "spec.json")
+    jtl = os.path.join(work_dir, "result.jtl")
+    spec = {k: params.get(k) for k in ("base_url", "endpoints", "profile", "feeder_csv", "shard", "start_at", "timeout_s")}
+    spec["max_workers"] = min(int(params.get("max_workers") or settings.LOAD_MAX_WORKERS), settings.LOAD_MAX_WORKERS)
+    with open(spec_path, "w", encoding="utf-8") as f:
+        json.dump(spec, f)
+    rc, out, err = _run_cmd([sys.executable, _LOCAL_GENERATOR, spec_path, jtl])
+    logs = (out or "") + ("\n--- STDERR ---\n" + err if err else "")
+    return rc, logs, (jtl if os.path.isfile(jtl) else None)
+
+def check_load_params(params: Dict) -> Optional[str]:
+    """Message d'erreur si les paramètres dépassent les plafonds (générateurs, workers, moteur local)."""
+    try:
+        generators = int(params.get("generators") or 1)
+        workers = int(params.get("max_workers") or 1)
+    except (TypeError, ValueError):
+        return "generators / max_workers : entiers attendus"
+    if not 1 <= generators <= settings.LOAD_MAX_GENERATORS:
+        return f"generators : entre 1 et {settings.LOAD_MAX_GENERATORS}"
+    if not 1 <= workers <= settings.LOAD_MAX_WORKERS:
+        return f"max_workers : entre 1 et {settings.LOAD_MAX_WORKERS}"
+    if (params.get("engine") or "docker").lower() == "local" and not settings.LOAD_LOCAL_ENGINE:
+        return "moteur local désactivé (LOAD_LOCAL_ENGINE)"
+    return None
+
+def _run_load(kind: str, params: Dict, exec_id: Optional[str]) -> Tuple[bool, str, List[Dict]]:
+    """
+    Un ou N générateurs (params["generators"]) ; moteur docker (défaut) ou local
+    (params["engine"] = "local"). Les résultats de tous les générateurs sont
+    analysés dans le MÊME agrégateur : histogrammes sommés, séries alignées sur
+    l'horodatage absolu — pas de moyenne de percentiles.
+    """
+    tag = kind.upper()
+    error = check_load_params(params)
+    if error:
+        return False, f"[{tag}] Paramètres refusés : {error}\n", []
+    n = int(params.get("generators") or 1)
+    engine = (params.get("engine") or "docker").lower()
+    once = _local_once if engine == "local" else (_gatling_once if kind == "gatling" else _jmeter_once)
+    work_dir = tempfile.mkdtemp(prefix=f"{kind}-")
+    try:
+        start_at = time.time() + (1.0 if n > 1 else 0.0)
+        shards = []
+        for i in range(n):
+            sp = shard_params(params, i, n) if n > 1 else dict(params)
+            sp["start_at"] = start_at
+            shard_dir = os.path.join(work_dir, f"gen-{i}") if n > 1 else work_dir
+            os.makedirs(shard_dir, exist_ok=True)
+            shards.append((sp, shard_dir))
+        with RUNNER_PHASE.time(kind, "execute"):
+            if n == 1:
+                results = [once(*shards[0])]
+            else:
+                with ThreadPoolExecutor(max_workers=n) as pool:
+                    results = list(pool.map(lambda a: once(*a), shards))
+
+        logs = ""
+        for i, (rc, out, _path) in enumerate(results):
+            logs += (f"\n=== GENERATEUR {i + 1}/{n} (rc={rc}) ===\n" if n > 1 else "") + out
+        arts: List[Dict] = []
+        files = [r[2] for r in results if r[2]]
+        if files:
+            agg = LoadAggregator()
+            fmt = ""
+            t_analyze = time.perf_counter()
+            try:
+                for path in files:
+                    _, fmt = analyze_gatling_log(path, agg) if path.endswith("simulation.log") else analyze_jtl(path, agg)
+                logs += _publish_report(exec_id, agg, fmt if n == 1 else f"{fmt}-merged-x{n}", tag,
+                                        "requêtes" if kind == "gatling" else "échantillons")
+            except Exception as e:
+                logs += f"\n[{tag}] Analyse des résultats impossible: {e}\n"
+            RUNNER_PHASE.observe(time.perf_counter() - t_analyze, kind, "analyze")
+            t_archive = time.perf_counter()
+            for i, path in enumerate(files):
+                suffix = f"-{i + 1}" if n > 1 else ""
+                if path.endswith("simulation.log"):
+                    run_dir = os.path.dirname(path)
+                    arts.append(_archive_dir(run_dir, f"{os.path.basename(run_dir)}{suffix}.tar.gz"))
+                    arts.append(register_file(path, name=f"simulation{suffix}.log"))
+                else:
+                    # copie en streaming + gzip : le JTL peut faire plusieurs Go
+                    arts.append(register_file(path, name=f"result{suffix}.jtl"))
+            RUNNER_PHASE.observe(time.perf_counter() - t_archive, kind, "archive")
+        ok = all(r[0] == 0 for r in results)
+        return ok, (logs or f"[{tag}] Aucune sortie"), arts
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def run_gatling(params: Dict, exec_id: Optional[str] = None) -> Tuple[bool, str, List[Dict]]:
+    return _run_load("gatling", params, exec_id)
+
+def run_jmeter(params: Dict, exec_id: Optional[str] = None) -> Tuple[bool, str, List[Dict]]:
+    return _run_load("jmeter", params, exec_id)
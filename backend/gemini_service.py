@@ -1,9 +1,12 @@
 import os
 from textwrap import dedent
+from time import perf_counter
 from typing import Optional
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from metrics import LLM_REQUESTS, LLM_SECONDS, LLM_TOKENS
+
 load_dotenv()
 
 api_key = os.getenv("GOOGLE_API_KEY")
@@ -73,13 +76,24 @@ def generate_test_case_with_gemini(code: str, test_type: str, language: str, mod
     prompt = _build_prompt(code, test_type, language)
     model_name = model or DEFAULT_GEMINI_MODEL
     m = genai.GenerativeModel(model_name)
-    out = m.generate_content(
-        prompt,
-        generation_config=genai.types.GenerationConfig(
-            temperature=0.2,
-            top_p=0.9,
-            candidate_count=1,
+    t0 = perf_counter()
+    outcome = "error"
+    try:
+        out = m.generate_content(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                temperature=0.2,
+                top_p=0.9,
+                candidate_count=1,
+            )
         )
-    )
+        outcome = "ok"
+    finally:
+        LLM_SECONDS.observe(perf_counter() - t0, "gemini", model_name, "1")
+        LLM_REQUESTS.inc("gemini", model_name, "1", outcome)
+    usage = getattr(out, "usage_metadata", None)  # absent des anciennes versions du SDK
+    if usage is not None:
+        LLM_TOKENS.inc("gemini", model_name, "prompt", amount=getattr(usage, "prompt_token_count", 0) or 0)
+        LLM_TOKENS.inc("gemini", model_name, "completion", amount=getattr(usage, "candidates_token_count", 0) or 0)
     text = (getattr(out, "text", "") or "").strip()
     return text.replace("```", "").strip()
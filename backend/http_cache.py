@@ -0,0 +1,74 @@
+# backend/http_cache.py
+"""
+Réponses des endpoints interrogés en boucle.
+
+- FastJSONResponse : sérialisation orjson (classe par défaut de l'app) ; les
+  handlers chauds la renvoient directement pour sauter jsonable_encoder ;
+- Compression : gzip au-delà de GZIP_MIN_BYTES, sauf artefacts et Range ;
+- ETag faibles dérivés d'une version (jamais d'un hash du corps) : un client
+  à jour reçoit un 304 sans corps, avant toute lecture ou sérialisation.
+"""
+from __future__ import annotations
+from typing import Dict, Optional
+
+import orjson
+from bson import ObjectId
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+def _default(v):
+    if isinstance(v, ObjectId):
+        return str(v)
+    raise TypeError(f"non sérialisable : {type(v).__name__}")
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class Compression:
+    """GZipMiddleware, sauf réponses déjà compressées ou partielles (artefacts, Range, export ?gzip=true)."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, compresslevel: int = 5):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=compresslevel)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and not _skip(scope):
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+def _skip(scope: Scope) -> bool:
+    path = scope.get("path") or ""
+    if path.startswith("/artifact/") or "range" in Headers(scope=scope):
+        return True
+    return path.endswith("/export") and b"gzip=true" in (scope.get("query_string") or b"").lower()
+
+# ============================
+# Requêtes conditionnelles
+# ============================
+
+def etag(*parts) -> str:
+    return 'W/"' + "-".join(str(p) for p in parts) + '"'
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    """Comparaison faible (RFC 9110) de If-None-Match avec l'ETag courant."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque(tag) in {_opaque(t) for t in if_none_match.split(",")}
+
+def cache_headers(tag: str) -> Dict[str, str]:
+    # no-cache : le navigateur garde la réponse mais revalide à chaque appel
+    return {"ETag": tag, "Cache-Control": "no-cache"}
+
+def not_modified(tag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(tag))
@@ -1,8 +1,37 @@
 # jobs.py
+import threading
 from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
 from typing import Callable, Any, Dict
 
+from metrics import JOBS, JOBS_SUBMITTED, JOB_RUN, JOB_WAIT, gauge
+
 _pool = ThreadPoolExecutor(max_workers=4)
+_running = 0
+_running_lock = threading.Lock()
 
 def submit_job(_name: str, func: Callable[..., Any], kwargs: Dict[str, Any]):
-    _pool.submit(func, **kwargs)
+    submitted = perf_counter()
+    JOBS_SUBMITTED.inc(_name)
+
+    def _run():
+        global _running
+        t0 = perf_counter()
+        JOB_WAIT.observe(t0 - submitted, _name)
+        with _running_lock:
+            _running += 1
+        outcome = "error"
+        try:
+            func(**kwargs)
+            outcome = "ok"
+        finally:
+            with _running_lock:
+                _running -= 1
+            JOB_RUN.observe(perf_counter() - t0, _name)
+            JOBS.inc(_name, outcome)
+
+    _pool.submit(_run)
+
+gauge("jobs_queue_depth", "Jobs en attente d'un worker", lambda: _pool._work_queue.qsize())
+gauge("jobs_running", "Jobs en cours d'exécution", lambda: _running)
+gauge("jobs_workers", "Taille du pool de jobs", lambda: _pool._max_workers)
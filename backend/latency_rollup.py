@@ -0,0 +1,219 @@
+# backend/latency_rollup.py
+"""
+Agrégats de latence incrémentaux à partir d'audit_logs.
+
+- une ligne par (minute | heure, méthode, gabarit de route, classe de statut) :
+  count, sum_ms, max_ms et histogramme log (~26 % de largeur relative par case) ;
+- passe incrémentale sur les minutes complètes depuis le dernier point de reprise ;
+  les documents sont réécrits ($set) et non incrémentés : rejouer une passe est sans effet ;
+- les heures touchées sont recalculées à partir des minutes ;
+- percentiles interpolés dans la case de l'histogramme fusionné.
+"""
+from __future__ import annotations
+import bisect, threading, time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, ReplaceOne
+
+from database import db, ensure_ttl_index
+from settings import settings
+from audit import audit_col
+
+minute_col = db["latency_1m"]
+hour_col = db["latency_1h"]
+state_col = db["rollup_state"]
+
+# bornes hautes des cases (ms) : 10^(i/10), de 0.1 ms à 100 s ; dernière case = au-delà
+BOUNDS: List[float] = [round(10 ** (i / 10), 3) for i in range(-10, 51)]
+_MINUTE_WINDOW_H = 6  # au-delà, la requête lit les agrégats horaires
+_STATE_ID = "latency"
+
+_indexes_ready = False
+_thread: Optional[threading.Thread] = None
+_stats = {"passes": 0, "raw_read": 0, "minutes_written": 0, "hours_written": 0, "last_run": None,
+          "last_error": None}
+
+def ensure_indexes() -> None:
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    for col, days in ((minute_col, settings.ROLLUP_MINUTE_TTL_DAYS), (hour_col, settings.ROLLUP_HOUR_TTL_DAYS)):
+        col.create_index([("route", ASCENDING), ("method", ASCENDING), ("t", ASCENDING)])
+        ensure_ttl_index(col, "t", days * 86400)
+    _indexes_ready = True
+
+def status_class(status) -> str:
+    try:
+        return f"{int(status) // 100}xx"
+    except (TypeError, ValueError):
+        return "unknown"
+
+def bucket_of(ms: float) -> int:
+    return bisect.bisect_left(BOUNDS, ms)
+
+def _key(t: datetime, method: str, route: str, cls: str) -> str:
+    return f"{t.strftime('%Y%m%d%H%M')}|{method}|{route}|{cls}"
+
+def _empty(t: datetime, method: str, route: str, cls: str) -> Dict:
+    return {"_id": _key(t, method, route, cls), "t": t, "method": method, "route": route, "status_class": cls,
+            "count": 0, "sum_ms": 0.0, "max_ms": 0.0, "hist": {}}
+
+def _merge(acc: Dict, other: Dict) -> None:
+    acc["count"] += other.get("count", 0)
+    acc["sum_ms"] += other.get("sum_ms", 0.0)
+    acc["max_ms"] = max(acc["max_ms"], other.get("max_ms", 0.0))
+    for b, n in (other.get("hist") or {}).items():
+        acc["hist"][b] = acc["hist"].get(b, 0) + n
+
+def _floor(ts: float, step: int) -> float:
+    return ts - ts % step
+
+# ============================
+# Passe incrémentale
+# ============================
+
+def _minutes(since: float, until: float) -> Dict[Tuple, Dict]:
+    acc: Dict[Tuple, Dict] = {}
+    cur = audit_col.find({"ts": {"$gte": since, "$lt": until}},
+                         {"_id": 0, "ts": 1, "method": 1, "route": 1, "status": 1, "dur_ms": 1, "sample": 1}
+                         ).batch_size(5000)
+    for d in cur:
+        _stats["raw_read"] += 1
+        t = datetime.utcfromtimestamp(_floor(d["ts"], 60))
+        # anciens enregistrements sans gabarit : regroupés, jamais le chemin brut
+        k = (t, d.get("method") or "?", d.get("route") or "(inconnu)", status_class(d.get("status")))
+        row = acc.get(k)
+        if row is None:
+            row = acc[k] = _empty(*k)
+        w = int(d.get("sample") or 1)  # enregistrements échantillonnés : poids
+        ms = float(d.get("dur_ms") or 0)
+        row["count"] += w
+        row["sum_ms"] += ms * w
+        row["max_ms"] = max(row["max_ms"], ms)
+        b = str(bucket_of(ms))
+        row["hist"][b] = row["hist"].get(b, 0) + w
+    return acc
+
+def _rebuild_hours(hours: Iterable[datetime]) -> int:
+    hours = sorted(set(hours))
+    if not hours:
+        return 0
+    acc: Dict[Tuple, Dict] = {}
+    for d in minute_col.find({"t": {"$gte": hours[0], "$lt": hours[-1] + timedelta(hours=1)}}):
+        h = d["t"].replace(minute=0, second=0, microsecond=0)
+        if h not in hours:
+            continue
+        k = (h, d["method"], d["route"], d["status_class"])
+        row = acc.get(k)
+        if row is None:
+            row = acc[k] = _empty(*k)
+        _merge(row, d)
+    if acc:
+        hour_col.bulk_write([ReplaceOne({"_id": r["_id"]}, r, upsert=True) for r in acc.values()], ordered=False)
+    return len(acc)
+
+def rollup_once(now: Optional[float] = None) -> Dict:
+    """Agrège les minutes complètes depuis le point de reprise (idempotent)."""
+    ensure_indexes()
+    now = time.time() if now is None else now
+    until = _floor(now - settings.ROLLUP_LAG_S, 60)
+    state = state_col.find_one({"_id": _STATE_ID}) or {}
+    since = state.get("watermark") or _floor(now - settings.ROLLUP_BACKFILL_H * 3600, 60)
+    if until <= since:
+        return {"since": since, "until": until, "minutes": 0, "hours": 0}
+    rows = _minutes(since, until)
+    if rows:
+        minute_col.bulk_write([ReplaceOne({"_id": r["_id"]}, r, upsert=True) for r in rows.values()], ordered=False)
+    hours = _rebuild_hours(k[0].replace(minute=0) for k in rows)
+    state_col.update_one({"_id": _STATE_ID}, {"$set": {"watermark": until, "updated_at": datetime.utcnow()}},
+                         upsert=True)
+    _stats["passes"] += 1
+    _stats["minutes_written"] += len(rows)
+    _stats["hours_written"] += hours
+    _stats["last_run"] = datetime.utcnow().isoformat() + "Z"
+    return {"since": since, "until": until, "minutes": len(rows), "hours": hours}
+
+def _loop() -> None:
+    while True:
+        try:
+            rollup_once()
+            _stats["last_error"] = None
+        except Exception as e:
+            if _stats["last_error"] != repr(e):
+                print("ERROR latency rollup:", repr(e))
+            _stats["last_error"] = repr(e)
+        time.sleep(max(5, settings.ROLLUP_INTERVAL_S))
+
+def start() -> None:
+    """Démarre (une seule fois) la passe périodique en arrière-plan."""
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _thread = threading.Thread(target=_loop, name="latency-rollup", daemon=True)
+        _thread.start()
+
+def stats() -> Dict:
+    state = state_col.find_one({"_id": _STATE_ID}) or {}
+    return {**_stats, "watermark": state.get("watermark")}
+
+# ============================
+# Requêtes
+# ============================
+
+def percentile(hist: Dict[str, int], count: int, q: float, max_ms: float) -> Optional[float]:
+    """Percentile q (0-100) interpolé linéairement dans la case qui le contient."""
+    if count <= 0:
+        return None
+    target = q / 100.0 * count
+    seen = 0
+    for b in sorted(hist, key=int):
+        n = hist[b]
+        i = int(b)
+        if seen + n >= target:
+            lo = BOUNDS[i - 1] if i > 0 else 0.0
+            hi = BOUNDS[i] if i < len(BOUNDS) else max_ms
+            v = lo + (min(hi, max_ms) - lo) * ((target - seen) / n if n else 1.0)
+            return round(min(max(v, lo), max_ms), 2)
+        seen += n
+    return round(max_ms, 2)
+
+def _summary(row: Dict, percentiles: List[float]) -> Dict:
+    out = {"count": row["count"], "mean_ms": round(row["sum_ms"] / row["count"], 2) if row["count"] else None,
+           "max_ms": round(row["max_ms"], 2)}
+    for q in percentiles:
+        out[f"p{q:g}_ms"] = percentile(row["hist"], row["count"], q, row["max_ms"])
+    return out
+
+def query(route: Optional[str] = None, method: Optional[str] = None, status_class: Optional[str] = None,
+          hours: float = 24, percentiles: Optional[List[float]] = None, limit: int = 50) -> Dict:
+    """
+    Percentiles de latence sur la fenêtre demandée, lus dans les agrégats.
+    Sans `route` : total + détail par (méthode, route), les plus fréquentes d'abord.
+    """
+    percentiles = percentiles or [50, 95, 99]
+    now = datetime.utcnow()
+    use_minutes = hours <= _MINUTE_WINDOW_H
+    col = minute_col if use_minutes else hour_col
+    start = now - timedelta(hours=hours)
+    start = start.replace(second=0, microsecond=0) if use_minutes else start.replace(minute=0, second=0, microsecond=0)
+    flt: Dict = {"t": {"$gte": start}}
+    if route:
+        flt["route"] = route
+    if method:
+        flt["method"] = method.upper()
+    if status_class:
+        flt["status_class"] = status_class
+    total = _empty(start, method or "*", route or "*", status_class or "*")
+    per_route: Dict[Tuple[str, str], Dict] = {}
+    for d in col.find(flt, {"_id": 0, "t": 0}):
+        _merge(total, d)
+        k = (d["method"], d["route"])
+        if k not in per_route:
+            per_route[k] = _empty(start, *k, status_class or "*")
+        _merge(per_route[k], d)
+    out = {"granularity": "minute" if use_minutes else "hour", "from": start.isoformat() + "Z",
+           "route": route, "method": method, "status_class": status_class, **_summary(total, percentiles)}
+    if not route:
+        top = sorted(per_route.items(), key=lambda kv: kv[1]["count"], reverse=True)[:limit]
+        out["routes"] = [{"method": m, "route": r, **_summary(row, percentiles)} for (m, r), row in top]
+    return out
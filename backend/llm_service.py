@@ -1,8 +1,11 @@
 import os
 import re
 import requests
+from time import perf_counter
 from typing import Optional, List, Dict
 
+from metrics import LLM_REQUESTS, LLM_SECONDS, LLM_TOKENS
+
 # -----------------------------
 # 0) Modèle & endpoint Ollama
 # -----------------------------
@@ -263,17 +266,31 @@ def _fallback_spring_mockmvc_from_spec(spec: List[Dict], controller_class: str =
 # 4) Appel Ollama
 # ============================
 
-def _ollama_call(payload: dict, timeout: int = 90) -> str:
-    r = requests.post(OLLAMA_URL, json=payload, timeout=timeout)
-    if r.status_code != 200:
-        try:
-            detail = r.json()
-        except Exception:
-            detail = r.text
-        if "model not found" in str(detail).lower():
-            raise Exception(f"Model {payload.get('model')} not found. Faites: ollama pull {payload.get('model')}")
-        raise Exception(f"Ollama error {r.status_code}: {detail}")
-    return (r.json().get("response") or "").strip()
+def _ollama_call(payload: dict, timeout: int = 90, pass_no: int = 1) -> str:
+    model, p = payload.get("model") or "", str(pass_no)
+    t0 = perf_counter()
+    outcome = "error"
+    try:
+        r = requests.post(OLLAMA_URL, json=payload, timeout=timeout)
+        if r.status_code != 200:
+            try:
+                detail = r.json()
+            except Exception:
+                detail = r.text
+            if "model not found" in str(detail).lower():
+                raise Exception(f"Model {payload.get('model')} not found. Faites: ollama pull {payload.get('model')}")
+            raise Exception(f"Ollama error {r.status_code}: {detail}")
+        data = r.json()
+        outcome = "ok"
+    except requests.Timeout:
+        outcome = "timeout"
+        raise
+    finally:
+        LLM_SECONDS.observe(perf_counter() - t0, "ollama", model, p)
+        LLM_REQUESTS.inc("ollama", model, p, outcome)
+    LLM_TOKENS.inc("ollama", model, "prompt", amount=data.get("prompt_eval_count") or 0)
+    LLM_TOKENS.inc("ollama", model, "completion", amount=data.get("eval_count") or 0)
+    return (data.get("response") or "").strip()
 
 def _is_stub_or_too_short(text: str) -> bool:
     t = (text or "").strip()
@@ -322,7 +339,8 @@ def generate_test_case_ollama(
             "NE PAS APPELER DIRECTEMENT LES MÉTHODES JAVA. CODE UNIQUEMENT, SANS MARKDOWN."
         )
         raw2 = _ollama_call({"model": model_name, "prompt": reinforced, "stream": False,
-                             "options": {**base_options, "temperature": 0.05, "num_predict": 2304}}, timeout_seconds)
+                             "options": {**base_options, "temperature": 0.05, "num_predict": 2304}}, timeout_seconds,
+                            pass_no=2)
         code2 = _postprocess_response(raw2) or _strip_to_first_code_like_line(raw2)
         if not _is_stub_or_too_short(code2) and _looks_like_http_test_java(code2) and (not spec or any(_covers_endpoint(code2, ep) for ep in spec)):
             return code2
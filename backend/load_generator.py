@@ -0,0 +1,112 @@
+# backend/load_generator.py
+"""
+Générateur de charge local (sans Docker) pour les plans produits par load_scenarios.
+
+Modèle ouvert comme Gatling : des "utilisateurs" arrivent au débit du profil
+et enchaînent une fois chaque endpoint. Les échantillons sont écrits en JTL CSV
+(même format que JMeter), donc analysés et fusionnés par load_report.
+
+Utilisable en sous-processus (un par shard) :
+    python load_generator.py spec.json out.jtl
+"""
+from __future__ import annotations
+import csv, json, re, sys, threading, time
+import urllib.error, urllib.parse, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List
+
+JTL_HEADER = ["timeStamp", "elapsed", "label", "responseCode", "responseMessage", "threadName",
+              "dataType", "success", "failureMessage", "bytes"]
+_PATH_VAR = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+_MAX_WORKERS = 64  # plafond dur du script ; le runner borne déjà à LOAD_MAX_WORKERS
+
+def _arrivals(profile: Dict) -> Iterator[float]:
+    """Instants d'arrivée (secondes depuis le départ) selon le profil."""
+    d = float(profile.get("duration_s") or 1)
+    rps = float(profile.get("rps") or profile.get("users") or 1)
+    kind = profile.get("type") or "ramp"
+    ramp = min(float(profile.get("ramp_s") or 0), d) if kind == "ramp" else 0.0
+    spike_at = float(profile.get("spike_at_s") or 0)
+    spike_n = int(profile.get("spike_users") or 0) if kind == "spike" else 0
+    t = 0.0
+    spiked = spike_n == 0
+    while t < d:
+        if not spiked and t >= spike_at:
+            for _ in range(spike_n):
+                yield spike_at
+            spiked = True
+        yield t
+        # débit instantané : rampe linéaire 1 -> rps, puis palier
+        rate = (1.0 + (rps - 1.0) * t / ramp) if (ramp and t < ramp) else rps
+        t += 1.0 / max(rate, 0.001)
+    if not spiked and spike_at < d:
+        for _ in range(spike_n):
+            yield spike_at
+
+def _feeder_rows(feeder_csv: str) -> List[Dict[str, str]]:
+    if not feeder_csv:
+        return [{}]
+    rows = list(csv.DictReader(feeder_csv.splitlines()))
+    return rows or [{}]
+
+def _build_url(base_url: str, ep: Dict, row: Dict[str, str]) -> str:
+    path = _PATH_VAR.sub(lambda m: urllib.parse.quote(row.get(m.group(1), "1")), ep["path"])
+    query = urllib.parse.urlencode([(p, row.get(p, "1")) for p in (ep.get("params") or [])])
+    return base_url.rstrip("/") + path + (f"?{query}" if query else "")
+
+def run_spec(spec: Dict, out_path: str) -> int:
+    """Exécute le plan et écrit le JTL ; renvoie le nombre d'échantillons."""
+    base_url = spec.get("base_url") or "http://localhost:8080"
+    endpoints = spec.get("endpoints") or []
+    rows = _feeder_rows(spec.get("feeder_csv") or "")
+    timeout = float(spec.get("timeout_s") or 10)
+    shard = spec.get("shard", 0)
+    lock = threading.Lock()
+    count = [0]
+
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(JTL_HEADER)
+
+        def _user(n: int) -> None:
+            row = rows[n % len(rows)]
+            thread = f"gen-{shard}-{threading.get_ident() % 10000}"
+            for ep in endpoints:
+                url = _build_url(base_url, ep, row)
+                req = urllib.request.Request(url, method=ep["method"],
+                                             data=b"" if ep["method"] in ("POST", "PUT") else None)
+                start = time.time()
+                code, msg, ok, nbytes = "", "", False, 0
+                try:
+                    with urllib.request.urlopen(req, timeout=timeout) as r:
+                        nbytes = len(r.read())
+                        code, msg, ok = str(r.status), r.reason or "", 200 <= r.status < 400
+                except urllib.error.HTTPError as e:
+                    code, msg = str(e.code), str(e.reason)
+                except Exception as e:
+                    code, msg = "Non HTTP response code", type(e).__name__
+                elapsed = int((time.time() - start) * 1000)
+                with lock:
+                    w.writerow([int(start * 1000), elapsed, f"{ep['method']} {ep['path']}", code, msg,
+                                thread, "text", "true" if ok else "false", "" if ok else msg, nbytes])
+                    count[0] += 1
+
+        # départ synchronisé entre shards (start_at = epoch commun)
+        t0 = float(spec.get("start_at") or time.time())
+        if t0 > time.time():
+            time.sleep(t0 - time.time())
+        with ThreadPoolExecutor(max_workers=max(1, min(int(spec.get("max_workers") or _MAX_WORKERS), _MAX_WORKERS))) as pool:
+            for n, at in enumerate(_arrivals(spec.get("profile") or {})):
+                delay = t0 + at - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(_user, n)
+    return count[0]
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python load_generator.py spec.json out.jtl", file=sys.stderr)
+        sys.exit(2)
+    with open(sys.argv[1], encoding="utf-8") as fh:
+        n = run_spec(json.load(fh), sys.argv[2])
+    print(f"[LOCAL] {n} échantillons -> {sys.argv[2]}")
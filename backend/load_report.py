@@ -0,0 +1,431 @@
+# backend/load_report.py
+"""
+Analyse streaming des résultats de tirs de charge (JTL JMeter CSV/XML,
+simulation.log Gatling).
+
+Mémoire constante quelle que soit la taille du fichier :
+- latences dans un histogramme log-linéaire façon HDR (erreur relative < 1,6 %) ;
+- série temporelle par seconde, dont la résolution double dès qu'elle dépasse
+  _MAX_POINTS (les soak tests de plusieurs jours restent bornés) ;
+- nombre de labels plafonné (_MAX_LABELS), le surplus tombe dans "(other)".
+"""
+from __future__ import annotations
+import csv, gzip, io, json, math, os
+import xml.etree.ElementTree as ET
+from typing import Dict, IO, Iterator, List, Optional, Tuple
+
+from artifacts import open_path, save_bytes, stat
+
+_SUB_BITS = 7
+_SUB = 1 << _SUB_BITS          # valeurs < 128 ms : exactes
+_HALF = _SUB >> 1
+_MAX_LABELS = 500
+_MAX_POINTS = 4096
+_CHART_POINTS = 300
+PERCENTILES = (50, 75, 90, 95, 99, 99.9)
+
+# ============================
+# 1) Histogramme de latences
+# ============================
+
+def _bucket(v: int) -> int:
+    if v < _SUB:
+        return max(0, v)
+    shift = v.bit_length() - _SUB_BITS
+    return (shift + 1) * _HALF + ((v >> shift) - _HALF)
+
+def _bucket_bounds(idx: int) -> Tuple[int, int]:
+    if idx < _SUB:
+        return idx, idx
+    shift = idx // _HALF - 1
+    m = idx % _HALF + _HALF
+    return m << shift, ((m + 1) << shift) - 1
+
+class LatencyHistogram:
+    """Histogramme creux {bucket: count} fusionnable (merge = somme des buckets)."""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+
+    def record(self, v: int, n: int = 1) -> None:
+        v = int(v)
+        b = _bucket(v)
+        self.counts[b] = self.counts.get(b, 0) + n
+        self.count += n
+        self.total += v * n
+        self.min = v if self.min is None else min(self.min, v)
+        self.max = v if self.max is None else max(self.max, v)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for b, c in other.counts.items():
+            self.counts[b] = self.counts.get(b, 0) + c
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, p: float) -> Optional[int]:
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(p / 100.0 * self.count))
+        seen = 0
+        for b in sorted(self.counts):
+            seen += self.counts[b]
+            if seen >= rank:
+                lo, hi = _bucket_bounds(b)
+                return min(max((lo + hi) // 2, self.min), self.max)
+        return self.max
+
+    def mean(self) -> Optional[float]:
+        return (self.total / self.count) if self.count else None
+
+    def buckets(self) -> List[Tuple[int, int]]:
+        """[(valeur représentative, count)] triés — utile aux tests statistiques."""
+        return [(sum(_bucket_bounds(b)) // 2, self.counts[b]) for b in sorted(self.counts)]
+
+    def to_dict(self) -> Dict:
+        return {"counts": {str(b): c for b, c in self.counts.items()}, "count": self.count,
+                "total": self.total, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "LatencyHistogram":
+        h = cls()
+        h.counts = {int(b): int(c) for b, c in (d.get("counts") or {}).items()}
+        h.count = int(d.get("count") or 0)
+        h.total = int(d.get("total") or 0)
+        h.min, h.max = d.get("min"), d.get("max")
+        return h
+
+# ============================
+# 2) Agrégation par label + série temporelle
+# ============================
+
+class _LabelStats:
+    __slots__ = ("hist", "errors", "bytes", "codes")
+
+    def __init__(self):
+        self.hist = LatencyHistogram()
+        self.errors = 0
+        self.bytes = 0
+        self.codes: Dict[str, int] = {}
+
+class LoadAggregator:
+    """Accumule des échantillons (ts_ms, elapsed_ms, label, ok, code, bytes)."""
+
+    def __init__(self):
+        self.labels: Dict[str, _LabelStats] = {}
+        self.overall = _LabelStats()
+        self.first_ts: Optional[int] = None
+        self.last_ts: Optional[int] = None
+        self.resolution_s = 1
+        # seconde (alignée sur la résolution) -> [count, errors, sum_elapsed]
+        self.series: Dict[int, List[int]] = {}
+
+    def _label(self, name: str) -> _LabelStats:
+        st = self.labels.get(name)
+        if st is None:
+            if len(self.labels) >= _MAX_LABELS:
+                name = "(other)"
+                st = self.labels.get(name)
+                if st is not None:
+                    return st
+            st = self.labels[name] = _LabelStats()
+        return st
+
+    def _coarsen(self) -> None:
+        self.resolution_s *= 2
+        merged: Dict[int, List[int]] = {}
+        for sec, (c, e, s) in self.series.items():
+            k = sec - sec % self.resolution_s
+            acc = merged.setdefault(k, [0, 0, 0])
+            acc[0] += c; acc[1] += e; acc[2] += s
+        self.series = merged
+
+    def add(self, ts_ms: int, elapsed_ms: int, label: str, ok: bool, code: str = "", nbytes: int = 0) -> None:
+        for st in (self._label(label or "(sans label)"), self.overall):
+            st.hist.record(elapsed_ms)
+            st.bytes += nbytes
+            if not ok:
+                st.errors += 1
+                key = code or "?"
+                if key in st.codes or len(st.codes) < 50:
+                    st.codes[key] = st.codes.get(key, 0) + 1
+        end = ts_ms + elapsed_ms
+        self.first_ts = ts_ms if self.first_ts is None else min(self.first_ts, ts_ms)
+        self.last_ts = end if self.last_ts is None else max(self.last_ts, end)
+        sec = ts_ms // 1000
+        sec -= sec % self.resolution_s
+        acc = self.series.get(sec)
+        if acc is None:
+            if len(self.series) >= _MAX_POINTS:
+                self._coarsen()
+                sec -= sec % self.resolution_s
+                acc = self.series.setdefault(sec, [0, 0, 0])
+            else:
+                acc = self.series[sec] = [0, 0, 0]
+        acc[0] += 1
+        acc[1] += 0 if ok else 1
+        acc[2] += elapsed_ms
+
+    def merge(self, other: "LoadAggregator") -> None:
+        """Fusion exacte (histogrammes sommés, séries réalignées) — tirs distribués."""
+        for name, st in other.labels.items():
+            mine = self._label(name)
+            mine.hist.merge(st.hist); mine.errors += st.errors; mine.bytes += st.bytes
+            for k, v in st.codes.items():
+                mine.codes[k] = mine.codes.get(k, 0) + v
+        o = self.overall
+        o.hist.merge(other.overall.hist); o.errors += other.overall.errors; o.bytes += other.overall.bytes
+        for k, v in other.overall.codes.items():
+            o.codes[k] = o.codes.get(k, 0) + v
+        if other.first_ts is not None:
+            self.first_ts = other.first_ts if self.first_ts is None else min(self.first_ts, other.first_ts)
+            self.last_ts = other.last_ts if self.last_ts is None else max(self.last_ts, other.last_ts)
+        while self.resolution_s < other.resolution_s:
+            self._coarsen()
+        for sec, (c, e, s) in other.series.items():
+            k = sec - sec % self.resolution_s
+            acc = self.series.setdefault(k, [0, 0, 0])
+            acc[0] += c; acc[1] += e; acc[2] += s
+        while len(self.series) > _MAX_POINTS:
+            self._coarsen()
+
+    def _duration_s(self) -> float:
+        if self.first_ts is None:
+            return 0.0
+        return max(0.001, (self.last_ts - self.first_ts) / 1000.0)
+
+    def _stats(self, st: _LabelStats, duration: float) -> Dict:
+        h = st.hist
+        return {
+            "count": h.count,
+            "errors": st.errors,
+            "error_rate": round(st.errors / h.count, 6) if h.count else 0.0,
+            "throughput_rps": round(h.count / duration, 3) if duration else 0.0,
+            "bytes": st.bytes,
+            "min_ms": h.min,
+            "max_ms": h.max,
+            "mean_ms": round(h.mean(), 2) if h.count else None,
+            "percentiles_ms": {f"p{p:g}": h.percentile(p) for p in PERCENTILES},
+            "error_codes": dict(sorted(st.codes.items(), key=lambda kv: -kv[1])[:10]),
+        }
+
+    def _chart_series(self, max_points: int) -> Dict:
+        if not self.series:
+            return {"resolution_s": self.resolution_s, "points": []}
+        secs = sorted(self.series)
+        step = self.resolution_s
+        while (secs[-1] - secs[0]) // step + 1 > max_points:
+            step *= 2
+        buckets: Dict[int, List[int]] = {}
+        for sec in secs:
+            c, e, s = self.series[sec]
+            k = sec - sec % step
+            acc = buckets.setdefault(k, [0, 0, 0])
+            acc[0] += c; acc[1] += e; acc[2] += s
+        return {
+            "resolution_s": step,
+            "points": [{"t": k, "rps": round(c / step, 3), "errors": e, "mean_ms": round(s / c, 2) if c else None}
+                       for k, (c, e, s) in sorted(buckets.items())],
+        }
+
+    def summary(self, fmt: str = "", max_points: int = _CHART_POINTS, with_histograms: bool = True) -> Dict:
+        d = self._duration_s()
+        out = {
+            "format": fmt,
+            "start_ts": self.first_ts,
+            "end_ts": self.last_ts,
+            "duration_s": round(d, 3),
+            "overall": self._stats(self.overall, d),
+            "labels": {name: self._stats(st, d) for name, st in sorted(self.labels.items())},
+            "timeseries": self._chart_series(max_points),
+        }
+        if with_histograms:
+            out["histograms"] = {"overall": self.overall.hist.to_dict(),
+                                 **{name: st.hist.to_dict() for name, st in self.labels.items()}}
+        return out
+
+# ============================
+# 3) Parsing JTL (CSV ou XML, éventuellement gzip)
+# ============================
+
+_DEFAULT_CSV_HEADER = ["timeStamp", "elapsed", "label", "responseCode", "responseMessage", "threadName",
+                       "dataType", "success", "failureMessage", "bytes", "sentBytes", "grpThreads",
+                       "allThreads", "URL", "Latency", "IdleTime", "Connect"]
+
+def _open_binary(path: str) -> IO[bytes]:
+    f = open(path, "rb")
+    magic = f.read(2)
+    f.seek(0)
+    if magic == b"\x1f\x8b":
+        f.close()
+        return gzip.open(path, "rb")
+    return f
+
+def _detect_format(raw: IO[bytes]) -> str:
+    head = raw.peek(64)[:64] if hasattr(raw, "peek") else b""
+    return "xml" if head.lstrip().startswith(b"<") else "csv"
+
+def _int(s, default: int = 0) -> int:
+    try:
+        return int(float(s))
+    except (TypeError, ValueError):
+        return default
+
+def _iter_csv(text: IO[str]) -> Iterator[Tuple[int, int, str, bool, str, int]]:
+    reader = csv.reader(text)
+    first = next(reader, None)
+    if first is None:
+        return
+    if "timeStamp" in first or "elapsed" in first:
+        header, pending = first, None
+    else:
+        header, pending = _DEFAULT_CSV_HEADER, first
+    col = {name: i for i, name in enumerate(header)}
+    i_ts, i_el, i_lb = col.get("timeStamp", 0), col.get("elapsed", 1), col.get("label", 2)
+    i_rc, i_ok, i_by = col.get("responseCode", 3), col.get("success", 7), col.get("bytes", 9)
+
+    def _row(r):
+        if len(r) <= max(i_ts, i_el, i_lb):
+            return None
+        ok = (r[i_ok].strip().lower() == "true") if i_ok < len(r) else True
+        return (_int(r[i_ts]), _int(r[i_el]), r[i_lb], ok,
+                r[i_rc] if i_rc < len(r) else "", _int(r[i_by]) if i_by < len(r) else 0)
+
+    if pending is not None:
+        s = _row(pending)
+        if s: yield s
+    for r in reader:
+        s = _row(r)
+        if s: yield s
+
+def _iter_xml(raw: IO[bytes]) -> Iterator[Tuple[int, int, str, bool, str, int]]:
+    depth = 0
+    root = None
+    for event, el in ET.iterparse(raw, events=("start", "end")):
+        if root is None:
+            root = el  # <testResults> : les échantillons traités y restent accrochés sinon
+        if el.tag not in ("httpSample", "sample"):
+            continue
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0:
+            # seuls les échantillons de premier niveau comptent (pas les sous-requêtes)
+            yield (_int(el.get("ts")), _int(el.get("t")), el.get("lb") or "",
+                   (el.get("s") or "true") == "true", el.get("rc") or "", _int(el.get("by")))
+            root.clear()  # mémoire constante : détache les échantillons déjà lus
+
+def analyze_jtl(path: str, agg: Optional[LoadAggregator] = None) -> Tuple[LoadAggregator, str]:
+    """Parcourt un JTL en streaming ; renvoie (agrégateur, format)."""
+    agg = agg or LoadAggregator()
+    with _open_binary(path) as f:
+        raw = f if hasattr(f, "peek") else io.BufferedReader(f)
+        fmt = _detect_format(raw)
+        if fmt == "xml":
+            samples = _iter_xml(raw)
+        else:
+            samples = _iter_csv(io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline=""))
+        for ts, el, lb, ok, rc, by in samples:
+            agg.add(ts, el, lb, ok, rc, by)
+    return agg, f"jtl-{fmt}"
+
+def jtl_summary(path: str) -> Dict:
+    agg, fmt = analyze_jtl(path)
+    return agg.summary(fmt)
+
+# ============================
+# 3b) Parsing simulation.log Gatling (format texte tabulé)
+# ============================
+
+class UnsupportedLogFormat(ValueError):
+    pass
+
+def _iter_gatling(text: IO[str]) -> Iterator[Tuple[int, int, str, bool, str, int]]:
+    """
+    Lignes REQUEST selon les versions :
+      REQUEST  <userId>  <groupes>  <nom>  <start>  <end>  OK|KO  <message>   (2.x / 3.0-3.3)
+      REQUEST  <groupes>  <nom>  <start>  <end>  OK|KO  <message>             (3.4-3.9)
+    On repère la colonne OK/KO, les deux timestamps la précèdent, puis le nom.
+    """
+    for line in text:
+        if not line.startswith("REQUEST\t"):
+            continue
+        f = line.rstrip("\r\n").split("\t")
+        idx = next((i for i in range(4, len(f)) if f[i] in ("OK", "KO")), None)
+        if idx is None:
+            continue
+        start, end = _int(f[idx - 2]), _int(f[idx - 1])
+        name = f[idx - 3]
+        group = f[idx - 4] if idx >= 5 and f[idx - 4] and not f[idx - 4].isdigit() else ""
+        ok = f[idx] == "OK"
+        msg = f[idx + 1].strip() if not ok and idx + 1 < len(f) else ""
+        yield (start, max(0, end - start), f"{group}/{name}" if group else name, ok, msg[:200], 0)
+
+def analyze_gatling_log(path: str, agg: Optional[LoadAggregator] = None) -> Tuple[LoadAggregator, str]:
+    """Parcourt un simulation.log en streaming ; renvoie (agrégateur, format)."""
+    agg = agg or LoadAggregator()
+    with _open_binary(path) as f:
+        raw = f if hasattr(f, "peek") else io.BufferedReader(f)
+        head = raw.peek(16)[:16]
+        if head and not head.startswith((b"RUN", b"ASSERTION", b"USER", b"REQUEST", b"GROUP", b"ERROR")):
+            # Gatling >= 3.10 écrit un simulation.log binaire
+            raise UnsupportedLogFormat("simulation.log binaire (Gatling >= 3.10) non supporté")
+        for ts, el, lb, ok, rc, by in _iter_gatling(io.TextIOWrapper(raw, encoding="utf-8", errors="replace")):
+            agg.add(ts, el, lb, ok, rc, by)
+    return agg, "gatling-log"
+
+def find_simulation_log(results_dir: str) -> Optional[str]:
+    """Le simulation.log le plus récent sous results_dir (un sous-dossier par run)."""
+    best, best_m = None, -1.0
+    for dirpath, _dirs, files in os.walk(results_dir):
+        if "simulation.log" in files:
+            p = os.path.join(dirpath, "simulation.log")
+            m = os.path.getmtime(p)
+            if m > best_m:
+                best, best_m = p, m
+    return best
+
+# ============================
+# 4) Persistance : résumé compact + histogrammes en artefact
+# ============================
+
+def store_report(agg: LoadAggregator, fmt: str) -> Dict:
+    """
+    Résumé à poser sur l'exécution. Les histogrammes (nécessaires aux
+    comparaisons/fusions) partent dans un artefact JSON gzip pour garder
+    l'enregistrement compact.
+    """
+    report = agg.summary(fmt, with_histograms=False)
+    hists = {"overall": agg.overall.hist.to_dict(),
+             "labels": {name: st.hist.to_dict() for name, st in agg.labels.items()}}
+    art_id = save_bytes(json.dumps(hists).encode("utf-8"), suffix=".json", compress=True)
+    report["histograms_url"] = f"/artifact/{art_id}"
+    report["histograms_artifact"] = art_id
+    return report
+
+def load_histograms(report: Dict) -> Optional[Tuple[LatencyHistogram, Dict[str, LatencyHistogram]]]:
+    """Recharge (histogramme global, {label: histogramme}) depuis l'artefact d'un rapport."""
+    art_id = (report or {}).get("histograms_artifact")
+    if not art_id:
+        return None
+    try:
+        p = open_path(art_id)
+        meta = stat(art_id)
+    except FileNotFoundError:
+        return None
+    raw = p.read_bytes()
+    if meta.get("encoding") == "gzip":
+        raw = gzip.decompress(raw)
+    d = json.loads(raw)
+    labels = {name: LatencyHistogram.from_dict(h) for name, h in (d.get("labels") or {}).items()}
+    return LatencyHistogram.from_dict(d.get("overall") or {}), labels
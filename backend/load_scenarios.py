@@ -0,0 +1,310 @@
+# backend/load_scenarios.py
+"""
+Génération de scénarios de charge (plan JMeter .jmx ou simulation Gatling Java)
+à partir des endpoints Spring extraits par llm_service.parse_spring_endpoints.
+
+Profils d'injection (dict "profile") :
+- ramp     : montée progressive jusqu'à `users` (JMeter) / `rps` (Gatling) en `ramp_s`, puis palier ;
+- constant : débit constant `rps` pendant `duration_s` ;
+- spike    : débit constant + pic de `spike_users` à `spike_at_s` pendant `spike_duration_s`.
+Feeders : {"param": ["v1", "v2", ...]} -> feeder.csv (colonnes = paramètres).
+
+Le résultat est directement un dict de params accepté par run_jmeter / run_gatling.
+"""
+from __future__ import annotations
+import csv, io, re
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from xml.sax.saxutils import escape
+
+from llm_service import parse_spring_endpoints, _extract_controller_class_name
+
+PROFILE_DEFAULTS = {
+    "type": "ramp",
+    "users": 10,
+    "rps": 10.0,
+    "duration_s": 60,
+    "ramp_s": 10,
+    "spike_users": 50,
+    "spike_at_s": 30,
+    "spike_duration_s": 10,
+}
+FEEDER_FILE = "feeder.csv"
+_PATH_VAR = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+def normalize_profile(profile: Optional[Dict]) -> Dict:
+    p = {**PROFILE_DEFAULTS, **{k: v for k, v in (profile or {}).items() if v is not None}}
+    if p["type"] not in ("ramp", "constant", "spike"):
+        raise ValueError(f"Profil d'injection inconnu: {p['type']}")
+    for k in ("users", "duration_s", "ramp_s", "spike_users", "spike_at_s", "spike_duration_s"):
+        p[k] = max(0, int(p[k]))
+    p["rps"] = max(0.0, float(p["rps"]))
+    p["users"] = max(1, p["users"])
+    p["duration_s"] = max(1, p["duration_s"])
+    return p
+
+def _variables(endpoints: List[Dict]) -> List[str]:
+    names: List[str] = []
+    for e in endpoints:
+        for n in _PATH_VAR.findall(e["path"]) + list(e.get("params") or []):
+            if n not in names:
+                names.append(n)
+    return names
+
+def build_feeder_csv(endpoints: List[Dict], feeders: Optional[Dict[str, List]]) -> str:
+    """Une colonne par variable ; valeurs fournies recyclées, "1" par défaut."""
+    names = _variables(endpoints)
+    if not names:
+        return ""
+    feeders = feeders or {}
+    rows = max([len(feeders.get(n) or []) for n in names] + [1])
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(names)
+    for i in range(rows):
+        row = []
+        for n in names:
+            vals = feeders.get(n) or ["1"]
+            row.append(str(vals[i % len(vals)]))
+        w.writerow(row)
+    return buf.getvalue()
+
+# ============================
+# 1) JMeter (.jmx)
+# ============================
+
+def _attr(v) -> str:
+    """Valeur d'attribut XML (entre guillemets doubles) : escape() ne traite pas '"'."""
+    return escape(str(v), {'"': "&quot;"})
+
+def _jmx_sampler(e: Dict) -> str:
+    path = _PATH_VAR.sub(lambda m: "${" + m.group(1) + "}", e["path"])
+    args = "".join(f"""
+              <elementProp name="{_attr(p)}" elementType="HTTPArgument">
+                <boolProp name="HTTPArgument.always_encode">true</boolProp>
+                <stringProp name="Argument.value">${{{escape(p)}}}</stringProp>
+                <stringProp name="Argument.metadata">=</stringProp>
+                <boolProp name="HTTPArgument.use_equals">true</boolProp>
+                <stringProp name="Argument.name">{escape(p)}</stringProp>
+              </elementProp>""" for p in (e.get("params") or []))
+    return f"""
+        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="{_attr(e['method'])} {_attr(e['path'])}" enabled="true">
+          <elementProp name="HTTPsampler.Arguments" elementType="Arguments" guiclass="HTTPArgumentsPanel" testclass="Arguments" enabled="true">
+            <collectionProp name="Arguments.arguments">{args}
+            </collectionProp>
+          </elementProp>
+          <stringProp name="HTTPSampler.path">{escape(path)}</stringProp>
+          <stringProp name="HTTPSampler.method">{escape(e['method'])}</stringProp>
+          <boolProp name="HTTPSampler.follow_redirects">true</boolProp>
+          <boolProp name="HTTPSampler.use_keepalive">true</boolProp>
+        </HTTPSamplerProxy>
+        <hashTree/>"""
+
+def _jmx_thread_group(name: str, threads: int, ramp_s: int, duration_s: int, delay_s: int,
+                      rps: float, samplers: str) -> str:
+    timer = ""
+    if rps > 0:
+        # calcMode 2 : débit partagé entre tous les threads actifs (échantillons/min)
+        timer = f"""
+        <ConstantThroughputTimer guiclass="TestBeanGUI" testclass="ConstantThroughputTimer" testname="Débit cible" enabled="true">
+          <intProp name="calcMode">2</intProp>
+          <doubleProp>
+            <name>throughput</name>
+            <value>{rps * 60:.1f}</value>
+            <savedValue>0.0</savedValue>
+          </doubleProp>
+        </ConstantThroughputTimer>
+        <hashTree/>"""
+    return f"""
+      <ThreadGroup guiclass="ThreadGroupGui" testclass="ThreadGroup" testname="{_attr(name)}" enabled="true">
+        <stringProp name="ThreadGroup.on_sample_error">continue</stringProp>
+        <elementProp name="ThreadGroup.main_controller" elementType="LoopController" guiclass="LoopControlPanel" testclass="LoopController" enabled="true">
+          <boolProp name="LoopController.continue_forever">false</boolProp>
+          <intProp name="LoopController.loops">-1</intProp>
+        </elementProp>
+        <stringProp name="ThreadGroup.num_threads">{threads}</stringProp>
+        <stringProp name="ThreadGroup.ramp_time">{ramp_s}</stringProp>
+        <boolProp name="ThreadGroup.scheduler">true</boolProp>
+        <stringProp name="ThreadGroup.duration">{duration_s}</stringProp>
+        <stringProp name="ThreadGroup.delay">{delay_s}</stringProp>
+      </ThreadGroup>
+      <hashTree>{timer}{samplers}
+      </hashTree>"""
+
+def build_jmx(endpoints: List[Dict], base_url: str, profile: Dict, name: str = "Generated", with_feeder: bool = True) -> str:
+    u = urlparse(base_url)
+    port = u.port or (443 if u.scheme == "https" else 80)
+    base_path = (u.path or "").rstrip("/")
+    samplers = "".join(_jmx_sampler({**e, "path": base_path + e["path"]}) for e in endpoints)
+    p = profile
+    if p["type"] == "ramp":
+        groups = _jmx_thread_group(f"{name} — ramp", p["users"], p["ramp_s"], p["duration_s"], 0, 0, samplers)
+    elif p["type"] == "constant":
+        groups = _jmx_thread_group(f"{name} — constant", p["users"], 0, p["duration_s"], 0, p["rps"], samplers)
+    else:
+        groups = _jmx_thread_group(f"{name} — base", p["users"], 0, p["duration_s"], 0, p["rps"], samplers)
+        groups += _jmx_thread_group(f"{name} — spike", p["spike_users"], 1, p["spike_duration_s"], p["spike_at_s"], 0, samplers)
+    feeder = f"""
+      <CSVDataSet guiclass="TestBeanGUI" testclass="CSVDataSet" testname="Feeder" enabled="true">
+        <stringProp name="filename">{FEEDER_FILE}</stringProp>
+        <stringProp name="fileEncoding">UTF-8</stringProp>
+        <stringProp name="variableNames"></stringProp>
+        <boolProp name="ignoreFirstLine">false</boolProp>
+        <stringProp name="delimiter">,</stringProp>
+        <boolProp name="quotedData">true</boolProp>
+        <boolProp name="recycle">true</boolProp>
+        <boolProp name="stopThread">false</boolProp>
+        <stringProp name="shareMode">shareMode.all</stringProp>
+      </CSVDataSet>
+      <hashTree/>""" if with_feeder else ""
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<jmeterTestPlan version="1.2" properties="5.0" jmeter="5.6">
+  <hashTree>
+    <TestPlan guiclass="TestPlanGui" testclass="TestPlan" testname="{_attr(name)}" enabled="true">
+      <boolProp name="TestPlan.functional_mode">false</boolProp>
+      <boolProp name="TestPlan.serialize_threadgroups">false</boolProp>
+      <elementProp name="TestPlan.user_defined_variables" elementType="Arguments" guiclass="ArgumentsPanel" testclass="Arguments" enabled="true">
+        <collectionProp name="Arguments.arguments"/>
+      </elementProp>
+    </TestPlan>
+    <hashTree>
+      <ConfigTestElement guiclass="HttpDefaultsGui" testclass="ConfigTestElement" testname="HTTP Request Defaults" enabled="true">
+        <elementProp name="HTTPsampler.Arguments" elementType="Arguments" guiclass="HTTPArgumentsPanel" testclass="Arguments" enabled="true">
+          <collectionProp name="Arguments.arguments"/>
+        </elementProp>
+        <stringProp name="HTTPSampler.domain">{escape(u.hostname or "localhost")}</stringProp>
+        <stringProp name="HTTPSampler.port">{port}</stringProp>
+        <stringProp name="HTTPSampler.protocol">{escape(u.scheme or "http")}</stringProp>
+      </ConfigTestElement>
+      <hashTree/>{feeder}{groups}
+    </hashTree>
+  </hashTree>
+</jmeterTestPlan>
+"""
+
+# ============================
+# 2) Gatling (simulation Java DSL)
+# ============================
+
+def _java_str(s: str) -> str:
+    return '"' + s.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def _gatling_request(e: Dict) -> str:
+    path = _PATH_VAR.sub(lambda m: "#{" + m.group(1) + "}", e["path"])
+    verb = e["method"].lower() if e["method"] in ("GET", "POST", "PUT", "DELETE") else "get"
+    params = "".join(f".queryParam({_java_str(p)}, {_java_str('#{' + p + '}')})" for p in (e.get("params") or []))
+    return f"\n      .exec(http({_java_str(e['method'] + ' ' + e['path'])}).{verb}({_java_str(path)}){params})"
+
+def _gatling_injection(p: Dict) -> str:
+    d = p["duration_s"]
+    rps = p["rps"] or float(p["users"])
+    if p["type"] == "ramp":
+        ramp = min(p["ramp_s"], d)
+        steps = [f"rampUsersPerSec(1).to({rps}).during(Duration.ofSeconds({ramp}))"]
+        if d > ramp:
+            steps.append(f"constantUsersPerSec({rps}).during(Duration.ofSeconds({d - ramp}))")
+    elif p["type"] == "constant":
+        steps = [f"constantUsersPerSec({rps}).during(Duration.ofSeconds({d}))"]
+    else:
+        at = min(p["spike_at_s"], d)
+        steps = []
+        if at:
+            steps.append(f"constantUsersPerSec({rps}).during(Duration.ofSeconds({at}))")
+        steps.append(f"atOnceUsers({p['spike_users']})")
+        if d > at:
+            steps.append(f"constantUsersPerSec({rps}).during(Duration.ofSeconds({d - at}))")
+    return ",\n        ".join(steps)
+
+def build_gatling_simulation(endpoints: List[Dict], base_url: str, profile: Dict, class_name: str,
+                             package: str = "generated", with_feeder: bool = True) -> str:
+    requests_ = "".join(_gatling_request(e) for e in endpoints)
+    feed = "\n      .feed(csv(" + _java_str(FEEDER_FILE) + ").circular())" if with_feeder else ""
+    return f"""package {package};
+
+import static io.gatling.javaapi.core.CoreDsl.*;
+import static io.gatling.javaapi.http.HttpDsl.*;
+
+import io.gatling.javaapi.core.*;
+import io.gatling.javaapi.http.*;
+import java.time.Duration;
+
+public class {class_name} extends Simulation {{
+
+  HttpProtocolBuilder httpProtocol = http
+      .baseUrl({_java_str(base_url.rstrip("/"))})
+      .acceptHeader("application/json");
+
+  ScenarioBuilder scn = scenario({_java_str(class_name)}){feed}{requests_};
+
+  {{
+    setUp(
+      scn.injectOpen(
+        {_gatling_injection(profile)}
+      )
+    ).protocols(httpProtocol);
+  }}
+}}
+"""
+
+# ============================
+# 3) Point d'entrée : code Spring -> params runner
+# ============================
+
+def _render(tool: str, endpoints: List[Dict], base_url: str, prof: Dict, ctrl: str, feeder_csv: str) -> Dict:
+    params = {
+        "tool": tool,
+        "scenario": f"{tool}:{ctrl}:{prof['type']}",
+        "controller": ctrl,
+        # modèle conservé pour re-générer des shards (tir distribué) ou le moteur local
+        "endpoints": endpoints,
+        "base_url": base_url,
+        "feeder_csv": feeder_csv,
+        "profile": prof,
+    }
+    if tool == "jmeter":
+        params["jmx_content"] = build_jmx(endpoints, base_url, prof, name=ctrl, with_feeder=bool(feeder_csv))
+    elif tool == "gatling":
+        cls = f"{ctrl}LoadSimulation"
+        params.update({
+            "simulation": f"generated.{cls}",
+            "simulation_source": build_gatling_simulation(endpoints, base_url, prof, cls, with_feeder=bool(feeder_csv)),
+        })
+    else:
+        raise ValueError(f"Outil inconnu: {tool}")
+    return params
+
+def generate_load_params(code: str, tool: str, base_url: str, profile: Optional[Dict] = None,
+                         feeders: Optional[Dict[str, List]] = None) -> Dict:
+    """
+    Renvoie {"endpoints": [...], "params": {...}} ; params est accepté tel quel
+    par run_jmeter (jmx_content) ou run_gatling (simulation_source).
+    """
+    endpoints = parse_spring_endpoints(code)
+    if not endpoints:
+        raise ValueError("Aucun endpoint Spring détecté dans le code fourni")
+    prof = normalize_profile(profile)
+    feeder_csv = build_feeder_csv(endpoints, feeders)
+    ctrl = _extract_controller_class_name(code)
+    return {"endpoints": endpoints, "params": _render(tool, endpoints, base_url, prof, ctrl, feeder_csv)}
+
+def _split(total: int, index: int, count: int) -> int:
+    return total // count + (1 if index < total % count else 0)
+
+def shard_params(params: Dict, index: int, count: int) -> Dict:
+    """
+    Params du générateur `index` sur `count` : utilisateurs, débit et pic divisés
+    pour que la somme des shards reproduise le profil demandé. Un plan fourni
+    tel quel (jmx/simulation non générés) ne peut pas être re-découpé : il est
+    lancé à l'identique sur chaque générateur.
+    """
+    out = {**params, "shard": index, "shards": count}
+    if count <= 1 or not params.get("endpoints") or not params.get("profile"):
+        return out
+    prof = dict(params["profile"])
+    prof["users"] = max(1, _split(prof["users"], index, count))
+    prof["spike_users"] = _split(prof["spike_users"], index, count)
+    prof["rps"] = prof["rps"] / count
+    rendered = _render(params.get("tool") or "jmeter", params["endpoints"], params["base_url"], prof,
+                       params.get("controller") or "Generated", params.get("feeder_csv") or "")
+    rendered["scenario"] = params.get("scenario") or rendered["scenario"]
+    return {**out, **rendered}
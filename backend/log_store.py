@@ -0,0 +1,138 @@
+# backend/log_store.py
+"""
+Stockage des logs d'exécution hors des enregistrements.
+
+Chaque log est découpé en chunks de LOG_CHUNK_KB (non compressés), chacun
+compressé en gzip dans artifacts/logs/<exec_id>/. Un index.json garde les
+offsets pour relire une plage d'octets sans tout décompresser.
+"""
+from __future__ import annotations
+import gzip, json, shutil, threading, time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from settings import settings
+
+_BASE = Path(__file__).resolve().parent / "artifacts" / "logs"
+_BASE.mkdir(parents=True, exist_ok=True)
+
+_INDEX = "index.json"
+_RETENTION_LOCK = threading.Lock()
+_last_retention = 0.0
+
+def _dir(exec_id: str) -> Path:
+    # exec_id est un uuid : on refuse tout ce qui ressemble à un chemin
+    if not exec_id or "/" in exec_id or "\\" in exec_id or exec_id.startswith("."):
+        raise ValueError(f"exec_id invalide: {exec_id!r}")
+    return _BASE / exec_id
+
+def save_logs(exec_id: str, text: str) -> Dict:
+    """Écrit les logs en chunks gzip et renvoie le résumé à poser sur l'exécution."""
+    data = (text or "").encode("utf-8")
+    chunk = max(1, settings.LOG_CHUNK_KB) * 1024
+    d = _dir(exec_id)
+    if d.exists():
+        shutil.rmtree(d, ignore_errors=True)
+    d.mkdir(parents=True, exist_ok=True)
+
+    chunks: List[Dict] = []
+    stored = 0
+    for i, off in enumerate(range(0, len(data), chunk)):
+        part = data[off:off + chunk]
+        name = f"{i:05d}.gz"
+        with gzip.open(d / name, "wb", compresslevel=settings.LOG_GZIP_LEVEL) as f:
+            f.write(part)
+        stored += (d / name).stat().st_size
+        chunks.append({"file": name, "offset": off, "size": len(part)})
+
+    index = {"size": len(data), "chunks": chunks}
+    (d / _INDEX).write_text(json.dumps(index), encoding="utf-8")
+
+    summary = {
+        "ref": exec_id,
+        "codec": "gzip",
+        "size": len(data),
+        "stored_size": stored,
+        "lines": data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0),
+        "chunks": len(chunks),
+    }
+    enforce_retention()
+    return summary
+
+def _load_index(exec_id: str) -> Optional[Dict]:
+    try:
+        return json.loads((_dir(exec_id) / _INDEX).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+def logs_size(exec_id: str) -> Optional[int]:
+    idx = _load_index(exec_id)
+    return idx["size"] if idx else None
+
+def iter_logs(exec_id: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Itère sur les octets [start, end] (end inclus, comme un en-tête Range)
+    en ne décompressant que les chunks concernés.
+    """
+    idx = _load_index(exec_id)
+    if not idx:
+        return
+    size = idx["size"]
+    last = size - 1 if end is None else min(end, size - 1)
+    if start > last:
+        return
+    d = _dir(exec_id)
+    for c in idx["chunks"]:
+        c_start, c_end = c["offset"], c["offset"] + c["size"] - 1
+        if c_end < start or c_start > last:
+            continue
+        with gzip.open(d / c["file"], "rb") as f:
+            part = f.read()
+        yield part[max(start, c_start) - c_start: min(last, c_end) - c_start + 1]
+
+def read_logs(exec_id: str, start: int = 0, end: Optional[int] = None) -> Optional[bytes]:
+    if _load_index(exec_id) is None:
+        return None
+    return b"".join(iter_logs(exec_id, start, end))
+
+def delete_logs(exec_id: str) -> None:
+    shutil.rmtree(_dir(exec_id), ignore_errors=True)
+
+def _dir_size(d: Path) -> int:
+    return sum(f.stat().st_size for f in d.iterdir() if f.is_file())
+
+def enforce_retention(max_bytes: Optional[int] = None, force: bool = False) -> int:
+    """
+    Supprime les logs les plus anciens tant que le total compressé dépasse
+    le budget (LOG_RETENTION_MB). Renvoie le nombre de logs supprimés.
+    Limité à un passage toutes les LOG_RETENTION_INTERVAL_S secondes.
+    """
+    global _last_retention
+    budget = settings.LOG_RETENTION_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    if budget <= 0:
+        return 0
+    now = time.time()
+    if not force and now - _last_retention < settings.LOG_RETENTION_INTERVAL_S:
+        return 0
+    if not _RETENTION_LOCK.acquire(blocking=False):
+        return 0
+    try:
+        _last_retention = now
+        entries = []
+        for d in _BASE.iterdir():
+            if d.is_dir():
+                try:
+                    entries.append((d.stat().st_mtime, _dir_size(d), d))
+                except FileNotFoundError:
+                    continue
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for _, size, d in sorted(entries, key=lambda e: e[0]):
+            if total <= budget:
+                break
+            shutil.rmtree(d, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+    finally:
+        _RETENTION_LOCK.release()
@@ -5,35 +5,61 @@ import traceback
 import re
 from typing import Optional, List, Dict, Tuple
 
-from fastapi import FastAPI, HTTPException, Query, Depends, Body, Request, Response, status
+from fastapi import FastAPI, HTTPException, Query, Depends, Body, Request, Response, Header, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
-from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 from settings import settings
-from database import save_test_case, list_test_cases, db, collection as TESTS_COL
+from database import (
+    list_test_cases_async,
+    find_test_cases_async,
+    get_test_case_async,
+    insert_test_case_async,
+    get_job_async,
+    get_version_async,
+)
+import blobs
+import bulk_io
+from pymongo.errors import PyMongoError, ServerSelectionTimeoutError
 from security import issue_tokens, require_scopes, jwks
 from rate_limit import rate_limit
 from audit import audit_middleware
-from artifacts import open_path, save_bytes
+import audit
+import latency_rollup
+import metrics
+from http_cache import FastJSONResponse, Compression, etag, etag_matches, cache_headers, not_modified
+from artifacts import save_bytes, stat as artifact_stat, iter_range, iter_decoded, touch as touch_artifact, start_gc
 from jobs import submit_job
 from exec_store import (
     create_execution,
     mark_running,
     mark_result,
+    update_execution,
     get_execution,
     list_executions,
     get_execution_logs_text,
+    store_version,
+    EPOCH as EXEC_EPOCH,
 )
 from selenium_runner import run_selenium
-from gatling_jmeter_runner import run_gatling, run_jmeter
-from test_runner import run_java_maven
+from gatling_jmeter_runner import check_load_params, run_gatling, run_jmeter
+from native_runner import run_native, NATIVE_LANGUAGES
+from test_runner import run_java_maven, run_java_suite, maven_cache_stats, seed_maven_cache, maven_workers_stats
+import maven_workers
+import run_cache
+import exec_backends
+import webdriver_pool
+import page_perf
+from test_results import list_results_async, aggregates as test_result_aggregates
+from baselines import pin_baseline, list_baselines, evaluate_execution
+from load_scenarios import generate_load_params
 from bson import ObjectId
 from fastapi.responses import PlainTextResponse
-from exec_store import get_execution_logs_text
+from exec_store import get_execution_logs_range, get_execution_logs_text
+from log_store import logs_size
 
-app = FastAPI(title="IA Test Automatisation API")
+app = FastAPI(title="IA Test Automatisation API", default_response_class=FastJSONResponse)
 
 # ------------------------ CORS ------------------------
 app.add_middleware(
@@ -41,17 +67,67 @@ app.add_middleware(
     allow_origins=settings.CORS_ALLOWED_ORIGINS or ["*"],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],  # tolérant
-    allow_headers=["Authorization", "Content-Type"],
+    allow_headers=["Authorization", "Content-Type", "If-None-Match"],
+    expose_headers=["ETag"],
 )
 
+# ------------------------ Compression ------------------------
+app.add_middleware(Compression, minimum_size=settings.GZIP_MIN_BYTES, compresslevel=settings.GZIP_LEVEL)
+
+# ------------------------ GC des artefacts ------------------------
+@app.on_event("startup")
+def _start_artifact_gc():
+    start_gc()
+
+# ------------------------ Backends d'exécution ------------------------
+@app.on_event("startup")
+def _start_backend_probing():
+    exec_backends.start_probing()
+
+# ------------------------ Workers Maven chauds ------------------------
+@app.on_event("startup")
+def _start_maven_workers():
+    maven_workers.warm_up_async()
+
+@app.on_event("shutdown")
+def _stop_maven_workers():
+    maven_workers.shutdown()
+
+@app.on_event("shutdown")
+def _stop_webdriver_pool():
+    webdriver_pool.shutdown()
+
 # ------------------------ Audit global ------------------------
 app.middleware("http")(audit_middleware)
 
+@app.on_event("startup")
+def _start_audit_writer():
+    audit.start()
+
+@app.on_event("shutdown")
+def _flush_audit_writer():
+    audit.stop()
+
+@app.on_event("startup")
+def _start_latency_rollup():
+    latency_rollup.start()
+
+# ------------------------ Erreurs Mongo (délais des handlers async) ------------------------
+@app.exception_handler(PyMongoError)
+async def _mongo_error(request: Request, exc: PyMongoError):
+    if isinstance(exc, ServerSelectionTimeoutError):
+        return JSONResponse(status_code=503, content={"detail": "Base de données indisponible"})
+    if exc.timeout:
+        return JSONResponse(status_code=504, content={"detail": "Base de données trop lente (délai dépassé)"})
+    return JSONResponse(status_code=500, content={"detail": "Erreur base de données"})
+
 # ------------------------ Limite de taille de corps ------------------------
 @app.middleware("http")
 async def limit_body_size(request: Request, call_next):
     cl = request.headers.get("content-length")
-    if cl and int(cl) > settings.MAX_REQ_BODY_KB * 1024:
+    # imports NDJSON : lus en flux, bornés par IMPORT_MAX_MB (cf. bulk_io.iter_lines)
+    limit = settings.IMPORT_MAX_MB * 1024 * 1024 if request.url.path.endswith("/import") else settings.MAX_REQ_BODY_KB * 1024
+    if cl and int(cl) > limit:
         return JSONResponse(status_code=413, content={"detail": "Corps de requête trop volumineux"})
     return await call_next(request)
 
@@ -145,7 +221,8 @@ class TestPreviewResp(BaseModel):
     result: str
 
 @app.post("/generate-test-preview", response_model=TestPreviewResp)
-def generate_preview(data: TestPreviewReq, _auth=Depends(require_scopes(["generate:preview"]))):
+def generate_preview(data: TestPreviewReq, _auth=Depends(require_scopes(["generate:preview"])),
+                     _rl=Depends(rate_limit(settings.MAX_GENERATE_PER_MIN, "generate"))):
     try:
         gen_func, active_provider = _select_generator(data.provider)
         active_model = _normalize_model(active_provider, data.model)
@@ -172,7 +249,7 @@ class TestCreateReq(BaseModel):
     model: Optional[str] = None
 
 @app.post("/test-cases")
-def create_test_case(data: TestCreateReq, _auth=Depends(require_scopes(["history:write"]))):
+async def create_test_case(data: TestCreateReq, _auth=Depends(require_scopes(["history:write"]))):
     doc = {
         "code": data.code,
         "generated_test": data.generated_test,
@@ -183,15 +260,64 @@ def create_test_case(data: TestCreateReq, _auth=Depends(require_scopes(["history
         "model": data.model,
         "created_at": datetime.utcnow(),
     }
-    ins = TESTS_COL.insert_one(doc)
-    doc["_id"] = str(ins.inserted_id)
+    doc["_id"] = await insert_test_case_async(await blobs.store_bodies_async(doc))
     return doc
 
 # ------------------------ Historique ------------------------
 @app.get("/test-cases")
-def get_test_cases(limit: int = Query(50, ge=1, le=200), _auth=Depends(require_scopes(["history:read"]))):
-    items = list_test_cases(limit=limit)
-    return JSONResponse(content=jsonable_encoder(items))
+async def get_test_cases(limit: int = Query(50, ge=1, le=200),
+                         bodies: bool = Query(True, description="false = métadonnées seules (sans code ni test)"),
+                         if_none_match: Optional[str] = Header(None),
+                         _auth=Depends(require_scopes(["history:read"]))):
+    # version lue avant la liste : au pire un ETag plus ancien que le contenu, jamais un 304 périmé
+    tag = etag("tc", await get_version_async("test_cases"), limit, int(bodies))
+    if etag_matches(if_none_match, tag):
+        return not_modified(tag)
+    items = await list_test_cases_async(limit=limit)
+    items = await blobs.hydrate_many_async(items) if bodies else [blobs.strip_bodies(d) for d in items]
+    return FastJSONResponse(items, headers=cache_headers(tag))
+
+# ------------------------ Export / import NDJSON ------------------------
+def _ndjson_response(chunks, name: str, gzip: bool) -> StreamingResponse:
+    filename = f"{name}.ndjson.gz" if gzip else f"{name}.ndjson"
+    return StreamingResponse(chunks, media_type="application/gzip" if gzip else "application/x-ndjson",
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+def _import_gzip(request: Request, gzip: Optional[bool]) -> Optional[bool]:
+    if gzip is not None:
+        return gzip
+    return True if "gzip" in (request.headers.get("content-encoding") or "").lower() else None
+
+def _import_response(prog: Dict) -> JSONResponse:
+    return JSONResponse(status_code=413 if prog["state"] == "aborted" else 200, content=prog)
+
+@app.get("/test-cases/export")
+async def export_test_cases(test_type: Optional[str] = None, language: Optional[str] = None,
+                            status_: Optional[str] = Query(None, alias="status"), provider: Optional[str] = None,
+                            since: Optional[datetime] = None, until: Optional[datetime] = None,
+                            limit: Optional[int] = Query(None, ge=1), gzip: bool = False,
+                            _auth=Depends(require_scopes(["tests:export"]))):
+    """Test cases en NDJSON (une ligne par test case, corps inclus), lus en flux depuis Mongo."""
+    query = bulk_io.test_case_query(test_type, language, status_, provider, since, until)
+    return _ndjson_response(bulk_io.encode(bulk_io.export_test_cases(query, limit), gzip), "test_cases", gzip)
+
+@app.post("/test-cases/import")
+async def import_test_cases(request: Request, import_id: Optional[str] = None, gzip: Optional[bool] = None,
+                            _auth=Depends(require_scopes(["history:write"]))):
+    """
+    Import NDJSON (brut ou gzip) par lots ; les test cases déjà présents sont ignorés.
+    Progression pendant l'import : GET /imports/{import_id} (id libre passé en paramètre).
+    """
+    prog = bulk_io.new_import("test_cases", import_id)
+    lines = bulk_io.iter_lines(request.stream(), _import_gzip(request, gzip))
+    return _import_response(await bulk_io.import_test_cases(lines, prog))
+
+@app.get("/imports/{import_id}")
+def get_import_progress(import_id: str, _auth=Depends(require_scopes(["history:read"]))):
+    prog = bulk_io.get_import(import_id)
+    if not prog:
+        raise HTTPException(status_code=404, detail="Import introuvable")
+    return prog
 
 # ------------------------ Jobs async (LLM -> artefact) ------------------------
 def _execute_test_job(code: str, test_type: str, language: str, model: Optional[str] = None, provider: Optional[str] = None):
@@ -203,77 +329,207 @@ def _execute_test_job(code: str, test_type: str, language: str, model: Optional[
     return {"generated_len": len(cleaned), "artifact_id": art_id}
 
 @app.post("/run", status_code=status.HTTP_202_ACCEPTED)
-def run_async(data: RunRequest, _auth=Depends(require_scopes(["generate:preview"]))):
+def run_async(data: RunRequest, _auth=Depends(require_scopes(["generate:preview"])),
+              _rl=Depends(rate_limit(settings.MAX_EXECUTE_PER_MIN, "execute"))):
     job_id = submit_job("execute_test", _execute_test_job, data.dict())
     return {"jobId": job_id}
 
 # ------------------------ Jobs & artefacts ------------------------
 @app.get("/status/{job_id}")
-def job_status(job_id: str, _auth=Depends(require_scopes(["history:read"]))):
-    rec = db["jobs"].find_one({"_id": ObjectId(job_id)})
+async def job_status(job_id: str, _auth=Depends(require_scopes(["history:read"]))):
+    rec = await get_job_async(job_id)
     if not rec:
         raise HTTPException(status_code=404, detail="Job inconnu")
     rec["_id"] = str(rec["_id"])
     return rec
 
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse un en-tête 'Range: bytes=a-b' (une seule plage, suffixe 'bytes=-n' accepté).
+    Renvoie (start, end) inclus, None si absent ; lève 416 si insatisfiable.
+    """
+    if not header:
+        return None
+    m = _RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        raise HTTPException(status_code=416, detail="Range invalide", headers={"Content-Range": f"bytes */{size}"})
+    if m.group(1):
+        start = int(m.group(1))
+        end = int(m.group(2)) if m.group(2) else size - 1
+    else:
+        start, end = max(0, size - int(m.group(2))), size - 1
+    end = min(end, size - 1)
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range insatisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def _accepts_gzip(header: Optional[str]) -> bool:
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            q = params.strip().lower()
+            return not (q.startswith("q=") and _qvalue(q[2:]) == 0)
+    return False
+
+def _qvalue(raw: str) -> float:
+    """Poids q d'Accept-Encoding ; une valeur mal formée compte comme 1.0 (pas de 500 sur l'en-tête client)."""
+    try:
+        return float(raw or 0)
+    except ValueError:
+        return 1.0
+
 @app.get("/artifact/{artifact_id}")
-def get_artifact(artifact_id: str):
+def get_artifact(artifact_id: str, range_: Optional[str] = Header(None, alias="Range"),
+                 if_none_match: Optional[str] = Header(None),
+                 accept_encoding: Optional[str] = Header(None)):
     try:
-        p = open_path(artifact_id)
-        return FileResponse(path=str(p), filename=artifact_id)
+        meta = artifact_stat(artifact_id)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Artefact introuvable")
+    # stocké en gzip mais client sans gzip : décompressé en flux, sans Range
+    decode = meta.get("encoding") == "gzip" and not _accepts_gzip(accept_encoding)
+    # contenu adressé par sha256 : l'ETag est l'identifiant (une variante par encodage)
+    etag = f'"{meta["id"]}-identity"' if decode else f'"{meta["id"]}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "none" if decode else "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Content-Disposition": f'inline; filename="{meta["id"]}{meta.get("suffix") or ""}"',
+    }
+    if meta.get("encoding"):
+        headers["Vary"] = "Accept-Encoding"
+        if not decode:
+            headers["Content-Encoding"] = meta["encoding"]
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    size = int(meta["size"])
+    touch_artifact(artifact_id)
+    if decode:
+        if meta.get("raw_size") is not None:
+            headers["Content-Length"] = str(meta["raw_size"])
+        return StreamingResponse(iter_decoded(artifact_id), media_type=meta["content_type"], headers=headers)
+    rng = _parse_range(range_, size) if size > 0 else None
+    if rng:
+        start, end = rng
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(iter_range(artifact_id, start, end), status_code=206,
+                                 media_type=meta["content_type"], headers=headers)
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(iter_range(artifact_id), media_type=meta["content_type"], headers=headers)
 
 # ------------------------ Exécutions (Selenium/Gatling/JMeter) ------------------------
 class SeleniumRunRequest(BaseModel):
-    url: str
+    url: Optional[str] = None
+    urls: Optional[List[str]] = Field(None, max_items=1000)
+    # "load" (défaut) | "interactive" | "css:<sélecteur>" | "js:<expression>"
+    wait_for: Optional[str] = Field(None, regex="^(load|interactive|css:.+|js:.+)$")
+    wait_timeout_s: Optional[float] = Field(None, gt=0, le=120)
+    perf: bool = True                       # Navigation/Resource Timing, FCP, LCP, CLS
+    repeat: int = Field(1, ge=1, le=50)     # répétitions par URL (médianes)
+    cold_cache: bool = False                # vide le cache navigateur avant chaque visite
 
 @app.post("/exec/selenium", status_code=status.HTTP_202_ACCEPTED)
-def exec_selenium(data: SeleniumRunRequest, _auth=Depends(require_scopes(["generate:preview"]))):
+def exec_selenium(data: SeleniumRunRequest, _auth=Depends(require_scopes(["generate:preview"])),
+                  _rl=Depends(rate_limit(settings.MAX_EXECUTE_PER_MIN, "execute"))):
+    if not data.url and not data.urls:
+        raise HTTPException(status_code=422, detail="url ou urls requis")
     exec_id = create_execution("selenium", data.dict())
     def _job(exec_id: str, params: dict):
         mark_running(exec_id)
-        ok, logs, arts = run_selenium(params)
+        ok, logs, arts = run_selenium(params, exec_id=exec_id)
         mark_result(exec_id, ok, logs, arts)
         return {"ok": ok, "artifacts": arts}
     submit_job("exec_selenium", _job, {"exec_id": exec_id, "params": data.dict()})
     return {"execId": exec_id}
 
-@app.post("/exec/gatling", status_code=status.HTTP_202_ACCEPTED)
-def exec_gatling(_auth=Depends(require_scopes(["generate:preview"]))):
-    exec_id = create_execution("gatling", {})
+class LoadRunRequest(BaseModel):
+    # params runner : simulation/jmx existants, ou plan généré par /load-scenarios
+    params: Dict = Field(default_factory=dict)
+
+def _submit_load_run(kind: str, params: dict) -> str:
+    error = check_load_params(params)
+    if error:
+        raise HTTPException(status_code=422, detail=error)
+    exec_id = create_execution(kind, params)
+    runner = run_gatling if kind == "gatling" else run_jmeter
     def _job(exec_id: str):
         mark_running(exec_id)
-        ok, logs, arts = run_gatling({})
+        ok, logs, arts = runner(params, exec_id=exec_id)
         mark_result(exec_id, ok, logs, arts)
         return {"ok": ok, "artifacts": arts}
-    submit_job("exec_gatling", _job, {"exec_id": exec_id})
-    return {"execId": exec_id}
+    submit_job(f"exec_{kind}", _job, {"exec_id": exec_id})
+    return exec_id
+
+@app.post("/exec/gatling", status_code=status.HTTP_202_ACCEPTED)
+def exec_gatling(data: Optional[LoadRunRequest] = None, _auth=Depends(require_scopes(["generate:preview"])),
+                 _rl=Depends(rate_limit(settings.MAX_EXECUTE_PER_MIN, "execute"))):
+    return {"execId": _submit_load_run("gatling", data.params if data else {})}
 
 @app.post("/exec/jmeter", status_code=status.HTTP_202_ACCEPTED)
-def exec_jmeter(_auth=Depends(require_scopes(["generate:preview"]))):
-    exec_id = create_execution("jmeter", {})
-    def _job(exec_id: str):
-        mark_running(exec_id)
-        ok, logs, arts = run_jmeter({})
-        mark_result(exec_id, ok, logs, arts)
-        return {"ok": ok, "artifacts": arts}
-    submit_job("exec_jmeter", _job, {"exec_id": exec_id})
-    return {"execId": exec_id}
+def exec_jmeter(data: Optional[LoadRunRequest] = None, _auth=Depends(require_scopes(["generate:preview"])),
+                _rl=Depends(rate_limit(settings.MAX_EXECUTE_PER_MIN, "execute"))):
+    return {"execId": _submit_load_run("jmeter", data.params if data else {})}
+
+# ------------------------ Génération de scénarios de charge ------------------------
+class LoadScenarioRequest(BaseModel):
+    code: str = Field(min_length=1)
+    tool: str = Field(regex="^(gatling|jmeter)$", default="gatling")
+    base_url: str = "http://localhost:8080"
+    profile: Optional[Dict] = None        # {type: ramp|constant|spike, users, rps, duration_s, ...}
+    feeders: Optional[Dict[str, List[str]]] = None
+    run: bool = False
+
+@app.post("/load-scenarios")
+def create_load_scenario(data: LoadScenarioRequest, _auth=Depends(require_scopes(["generate:preview"])),
+                         _rl=Depends(rate_limit(settings.MAX_GENERATE_PER_MIN, "generate"))):
+    try:
+        out = generate_load_params(data.code, data.tool, data.base_url, data.profile, data.feeders)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if data.run:
+        out["execId"] = _submit_load_run(data.tool, out["params"])
+    return out
+
+@app.get("/executions/export")
+async def export_execs(kind: Optional[str] = None, status_: Optional[str] = Query(None, alias="status"),
+                       since: Optional[datetime] = None, gzip: bool = False,
+                       _auth=Depends(require_scopes(["tests:export"]))):
+    """Exécutions en NDJSON (aperçu des logs seulement, le log complet reste sur /executions/{id}/logs)."""
+    return _ndjson_response(bulk_io.encode(bulk_io.export_executions(kind, status_, since), gzip), "executions", gzip)
+
+@app.post("/executions/import")
+async def import_execs(request: Request, import_id: Optional[str] = None, gzip: Optional[bool] = None,
+                       _auth=Depends(require_scopes(["history:write"]))):
+    """Import NDJSON d'exécutions ; un id déjà connu est ignoré."""
+    prog = bulk_io.new_import("executions", import_id)
+    lines = bulk_io.iter_lines(request.stream(), _import_gzip(request, gzip))
+    return _import_response(await bulk_io.import_executions(lines, prog))
 
 @app.get("/executions")
-def list_execs(limit: int = Query(50, ge=1, le=200), _auth=Depends(require_scopes(["history:read"]))):
-    return list_executions(limit)
+async def list_execs(limit: int = Query(50, ge=1, le=200), if_none_match: Optional[str] = Header(None),
+                     _auth=Depends(require_scopes(["history:read"]))):
+    tag = etag("ex", EXEC_EPOCH, store_version(), limit)
+    if etag_matches(if_none_match, tag):
+        return not_modified(tag)
+    return FastJSONResponse(list_executions(limit), headers=cache_headers(tag))
 
 @app.get("/executions/{exec_id}")
-def exec_detail(exec_id: str, _auth=Depends(require_scopes(["history:read"]))):
+async def exec_detail(exec_id: str, if_none_match: Optional[str] = Header(None),
+                      _auth=Depends(require_scopes(["history:read"]))):
     rec = get_execution(exec_id)
     if not rec:
         raise HTTPException(status_code=404, detail="Exécution introuvable")
-    return rec
+    tag = etag(EXEC_EPOCH, exec_id, rec.get("version", 0))
+    if etag_matches(if_none_match, tag):
+        return not_modified(tag)
+    return FastJSONResponse(rec, headers=cache_headers(tag))
 
 @app.post("/executions/{exec_id}/rerun", status_code=status.HTTP_202_ACCEPTED)
-def rerun_execution(exec_id: str, _auth=Depends(require_scopes(["generate:preview"]))):
+def rerun_execution(exec_id: str, _auth=Depends(require_scopes(["generate:preview"])),
+                    _rl=Depends(rate_limit(settings.MAX_EXECUTE_PER_MIN, "execute"))):
     rec = get_execution(exec_id)
     if not rec:
         raise HTTPException(status_code=404, detail="Exécution inconnue")
@@ -284,11 +540,11 @@ def rerun_execution(exec_id: str, _auth=Depends(require_scopes(["generate:previe
     def _dispatch(exec_id: str, kind: str, params: dict):
         mark_running(exec_id)
         if kind == "selenium":
-            ok, logs, arts = run_selenium(params)
+            ok, logs, arts = run_selenium(params, exec_id=exec_id)
         elif kind == "gatling":
-            ok, logs, arts = run_gatling(params)
+            ok, logs, arts = run_gatling(params, exec_id=exec_id)
         elif kind == "jmeter":
-            ok, logs, arts = run_jmeter(params)
+            ok, logs, arts = run_jmeter(params, exec_id=exec_id)
         else:
             ok, logs, arts = False, f"Kind inconnu: {kind}", []
         mark_result(exec_id, ok, logs, arts)
@@ -314,12 +570,16 @@ def _strip_fences(txt: str) -> str:
 class RunTestRequest(BaseModel):
     language: Optional[str] = None
     notes: Optional[str] = None
+    cache: Optional[bool] = None   # None = réglage JAVA_RESULT_CACHE
+    force: bool = False            # ignore un résultat mémoïsé
 
 @app.post("/test-cases/{test_id}/run", status_code=status.HTTP_202_ACCEPTED)
-def run_saved_test(test_id: str, data: Optional[RunTestRequest] = None, _auth=Depends(require_scopes(["generate:preview"]))):
-    doc = TESTS_COL.find_one({"_id": ObjectId(test_id)})
+async def run_saved_test(test_id: str, data: Optional[RunTestRequest] = None, _auth=Depends(require_scopes(["generate:preview"])),
+                         _rl=Depends(rate_limit(settings.MAX_EXECUTE_PER_MIN, "execute"))):
+    doc = await get_test_case_async(test_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Test case introuvable")
+    await blobs.hydrate_many_async([doc])
 
     language = (data.language if data and data.language else (doc.get("language") or "java")).lower()
 
@@ -328,23 +588,239 @@ def run_saved_test(test_id: str, data: Optional[RunTestRequest] = None, _auth=De
     test_src = _strip_fences(doc.get("generated_test") or "")
 
     params = {"language": language, "notes": (data.notes if data else None)}
-    exec_id = create_execution(kind=f"{language}-maven", params=params, test_case_id=test_id)
+    tool = "maven" if language == "java" else NATIVE_LANGUAGES.get(language, "unsupported")
+    exec_id = create_execution(kind=f"{language}-{tool}", params=params, test_case_id=test_id)
 
     def _job():
         mark_running(exec_id)
         if language != "java":
-            ok, logs, arts = False, f"Langage non supporté pour l'instant: {language}", []
+            # pytest / Jest en local (JUnit XML -> test_results)
+            ok, logs, arts = run_native(language, code_src, test_src, exec_id=exec_id, test_case_id=test_id)
         else:
-            ok, logs, arts = run_java_maven(code_src, test_src)
+            ok, logs, arts = run_java_maven(code_src, test_src, exec_id=exec_id, test_case_id=test_id,
+                                            use_cache=data.cache if data else None,
+                                            force=bool(data and data.force))
         mark_result(exec_id, ok, logs, arts)
 
     submit_job("run_saved_test", _job, {})
     return {"execId": exec_id}
 
 
+class SuiteRunRequest(BaseModel):
+    ids: Optional[List[str]] = None
+    test_type: Optional[str] = None
+    language: Optional[str] = None
+    status: Optional[str] = None
+    limit: int = Field(100, ge=1, le=1000)
+    notes: Optional[str] = None
+
+@app.post("/test-cases/run-suite", status_code=status.HTTP_202_ACCEPTED)
+async def run_test_suite(data: SuiteRunRequest, _auth=Depends(require_scopes(["generate:preview"])),
+                         _rl=Depends(rate_limit(settings.MAX_EXECUTE_PER_MIN, "execute"))):
+    """Lance plusieurs test cases (ids ou filtre) dans une seule invocation Maven."""
+    if data.ids:
+        try:
+            query: Dict = {"_id": {"$in": [ObjectId(i) for i in data.ids]}}
+        except Exception:
+            raise HTTPException(status_code=400, detail="Identifiant de test case invalide")
+    else:
+        query = {k: v for k, v in (("test_type", data.test_type), ("language", data.language),
+                                   ("status", data.status)) if v}
+    limit = min(data.limit, settings.MAVEN_SUITE_MAX_CASES)
+    docs = await find_test_cases_async(query, limit)
+    if not docs:
+        raise HTTPException(status_code=404, detail="Aucun test case ne correspond")
+    await blobs.hydrate_many_async(docs)
+
+    suite_id = create_execution(kind="java-maven-suite", params={"notes": data.notes, "count": len(docs)})
+    cases, skipped = [], []
+    for doc in docs:
+        tc_id = str(doc["_id"])
+        language = (doc.get("language") or "java").lower()
+        exec_id = create_execution(kind=f"{language}-maven", params={"language": language, "suite_id": suite_id},
+                                   test_case_id=tc_id)
+        if language != "java":
+            skipped.append(exec_id)
+            continue
+        cases.append({"exec_id": exec_id, "test_case_id": tc_id,
+                      "code": _strip_fences(doc.get("code") or ""),
+                      "test": _strip_fences(doc.get("generated_test") or "")})
+    exec_ids = {c["test_case_id"]: c["exec_id"] for c in cases}
+    update_execution(suite_id, suite={"cases": exec_ids, "skipped": skipped})
+
+    def _job():
+        mark_running(suite_id)
+        for exec_id in skipped:
+            mark_result(exec_id, False, "Langage non supporté en mode suite", [])
+        if not cases:
+            mark_result(suite_id, False, "Aucun test case Java dans la sélection", [])
+            return
+        for c in cases:
+            mark_running(c["exec_id"], notes=f"suite {suite_id}")
+        try:
+            ok, logs, per = run_java_suite(cases, suite_id=suite_id)
+        except Exception:
+            tb = traceback.format_exc()
+            for c in cases:
+                mark_result(c["exec_id"], False, tb, [])
+            mark_result(suite_id, False, tb, [])
+            return
+        for exec_id, (c_ok, c_logs, c_arts) in per.items():
+            mark_result(exec_id, c_ok, c_logs, c_arts)
+        passed = sum(1 for r in per.values() if r[0])
+        update_execution(suite_id, suite={"cases": exec_ids, "skipped": skipped,
+                                          "passed": passed, "failed": len(per) - passed})
+        mark_result(suite_id, ok and passed == len(per), logs, [])
+
+    submit_job("run_test_suite", _job, {})
+    return {"execId": suite_id, "cases": exec_ids, "skipped": skipped}
+
+
 @app.get("/executions/{exec_id}/logs", response_class=PlainTextResponse)
-def exec_logs(exec_id: str, _auth=Depends(require_scopes(["history:read"]))):
+def exec_logs(exec_id: str, range_: Optional[str] = Header(None, alias="Range"), _auth=Depends(require_scopes(["history:read"]))):
+    size = logs_size(exec_id)
+    rng = _parse_range(range_, size) if size is not None else None
+    if rng:
+        if get_execution(exec_id) is None:
+            raise HTTPException(status_code=404, detail="Exécution introuvable")
+        # octets bruts : une plage qui coupe un caractère UTF-8 garde la longueur annoncée
+        data = get_execution_logs_range(exec_id, rng[0], rng[1])
+        if data is None:
+            raise HTTPException(status_code=410, detail="Logs purgés par la politique de rétention")
+        return Response(content=data, status_code=206, media_type="text/plain",
+                        headers={"Content-Range": f"bytes {rng[0]}-{rng[1]}/{size}", "Accept-Ranges": "bytes"})
     txt = get_execution_logs_text(exec_id)
     if txt is None:
         raise HTTPException(status_code=404, detail="Exécution introuvable")
-    return txt
\ No newline at end of file
+    return PlainTextResponse(txt, headers={"Accept-Ranges": "bytes"} if size is not None else None)
+
+# ------------------------ Résultats unitaires (surefire) ------------------------
+@app.get("/executions/{exec_id}/test-results")
+async def exec_test_results(exec_id: str, _auth=Depends(require_scopes(["history:read"]))):
+    rec = get_execution(exec_id)
+    if not rec:
+        raise HTTPException(status_code=404, detail="Exécution introuvable")
+    return {"summary": rec.get("tests"), "results": await list_results_async(exec_id)}
+
+@app.get("/test-results/aggregates")
+def test_results_aggregates(
+    days: int = Query(30, ge=1, le=365),
+    bucket: str = Query("day", regex="^(hour|day|week)$"),
+    test_case_id: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    _auth=Depends(require_scopes(["history:read"])),
+):
+    return test_result_aggregates(days=days, bucket=bucket, test_case_id=test_case_id, limit=limit)
+
+
+# ------------------------ Rapports de charge ------------------------
+@app.get("/executions/{exec_id}/load-report")
+def exec_load_report(exec_id: str, _auth=Depends(require_scopes(["history:read"]))):
+    rec = get_execution(exec_id)
+    if not rec:
+        raise HTTPException(status_code=404, detail="Exécution introuvable")
+    report = rec.get("load_report")
+    if not report:
+        raise HTTPException(status_code=404, detail="Aucun rapport de charge pour cette exécution")
+    return report
+
+
+# ------------------------ Baselines de charge ------------------------
+class BaselineRequest(BaseModel):
+    latency_pct: Optional[float] = None
+    throughput_pct: Optional[float] = None
+    error_rate_abs: Optional[float] = None
+    alpha: Optional[float] = None
+
+@app.post("/executions/{exec_id}/baseline")
+def pin_execution_baseline(exec_id: str, data: Optional[BaselineRequest] = None, _auth=Depends(require_scopes(["tests:confirm"]))):
+    try:
+        return pin_baseline(exec_id, tolerances=data.dict() if data else None)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Exécution introuvable")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/baselines")
+def get_baselines(_auth=Depends(require_scopes(["history:read"]))):
+    return list_baselines()
+
+@app.get("/executions/{exec_id}/comparison")
+def exec_comparison(exec_id: str, refresh: bool = False, _auth=Depends(require_scopes(["history:read"]))):
+    rec = get_execution(exec_id)
+    if not rec:
+        raise HTTPException(status_code=404, detail="Exécution introuvable")
+    cmp = rec.get("baseline_comparison")
+    if refresh or not cmp:
+        cmp = evaluate_execution(exec_id)
+    if not cmp:
+        raise HTTPException(status_code=404, detail="Aucune baseline comparable pour cette exécution")
+    return cmp
+
+
+# ------------------------ Runner Java : backends, cache Maven, workers ------------------------
+@app.get("/runner/backends")
+def get_exec_backends(refresh: bool = False, _auth=Depends(require_scopes(["history:read"]))):
+    caps = exec_backends.probe() if refresh else exec_backends.capabilities()
+    return {"configured": settings.EXEC_BACKEND, "selected": exec_backends.select(), "capabilities": caps}
+
+@app.get("/runner/maven-cache")
+def get_maven_cache(_auth=Depends(require_scopes(["history:read"]))):
+    return maven_cache_stats()
+
+@app.post("/runner/maven-cache/seed", status_code=status.HTTP_202_ACCEPTED)
+def post_maven_cache_seed(_auth=Depends(require_scopes(["generate:preview"]))):
+    started = seed_maven_cache(force=True)
+    return {**maven_cache_stats(), "seeding": started}
+
+@app.get("/runner/maven-workers")
+def get_maven_workers(_auth=Depends(require_scopes(["history:read"]))):
+    return maven_workers_stats()
+
+@app.get("/runner/result-cache")
+def get_result_cache(_auth=Depends(require_scopes(["history:read"]))):
+    return run_cache.stats()
+
+@app.delete("/runner/result-cache")
+def purge_result_cache(_auth=Depends(require_scopes(["generate:preview"]))):
+    return {"purged": run_cache.purge()}
+
+@app.get("/page-perf/trend")
+def page_perf_trend(url: str, days: int = Query(30, ge=1, le=365), limit: int = Query(200, ge=1, le=1000),
+                    _auth=Depends(require_scopes(["history:read"]))):
+    return {"url": url, "points": page_perf.trend(url, days=days, limit=limit)}
+
+@app.get("/runner/selenium-pool")
+def get_selenium_pool(_auth=Depends(require_scopes(["history:read"]))):
+    return webdriver_pool.stats()
+
+@app.get("/audit/stats")
+def get_audit_stats(_auth=Depends(require_scopes(["history:read"]))):
+    return audit.stats()
+
+@app.get("/metrics/latency")
+def get_latency_metrics(
+    route: Optional[str] = Query(None, description="Gabarit de route, ex. /executions/{exec_id}"),
+    method: Optional[str] = None,
+    status_class: Optional[str] = Query(None, regex=r"^[1-5]xx$"),
+    hours: float = Query(24, gt=0, le=24 * 400),
+    percentiles: str = Query("50,95,99"),
+    limit: int = Query(50, ge=1, le=500),
+    _auth=Depends(require_scopes(["history:read"])),
+):
+    try:
+        qs = [float(q) for q in percentiles.split(",") if q.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="percentiles: liste de nombres séparés par des virgules")
+    if any(q <= 0 or q > 100 for q in qs):
+        raise HTTPException(status_code=422, detail="percentiles: valeurs dans ]0, 100]")
+    return latency_rollup.query(route=route, method=method, status_class=status_class, hours=hours,
+                                percentiles=qs, limit=limit)
+
+@app.get("/metrics/latency/rollup")
+def get_latency_rollup_stats(_auth=Depends(require_scopes(["history:read"]))):
+    return latency_rollup.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(_auth=Depends(require_scopes(["history:read"]))):
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
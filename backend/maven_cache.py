@@ -0,0 +1,151 @@
+# backend/maven_cache.py
+"""
+Dépôt Maven local partagé pour le runner Java (volume Docker nommé).
+
+- pré-rempli une fois à partir des dépendances de _pom_xml() (projet témoin
+  JUnit 4 + JUnit 5 : plugins ET providers surefire sont résolus) ;
+- une fois le seed complet, les runs passent en mode hors-ligne (-o) ;
+- empreinte (POM + image) : si le template change, le seed est refait ;
+- temps des runs froids (en ligne) vs chauds (hors-ligne) agrégés.
+"""
+from __future__ import annotations
+import hashlib, json, os, shutil, tempfile, threading, time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from settings import settings
+
+_STATE_FILE = Path(__file__).resolve().parent / "artifacts" / "maven-cache.json"
+_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+_LOCK = threading.Lock()
+_seed_thread: Optional[threading.Thread] = None
+
+REPO_IN_CONTAINER = "/root/.m2/repository"
+
+_SEED_TEST_JUNIT5 = """import org.junit.jupiter.api.Test;
+import static org.junit.jupiter.api.Assertions.*;
+public class SeedJupiterTest { @Test void ok() { assertTrue(true); } }
+"""
+_SEED_TEST_JUNIT4 = """import org.junit.Test;
+import static org.junit.Assert.*;
+import static org.hamcrest.MatcherAssert.assertThat;
+import static org.hamcrest.Matchers.is;
+public class SeedVintageTest { @Test public void ok() { assertThat(1, is(1)); } }
+"""
+
+def fingerprint(pom: str) -> str:
+    return hashlib.sha256(f"{settings.MAVEN_IMAGE}\n{pom}".encode("utf-8")).hexdigest()[:16]
+
+def _load() -> Dict:
+    try:
+        return json.loads(_STATE_FILE.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _save(state: Dict) -> None:
+    tmp = _STATE_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, _STATE_FILE)
+
+def is_ready(pom: str) -> bool:
+    st = _load()
+    return bool(st.get("complete")) and st.get("fingerprint") == fingerprint(pom)
+
+def docker_args() -> List[str]:
+    """Montage du volume partagé (vide si le cache est désactivé)."""
+    if not settings.MAVEN_REPO_VOLUME:
+        return []
+    return ["-v", f"{settings.MAVEN_REPO_VOLUME}:{REPO_IN_CONTAINER}"]
+
+def mvn_flags(pom: str) -> List[str]:
+    return ["-o"] if settings.MAVEN_REPO_VOLUME and settings.MAVEN_OFFLINE and is_ready(pom) else []
+
+def looks_like_offline_miss(logs: str) -> bool:
+    """Le volume a été purgé/altéré : artefact absent en mode hors-ligne."""
+    s = logs or ""
+    return "offline mode" in s and ("has not been downloaded" in s or "Cannot access" in s)
+
+def invalidate(reason: str) -> None:
+    with _LOCK:
+        st = _load()
+        st.update({"complete": False, "invalidated_reason": reason, "invalidated_at": time.time()})
+        _save(st)
+
+def record_run(mode: str, duration_s: float) -> None:
+    """mode : 'warm' (hors-ligne) ou 'cold' (résolution en ligne)."""
+    with _LOCK:
+        st = _load()
+        runs = st.setdefault("runs", {})
+        r = runs.setdefault(mode, {"count": 0, "total_s": 0.0, "last_s": None})
+        r["count"] += 1
+        r["total_s"] = round(r["total_s"] + duration_s, 3)
+        r["last_s"] = round(duration_s, 3)
+        _save(st)
+
+def stats(pom: str) -> Dict:
+    st = _load()
+    runs = st.get("runs") or {}
+    avg = {m: round(r["total_s"] / r["count"], 3) for m, r in runs.items() if r.get("count")}
+    return {
+        "volume": settings.MAVEN_REPO_VOLUME,
+        "image": settings.MAVEN_IMAGE,
+        "fingerprint": fingerprint(pom),
+        "seeded_fingerprint": st.get("fingerprint"),
+        "ready": is_ready(pom),
+        "offline": bool(mvn_flags(pom)),
+        "seeded_at": st.get("seeded_at"),
+        "seed_duration_s": st.get("seed_duration_s"),
+        "seeding": bool(_seed_thread and _seed_thread.is_alive()),
+        "runs": runs,
+        "avg_s": avg,
+        "speedup": round(avg["cold"] / avg["warm"], 2) if avg.get("cold") and avg.get("warm") else None,
+    }
+
+def seed(pom: str, run_cmd: Callable[[List[str]], tuple]) -> Dict:
+    """
+    Résout tout ce dont un run a besoin dans le volume : go-offline puis un
+    `mvn test` sur un projet témoin (providers surefire JUnit 4/5 inclus).
+    """
+    fp = fingerprint(pom)
+    tmpdir = tempfile.mkdtemp(prefix="m2-seed-")
+    t0 = time.time()
+    try:
+        with open(os.path.join(tmpdir, "pom.xml"), "w", encoding="utf-8") as f:
+            f.write(pom)
+        test_dir = os.path.join(tmpdir, "src", "test", "java")
+        os.makedirs(test_dir)
+        with open(os.path.join(test_dir, "SeedJupiterTest.java"), "w", encoding="utf-8") as f:
+            f.write(_SEED_TEST_JUNIT5)
+        with open(os.path.join(test_dir, "SeedVintageTest.java"), "w", encoding="utf-8") as f:
+            f.write(_SEED_TEST_JUNIT4)
+        base = ["docker", "run", "--rm", "-v", f"{tmpdir}:/project", "-w", "/project", *docker_args(), settings.MAVEN_IMAGE]
+        rc1, out1, err1 = run_cmd(base + ["mvn", "-B", "dependency:go-offline"])
+        rc2, out2, err2 = run_cmd(base + ["mvn", "-B", "test", "-DfailIfNoTests=false"])
+        complete = rc1 == 0 and rc2 == 0
+        with _LOCK:
+            st = _load()
+            st.update({
+                "fingerprint": fp,
+                "complete": complete,
+                "seeded_at": time.time(),
+                "seed_duration_s": round(time.time() - t0, 3),
+                "seed_error": None if complete else ((err2 or out2 or err1 or out1 or "")[-2000:]),
+            })
+            _save(st)
+        return st
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+def ensure_seeded_async(pom: str, run_cmd: Callable[[List[str]], tuple], force: bool = False) -> bool:
+    """Lance le seed en arrière-plan s'il manque/est périmé ; True si un seed tourne."""
+    global _seed_thread
+    if not settings.MAVEN_REPO_VOLUME:
+        return False
+    if not force and is_ready(pom):
+        return False
+    with _LOCK:
+        if _seed_thread and _seed_thread.is_alive():
+            return True
+        _seed_thread = threading.Thread(target=seed, args=(pom, run_cmd), name="m2-seed", daemon=True)
+        _seed_thread.start()
+        return True
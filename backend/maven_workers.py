@@ -0,0 +1,232 @@
+# backend/maven_workers.py
+"""
+Pool de workers Maven "chauds" pour le runner Java.
+
+Chaque worker est un conteneur persistant (`sleep infinity`) qui monte :
+- son propre répertoire de workspaces (un sous-dossier par job, supprimé après) ;
+- le dépôt Maven partagé (maven_cache.docker_args()).
+Les jobs passent par `docker exec` : plus de démarrage de conteneur par run, et
+avec MAVEN_WORKER_MVN=mvnd le démon Maven reste chaud d'un job à l'autre.
+
+Santé vérifiée à chaque prise, recyclage après MAVEN_WORKER_MAX_RUNS jobs,
+après un timeout ou si le conteneur ne répond plus. Un démarrage en échec met
+le pool en pause (repli sur `docker run`) puis il est retenté, avec un délai
+qui double à chaque échec consécutif (MAVEN_WORKER_RETRY_S, plafond 10 min).
+"""
+from __future__ import annotations
+import os, queue, shutil, subprocess, tempfile, threading, time, uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from settings import settings
+import maven_cache
+
+_ROOT = Path(tempfile.gettempdir()) / "ai-tests-mvn-workers"
+_LABEL = "ai-tests.worker=maven"
+_ACQUIRE_TIMEOUT_S = 300
+_JOB_TIMEOUT_S = 900
+
+_idle: "queue.Queue[_Worker]" = queue.Queue()
+_workers: Dict[str, "_Worker"] = {}
+_LOCK = threading.Lock()
+_starting: set = set()  # noms en cours de démarrage (hors verrou)
+_retry_at = 0.0         # pool en pause jusqu'à cette date après un échec de démarrage
+_failures = 0           # échecs de démarrage consécutifs (backoff)
+_MAX_BACKOFF_S = 600
+_stats = {"jobs": 0, "total_s": 0.0, "recycled": 0, "timeouts": 0, "start_failures": 0}
+_STATS_LOCK = threading.Lock()
+
+def _count(key: str, amount: float = 1) -> None:
+    with _STATS_LOCK:
+        _stats[key] = round(_stats[key] + amount, 3)
+
+def _image() -> str:
+    return settings.MAVEN_WORKER_IMAGE or settings.MAVEN_IMAGE
+
+def _docker(args: List[str], timeout: float = 60) -> Tuple[int, str]:
+    try:
+        p = subprocess.run(["docker", *args], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                           text=True, timeout=timeout)
+        return p.returncode, p.stdout or ""
+    except subprocess.TimeoutExpired:
+        return 124, "timeout"
+    except Exception as e:
+        return 1, repr(e)
+
+class _Worker:
+    def __init__(self, index: int):
+        self.name = f"ai-tests-mvnw-{index}"
+        self.root = _ROOT / self.name
+        self.runs = 0
+        self.started_at: Optional[float] = None
+        self.busy = False
+
+    def start(self) -> bool:
+        _docker(["rm", "-f", self.name])  # conteneur orphelin d'un précédent démarrage
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.root.mkdir(parents=True, exist_ok=True)
+        rc, out = _docker([
+            "run", "-d", "--name", self.name, "--label", _LABEL,
+            "-v", f"{self.root}:/workspaces",
+            *maven_cache.docker_args(),
+            "-e", f"MAVEN_OPTS={settings.MAVEN_WORKER_OPTS}",
+            _image(), "sleep", "infinity",
+        ], timeout=300)
+        if rc != 0:
+            print(f"ERROR maven worker {self.name}:", out.strip()[-500:])
+            return False
+        self.runs = 0
+        self.started_at = time.time()
+        return True
+
+    def healthy(self) -> bool:
+        rc, _ = _docker(["exec", self.name, "true"], timeout=15)
+        return rc == 0
+
+    def stop(self) -> None:
+        _docker(["rm", "-f", self.name])
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def recycle(self) -> bool:
+        _count("recycled")
+        self.stop()
+        return self.start()
+
+    def run(self, project_dir: str, mvn_args: List[str]) -> Tuple[int, str, str]:
+        """Copie le projet dans un workspace isolé, exécute Maven, rapatrie les target/."""
+        job = uuid.uuid4().hex[:12]
+        ws = self.root / job
+        shutil.copytree(project_dir, ws)
+        try:
+            cmd = ["docker", "exec", "-w", f"/workspaces/{job}", self.name, settings.MAVEN_WORKER_MVN, "-B", *mvn_args]
+            try:
+                p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=_JOB_TIMEOUT_S)
+                rc, out, err = p.returncode, p.stdout, p.stderr
+            except subprocess.TimeoutExpired as e:
+                _count("timeouts")
+                self.runs = settings.MAVEN_WORKER_MAX_RUNS  # force le recyclage
+                rc, out, err = 124, (e.stdout or "") if isinstance(e.stdout, str) else "", f"Timeout {_JOB_TIMEOUT_S}s"
+            # target/ du projet et des modules éventuels (mode suite)
+            for target in [ws / "target", *ws.glob("*/target")]:
+                if target.is_dir():
+                    dest = os.path.join(project_dir, os.path.relpath(target, ws))
+                    shutil.copytree(target, dest, dirs_exist_ok=True)
+            return rc, out, err
+        finally:
+            # fichiers créés par root dans le conteneur : nettoyage côté conteneur d'abord
+            _docker(["exec", self.name, "rm", "-rf", f"/workspaces/{job}"], timeout=60)
+            shutil.rmtree(ws, ignore_errors=True)
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "runs": self.runs, "busy": self.busy,
+                "uptime_s": round(time.time() - self.started_at, 1) if self.started_at else None}
+
+def enabled() -> bool:
+    return settings.MAVEN_WORKERS > 0 and time.time() >= _retry_at
+
+def _ensure_started() -> None:
+    """
+    Démarrage paresseux des workers manquants. Le verrou ne couvre que la
+    réservation des noms : les `docker run` (jusqu'à 300 s) se font hors verrou.
+    """
+    global _retry_at, _failures
+    if not enabled():
+        return
+    with _LOCK:
+        todo = [i for i in range(settings.MAVEN_WORKERS)
+                if f"ai-tests-mvnw-{i}" not in _workers and f"ai-tests-mvnw-{i}" not in _starting]
+        _starting.update(f"ai-tests-mvnw-{i}" for i in todo)
+    try:
+        for i in todo:
+            w = _Worker(i)
+            ok = w.start()
+            with _LOCK:
+                _starting.discard(w.name)
+                if not ok:
+                    _failures += 1
+                    _retry_at = time.time() + min(_MAX_BACKOFF_S, settings.MAVEN_WORKER_RETRY_S * 2 ** (_failures - 1))
+                    _count("start_failures")
+                    return
+                _failures = 0
+                _workers[w.name] = w
+            _idle.put(w)
+    finally:
+        with _LOCK:
+            _starting.difference_update(f"ai-tests-mvnw-{i}" for i in todo)
+
+def _acquire() -> Optional[_Worker]:
+    _ensure_started()
+    if not enabled() or not _workers:
+        return None
+    try:
+        w = _idle.get(timeout=_ACQUIRE_TIMEOUT_S)
+    except queue.Empty:
+        return None
+    if not w.healthy() and not w.recycle():
+        with _LOCK:
+            _workers.pop(w.name, None)
+        return None
+    w.busy = True
+    return w
+
+def _release(w: _Worker) -> None:
+    w.busy = False
+    w.runs += 1
+    if w.runs < settings.MAVEN_WORKER_MAX_RUNS:
+        _idle.put(w)
+        return
+
+    def _renew():
+        if w.recycle():
+            _idle.put(w)
+        else:
+            with _LOCK:
+                _workers.pop(w.name, None)
+    threading.Thread(target=_renew, name=f"{w.name}-recycle", daemon=True).start()
+
+def run(project_dir: str, mvn_args: List[str]) -> Optional[Tuple[int, str, str]]:
+    """Exécute `mvn <args>` sur un worker ; None si le pool est indisponible."""
+    if not enabled():
+        return None
+    w = _acquire()
+    if w is None:
+        return None
+    t0 = time.time()
+    header = f"[INFO] Worker Maven {w.name} (run {w.runs + 1})\n"
+    try:
+        rc, out, err = w.run(project_dir, mvn_args)
+    finally:
+        _count("jobs")
+        _count("total_s", time.time() - t0)
+        _release(w)
+    return rc, header + (out or ""), err
+
+def warm_up_async() -> None:
+    """Démarre les conteneurs en arrière-plan (au démarrage de l'API)."""
+    if enabled():
+        threading.Thread(target=_ensure_started, name="mvn-workers-start", daemon=True).start()
+
+def shutdown() -> None:
+    with _LOCK:
+        for w in list(_workers.values()):
+            w.stop()
+        _workers.clear()
+        while not _idle.empty():
+            _idle.get_nowait()
+
+def stats() -> Dict:
+    with _STATS_LOCK:
+        counters = dict(_stats)
+    jobs = counters["jobs"]
+    return {
+        "enabled": enabled(),
+        "size": settings.MAVEN_WORKERS,
+        "max_runs": settings.MAVEN_WORKER_MAX_RUNS,
+        "image": _image(),
+        "mvn": settings.MAVEN_WORKER_MVN,
+        "idle": _idle.qsize(),
+        "workers": [w.to_dict() for w in list(_workers.values())],
+        "retry_in_s": round(max(0.0, _retry_at - time.time()), 1),
+        **counters,
+        "avg_s": round(counters["total_s"] / jobs, 3) if jobs else None,
+    }
@@ -0,0 +1,245 @@
+# backend/metrics.py
+"""
+Métriques en mémoire, exposées au format texte Prometheus (GET /metrics).
+
+Chemin chaud sans verrou : chaque série (jeu de labels) garde une ligne de
+compteurs par thread (threading.local), fusionnées seulement au scrape ; la
+ligne d'un thread terminé est reversée dans une ligne de base. Une
+série résolue une fois (`H.labels(...)`, `timed`) coûte quelques centaines de
+ns par observation (cf. `python bench.py metrics`).
+Les jauges sont des fonctions évaluées au scrape.
+"""
+from __future__ import annotations
+import asyncio, bisect, functools, threading, weakref
+from time import perf_counter
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# secondes : de 1 ms (accès mémoire/Mongo) à 10 min (Maven à froid, LLM lent)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_registry: List["_Metric"] = []
+_gauges: List[Tuple[str, str, Sequence[str], Callable[[], Dict[Tuple, float]]]] = []
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v != float("inf") else "+Inf"
+
+class _Owner:
+    """Objet porté par le threading.local : libéré à la fin du thread, il déclenche le report de sa ligne."""
+    __slots__ = ("__weakref__",)
+
+class _Child:
+    """Une série (jeu de valeurs de labels) ; une ligne de compteurs par thread vivant."""
+    __slots__ = ("_local", "_rows", "_base", "_lock", "_width")
+
+    def __init__(self, width: int):
+        self._local = threading.local()
+        self._rows: Dict[int, List] = {}  # id(ligne) -> ligne d'un thread vivant
+        self._base = [0] * (width - 1) + [0.0]  # cumul des threads terminés
+        self._lock = threading.Lock()
+        self._width = width
+
+    def _row(self) -> List:
+        row = [0] * (self._width - 1) + [0.0]
+        owner = _Owner()
+        with self._lock:
+            self._rows[id(row)] = row
+        weakref.finalize(owner, self._fold, row)
+        self._local.row = row
+        self._local.owner = owner
+        return row
+
+    def _fold(self, row: List) -> None:
+        with self._lock:
+            self._rows.pop(id(row), None)
+            for i, v in enumerate(row):
+                self._base[i] += v
+
+    def total(self) -> List:
+        with self._lock:
+            rows = [list(self._base)] + [list(r) for r in self._rows.values()]
+        return [sum(col) for col in zip(*rows)]
+
+class CounterChild(_Child):
+    __slots__ = ()
+
+    def inc(self, amount: float = 1.0) -> None:
+        try:
+            row = self._local.row
+        except AttributeError:
+            row = self._row()
+        row[0] += amount
+
+class HistogramChild(_Child):
+    __slots__ = ("bounds",)
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        super().__init__(len(bounds) + 2)  # cases..., +Inf, somme
+        self.bounds = bounds
+
+    def observe(self, value: float) -> None:
+        try:
+            row = self._local.row
+        except AttributeError:
+            row = self._row()
+        row[bisect.bisect_left(self.bounds, value)] += 1
+        row[-1] += value
+
+    def time(self) -> "_Timer":
+        """with child.time(): ... — observe la durée du bloc (même en cas d'exception)."""
+        return _Timer(self)
+
+class _Timer:
+    __slots__ = ("child", "t0")
+
+    def __init__(self, child: HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(perf_counter() - self.t0)
+        return False
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labels)
+        self._children: Dict[Tuple, _Child] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _new_child(self) -> _Child:
+        raise NotImplementedError
+
+    def labels(self, *values) -> _Child:
+        """Série pour ces valeurs de labels ; à garder sous la main sur les chemins les plus chauds."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _series(self) -> List[Tuple[Tuple, List]]:
+        with self._lock:
+            items = list(self._children.items())
+        return sorted((k, c.total()) for k, c in items)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild(2)
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        (self._children.get(labels) or self.labels(*labels)).inc(amount)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_num(row[0])}" for k, row in self._series()]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.bounds)
+
+    def observe(self, value: float, *labels) -> None:
+        (self._children.get(labels) or self.labels(*labels)).observe(value)
+
+    def time(self, *labels) -> _Timer:
+        return _Timer(self.labels(*labels))
+
+    def render(self) -> List[str]:
+        out: List[str] = []
+        for k, row in self._series():
+            cum = 0
+            for bound, n in zip((*self.bounds, float("inf")), row):
+                cum += n
+                le = 'le="%s"' % _num(bound)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, k, le)} {cum}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, k)} {_num(row[-1])}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, k)} {cum}")
+        return out
+
+def timed(h: Histogram, *labels):
+    """Décorateur : observe la durée de chaque appel dans h (série résolue une fois) ; accepte les coroutines."""
+    def deco(fn):
+        observe = h.labels(*labels).observe
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                t0 = perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    observe(perf_counter() - t0)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(perf_counter() - t0)
+        return wrapper
+    return deco
+
+def gauge(name: str, doc: str, fn: Callable[[], object], labels: Sequence[str] = ()) -> None:
+    """Jauge calculée au scrape : fn() -> nombre, ou {tuple de labels: nombre}."""
+    _gauges.append((name, doc, tuple(labels), fn))
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _registry:
+        lines += [f"# HELP {m.name} {m.doc}", f"# TYPE {m.name} {m.kind}", *m.render()]
+    for name, doc, labelnames, fn in _gauges:
+        try:
+            val = fn()
+        except Exception:
+            continue
+        lines += [f"# HELP {name} {doc}", f"# TYPE {name} gauge"]
+        items = val.items() if isinstance(val, dict) else [((), val)]
+        lines += [f"{name}{_labels(labelnames, k)} {_num(v)}" for k, v in sorted(items)]
+    return "\n".join(lines) + "\n"
+
+# ============================
+# Métriques du backend
+# ============================
+
+LLM_SECONDS = Histogram("llm_request_duration_seconds", "Durée des appels LLM", ("provider", "model", "pass"))
+LLM_REQUESTS = Counter("llm_requests_total", "Appels LLM par issue", ("provider", "model", "pass", "outcome"))
+LLM_TOKENS = Counter("llm_tokens_total", "Jetons consommés (prompt / completion)", ("provider", "model", "type"))
+
+JOBS_SUBMITTED = Counter("jobs_submitted_total", "Jobs soumis", ("kind",))
+JOBS = Counter("jobs_total", "Jobs terminés, par issue", ("kind", "outcome"))
+JOB_WAIT = Histogram("job_queue_wait_seconds", "Attente en file avant exécution", ("kind",))
+JOB_RUN = Histogram("job_run_duration_seconds", "Durée d'exécution des jobs", ("kind",))
+
+STORE_SECONDS = Histogram("store_operation_duration_seconds", "Opérations exec_store / database",
+                          ("store", "op"), buckets=(1e-5, 5e-5, 1e-4, 5e-4, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+MONGO_SECONDS = Histogram("mongo_command_duration_seconds", "Commandes MongoDB (toutes collections)",
+                          ("command", "collection"), buckets=(1e-4, 5e-4, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                                                              0.1, 0.25, 0.5, 1, 5))
+MONGO_FAILURES = Counter("mongo_command_failures_total", "Commandes MongoDB en échec", ("command", "collection"))
+
+RUNNER_PHASE = Histogram("runner_phase_duration_seconds", "Phases des runners (préparation, exécution, ingestion...)",
+                         ("runner", "phase"))
@@ -0,0 +1,206 @@
+# backend/native_runner.py
+"""
+Runners natifs (sans Docker) pour les tests Python (pytest) et JS/TS (Jest).
+
+Workspace isolé (tmpfs si possible) construit à partir de `code` + `generated_test`,
+exécution sous les limites du backend local, parallélisme par workers
+(pytest-xdist `-n`, Jest `--maxWorkers`) et sortie JUnit XML
+(reports/TEST-*.xml) ingérée comme les rapports surefire.
+"""
+from __future__ import annotations
+import importlib.util, json, os, re, shutil, sys, sysconfig, tempfile, time
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+from artifacts import register_dir
+from settings import settings
+from metrics import RUNNER_PHASE
+import exec_backends
+from test_runner import _ingest_surefire
+
+_PY_IMPORT_RE = re.compile(r"^\s*(?:from\s+([A-Za-z_]\w*)(?:\.\w+)*\s+import|import\s+([A-Za-z_]\w*))", re.MULTILINE)
+_JS_IMPORT_RE = re.compile(r"""(?:require\(\s*|from\s+)['"]\./([\w\-./]+?)(?:\.(?:js|ts|mjs|cjs))?['"]""")
+_JS_MODULE_RE = re.compile(r"[\w-]+(?:/[\w-]+)*")  # chemin relatif sans "." ni ".." : reste dans le workspace
+_TEST_LIBS = {"pytest", "unittest", "mock", "hypothesis"}
+_REPORTS = "reports"
+
+def _write(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content or "")
+
+def _ws_path(ws: str, rel: str) -> str:
+    """Chemin de `rel` sous le workspace ; ValueError s'il en sort (nom issu du test généré)."""
+    root = os.path.realpath(ws)
+    path = os.path.realpath(os.path.join(root, rel))
+    if not path.startswith(root + os.sep):
+        raise ValueError(f"chemin hors du workspace : {rel!r}")
+    return path
+
+def _workspace(prefix: str) -> str:
+    return tempfile.mkdtemp(prefix=prefix, dir=exec_backends.workspace_root())
+
+def _finish(ws: str, rc: int, out: str, err: str, exec_id: Optional[str], test_case_id: Optional[str],
+            header: str, runner: str) -> Tuple[bool, str, List[Dict]]:
+    report_dir = os.path.join(ws, _REPORTS)
+    with RUNNER_PHASE.time(runner, "ingest"):
+        rows = _ingest_surefire(report_dir, exec_id, test_case_id)
+        arts = register_dir(report_dir)
+    logs = header + (out or "") + ("\n--- STDERR ---\n" + err if err else "")
+    if not rows:
+        logs += "\n[WARN] Aucun rapport JUnit produit (erreur de collecte/compilation ?)\n"
+    ok = rc == 0 and bool(rows)
+    return ok, logs, arts
+
+# ============================
+# 1) pytest
+# ============================
+
+def _stdlib_dirs() -> Tuple[str, ...]:
+    paths = sysconfig.get_paths()
+    return tuple({os.path.realpath(paths[k]) + os.sep for k in ("stdlib", "platstdlib") if paths.get(k)})
+
+def _is_stdlib(name: str, spec) -> bool:
+    """sys.stdlib_module_names (3.10+), sinon origine du module : built-in, gelé ou sous le répertoire stdlib."""
+    names = getattr(sys, "stdlib_module_names", None)
+    if names is not None:
+        return name in names
+    if spec is None or not spec.origin:
+        return False
+    if spec.origin in ("built-in", "frozen"):
+        return True
+    origin = os.path.realpath(spec.origin)
+    return origin.startswith(_stdlib_dirs()) and not _is_installed(origin)
+
+def _is_installed(origin: str) -> bool:
+    return "site-packages" in origin or "dist-packages" in origin
+
+def _python_modules(test_src: str) -> List[str]:
+    """Modules importés par le test qui ne sont ni stdlib ni installés : le code sous test."""
+    names = []
+    for a, b in _PY_IMPORT_RE.findall(test_src or ""):
+        name = a or b
+        if name in _TEST_LIBS or name in names:
+            continue
+        try:
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            spec = None
+        if _is_stdlib(name, spec):
+            continue
+        # seuls les paquets installés comptent (pas les modules du backend lui-même)
+        if not (spec and spec.origin and _is_installed(spec.origin)):
+            names.append(name)
+    return names or ["solution"]
+
+def run_pytest(code_src: str, test_src: str, exec_id: Optional[str] = None,
+               test_case_id: Optional[str] = None) -> Tuple[bool, str, List[Dict]]:
+    caps = exec_backends.capabilities()
+    if not caps.get("pytest"):
+        return False, "[ERROR] pytest indisponible sur l'hôte (pip install pytest pytest-xdist)\n", []
+    t0 = time.perf_counter()
+    ws = _workspace("py-test-")
+    try:
+        for mod in _python_modules(test_src):
+            _write(_ws_path(ws, f"{mod}.py"), code_src)
+        _write(os.path.join(ws, "test_generated.py"), test_src)
+        cmd = [sys.executable, "-m", "pytest", "test_generated.py", "-q", "-p", "no:cacheprovider",
+               f"--junitxml={_REPORTS}/TEST-pytest.xml", "-o", "junit_family=xunit2"]
+        workers = settings.NATIVE_TEST_WORKERS
+        if caps.get("xdist") and workers not in ("", "0", "1"):
+            cmd += ["-n", workers]  # pytest-xdist : répartition des tests sur N workers
+        header = f"[INFO] pytest ({'xdist -n ' + workers if '-n' in cmd else 'séquentiel'})\n"
+        RUNNER_PHASE.observe(time.perf_counter() - t0, "pytest", "prepare")
+        with RUNNER_PHASE.time("pytest", "execute"):
+            rc, out, err = exec_backends.run_local(cmd, cwd=ws, env={"PYTHONPATH": ws, "PYTHONDONTWRITEBYTECODE": "1"})
+        # rc 1 = tests en échec ; 2+ = collecte/usage/interruption
+        return _finish(ws, rc, out, err, exec_id, test_case_id, header, "pytest")
+    finally:
+        shutil.rmtree(ws, ignore_errors=True)
+
+# ============================
+# 2) Jest
+# ============================
+
+def jest_json_to_junit(data: Dict) -> ET.ElementTree:
+    """Résultat `jest --json` -> JUnit XML (évite la dépendance jest-junit)."""
+    root = ET.Element("testsuites")
+    for suite in data.get("testResults") or []:
+        name = os.path.basename(suite.get("name") or "jest")
+        cases = suite.get("assertionResults") or []
+        ts = ET.SubElement(root, "testsuite", name=name, tests=str(len(cases)))
+        failures = skipped = 0
+        for c in cases:
+            tc = ET.SubElement(ts, "testcase", classname=" > ".join(c.get("ancestorTitles") or []) or name,
+                               name=c.get("title") or c.get("fullName") or "",
+                               time=f"{(c.get('duration') or 0) / 1000.0:.3f}")
+            status = c.get("status")
+            if status == "failed":
+                failures += 1
+                msg = "\n".join(c.get("failureMessages") or [])
+                el = ET.SubElement(tc, "failure", message=msg.split("\n", 1)[0][:500])
+                el.text = msg
+            elif status in ("pending", "skipped", "todo", "disabled"):
+                skipped += 1
+                ET.SubElement(tc, "skipped")
+        if not cases and suite.get("status") == "failed":
+            # suite qui ne compile/charge pas : une entrée en erreur
+            tc = ET.SubElement(ts, "testcase", classname=name, name="(suite)", time="0")
+            el = ET.SubElement(tc, "error", message=(suite.get("message") or "").split("\n", 1)[0][:500])
+            el.text = suite.get("message") or ""
+            failures += 1
+        ts.set("failures", str(failures))
+        ts.set("skipped", str(skipped))
+    return ET.ElementTree(root)
+
+def _js_modules(test_src: str) -> List[str]:
+    names = []
+    for n in _JS_IMPORT_RE.findall(test_src or ""):
+        if _JS_MODULE_RE.fullmatch(n) and n not in names:
+            names.append(n)
+    return names or ["index"]
+
+def run_jest(code_src: str, test_src: str, language: str = "javascript", exec_id: Optional[str] = None,
+             test_case_id: Optional[str] = None) -> Tuple[bool, str, List[Dict]]:
+    caps = exec_backends.capabilities()
+    if not caps.get("jest"):
+        return False, "[ERROR] Jest indisponible sur l'hôte (npm i -g jest, ou JEST_CMD)\n", []
+    ext = "ts" if language == "typescript" else "js"
+    t0 = time.perf_counter()
+    ws = _workspace("js-test-")
+    try:
+        for mod in _js_modules(test_src):
+            _write(_ws_path(ws, f"{mod}.{ext}"), code_src)
+        _write(os.path.join(ws, f"generated.test.{ext}"), test_src)
+        config: Dict = {"testEnvironment": "node", "rootDir": ws}
+        if ext == "ts":
+            config["preset"] = "ts-jest"  # nécessite ts-jest à côté de Jest
+        _write(os.path.join(ws, "jest.config.json"), json.dumps(config))
+        results = os.path.join(ws, "jest-results.json")
+        workers = settings.NATIVE_TEST_WORKERS
+        cmd = [*exec_backends.jest_command(), "--config", "jest.config.json", "--ci", "--json",
+               f"--outputFile={results}"]
+        if workers and workers != "auto":
+            cmd.append(f"--maxWorkers={workers}")
+        header = f"[INFO] Jest ({language}, maxWorkers={workers})\n"
+        RUNNER_PHASE.observe(time.perf_counter() - t0, "jest", "prepare")
+        with RUNNER_PHASE.time("jest", "execute"):
+            rc, out, err = exec_backends.run_local(cmd, cwd=ws)
+        if os.path.isfile(results):
+            with open(results, encoding="utf-8") as f:
+                tree = jest_json_to_junit(json.load(f))
+            os.makedirs(os.path.join(ws, _REPORTS), exist_ok=True)
+            tree.write(os.path.join(ws, _REPORTS, "TEST-jest.xml"), encoding="utf-8", xml_declaration=True)
+        return _finish(ws, rc, out, err, exec_id, test_case_id, header, "jest")
+    finally:
+        shutil.rmtree(ws, ignore_errors=True)
+
+def run_native(language: str, code_src: str, test_src: str, exec_id: Optional[str] = None,
+               test_case_id: Optional[str] = None) -> Tuple[bool, str, List[Dict]]:
+    if language == "python":
+        return run_pytest(code_src, test_src, exec_id, test_case_id)
+    if language in ("javascript", "typescript"):
+        return run_jest(code_src, test_src, language, exec_id, test_case_id)
+    return False, f"Langage non supporté pour l'instant: {language}", []
+
+NATIVE_LANGUAGES = {"python": "pytest", "javascript": "jest", "typescript": "jest"}
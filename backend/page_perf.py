@@ -0,0 +1,127 @@
+# backend/page_perf.py
+"""
+Mesures de performance front (Performance API) pendant les exécutions Selenium.
+
+- Navigation Timing (TTFB, DOMContentLoaded, load...), Resource Timing
+  (nombre, octets, types, plus lentes), paint (FP/FCP), LCP et CLS via
+  PerformanceObserver (buffered) ;
+- N répétitions par URL -> médianes ;
+- une ligne par (exécution, URL) dans page_perf pour les tendances.
+"""
+from __future__ import annotations
+import statistics
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING
+
+from database import db
+
+perf_col = db["page_perf"]
+_indexes_ready = False
+
+# Script asynchrone : les observers "buffered" rejouent les entrées LCP / layout-shift déjà émises.
+PERF_JS = """
+const done = arguments[arguments.length - 1];
+const out = {lcp: null, cls: 0};
+try {
+  new PerformanceObserver(l => { for (const e of l.getEntries()) out.lcp = e.renderTime || e.loadTime || e.startTime; })
+    .observe({type: 'largest-contentful-paint', buffered: true});
+} catch (e) {}
+try {
+  new PerformanceObserver(l => { for (const e of l.getEntries()) if (!e.hadRecentInput) out.cls += e.value; })
+    .observe({type: 'layout-shift', buffered: true});
+} catch (e) {}
+setTimeout(() => {
+  const nav = performance.getEntriesByType('navigation')[0];
+  const paint = {};
+  performance.getEntriesByType('paint').forEach(p => { paint[p.name] = p.startTime; });
+  const resources = performance.getEntriesByType('resource').map(r => ({
+    name: r.name, type: r.initiatorType, start: r.startTime, duration: r.duration,
+    transfer: r.transferSize || 0, encoded: r.encodedBodySize || 0}));
+  done({nav: nav ? nav.toJSON() : null, paint: paint, lcp: out.lcp, cls: out.cls, resources: resources});
+}, 50);
+"""
+
+METRICS = ("ttfb_ms", "dns_ms", "connect_ms", "dom_interactive_ms", "dom_content_loaded_ms", "load_ms",
+           "fp_ms", "fcp_ms", "lcp_ms", "cls", "transfer_bytes", "resources")
+_TOP_RESOURCES = 10
+
+def ensure_indexes() -> None:
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    perf_col.create_index([("url", ASCENDING), ("created_at", DESCENDING)])
+    perf_col.create_index([("exec_id", ASCENDING)])
+    _indexes_ready = True
+
+def _r(v) -> Optional[float]:
+    return round(float(v), 2) if isinstance(v, (int, float)) else None
+
+def collect(driver, timeout_s: float = 10) -> Dict:
+    """Relevé brut de la page courante (après l'attente de disponibilité)."""
+    driver.set_script_timeout(timeout_s)
+    return driver.execute_async_script(PERF_JS) or {}
+
+def summarize(raw: Dict) -> Dict:
+    nav = raw.get("nav") or {}
+    paint = raw.get("paint") or {}
+    res = raw.get("resources") or []
+    by_type: Dict[str, Dict] = {}
+    for r in res:
+        t = by_type.setdefault(r.get("type") or "other", {"count": 0, "transfer_bytes": 0})
+        t["count"] += 1
+        t["transfer_bytes"] += int(r.get("transfer") or 0)
+
+    def span(a: str, b: str) -> Optional[float]:
+        return _r(nav[b] - nav[a]) if nav.get(a) is not None and nav.get(b) is not None else None
+
+    return {
+        "ttfb_ms": _r(nav.get("responseStart")),
+        "dns_ms": span("domainLookupStart", "domainLookupEnd"),
+        "connect_ms": span("connectStart", "connectEnd"),
+        "dom_interactive_ms": _r(nav.get("domInteractive")),
+        "dom_content_loaded_ms": _r(nav.get("domContentLoadedEventEnd")),
+        "load_ms": _r(nav.get("loadEventEnd")),
+        "fp_ms": _r(paint.get("first-paint")),
+        "fcp_ms": _r(paint.get("first-contentful-paint")),
+        "lcp_ms": _r(raw.get("lcp")),
+        "cls": round(float(raw.get("cls") or 0), 4),
+        "transfer_bytes": int(nav.get("transferSize") or 0) + sum(int(r.get("transfer") or 0) for r in res),
+        "resources": len(res),
+        "resources_by_type": by_type,
+        "slowest_resources": [
+            {"name": r.get("name"), "type": r.get("type"), "duration_ms": _r(r.get("duration")),
+             "transfer_bytes": int(r.get("transfer") or 0)}
+            for r in sorted(res, key=lambda r: r.get("duration") or 0, reverse=True)[:_TOP_RESOURCES]
+        ],
+    }
+
+def aggregate(samples: List[Dict]) -> Dict:
+    """Médiane (et min/max) de chaque métrique sur les répétitions d'une URL."""
+    out: Dict = {"samples": len(samples), "median": {}, "min": {}, "max": {}}
+    for m in METRICS:
+        vals = [s[m] for s in samples if s.get(m) is not None]
+        if vals:
+            out["median"][m] = round(statistics.median(vals), 4)
+            out["min"][m] = min(vals)
+            out["max"][m] = max(vals)
+    return out
+
+def save(exec_id: str, per_url: Dict[str, Dict]) -> None:
+    if not per_url:
+        return
+    ensure_indexes()
+    now = datetime.utcnow()
+    perf_col.insert_many([{"exec_id": exec_id, "url": url, "created_at": now, "samples": agg["samples"],
+                           "metrics": agg["median"]} for url, agg in per_url.items()], ordered=False)
+
+def trend(url: str, days: int = 30, limit: int = 200) -> List[Dict]:
+    """Médianes par exécution pour une URL, de la plus ancienne à la plus récente."""
+    since = datetime.utcnow() - timedelta(days=days)
+    cur = perf_col.find({"url": url, "created_at": {"$gte": since}}, {"_id": 0}).sort("created_at", -1).limit(limit)
+    out = []
+    for d in cur:
+        d["created_at"] = d["created_at"].isoformat() + "Z"
+        out.append(d)
+    return list(reversed(out))
@@ -1,17 +1,148 @@
-import time
+# backend/rate_limit.py
+"""
+Limiteur de débit GCRA (équivalent d'un seau à jetons) : un seul flottant par
+clé (TAT, « theoretical arrival time »), décision en O(1).
+
+- limite de `max_per_min` requêtes par minute, rafale de `burst` (défaut = limite) ;
+- clés par IP et, si l'auth est active, par utilisateur (sub du JWT) ;
+- mémoire bornée : LRU (RATE_LIMIT_MAX_KEYS) ; une clé dont le TAT est passé
+  équivaut à une clé absente, l'évincer ne perd aucun état ;
+- RATE_LIMIT_BACKEND=mongo : TAT partagé entre workers (mise à jour atomique
+  côté serveur, horloge $$NOW), retour au mode mémoire si Mongo ne répond pas.
+"""
+from __future__ import annotations
+import math, threading, time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 from fastapi import HTTPException, Request
+from pymongo import ReturnDocument
+
+from database import db, ensure_ttl_index
+from metrics import Counter, gauge
+from security import verify_access
+from settings import settings
+
+_DECISIONS = Counter("rate_limit_decisions_total", "Décisions du limiteur", ("bucket", "outcome"))
+_EVICTIONS = Counter("rate_limit_evictions_total", "Clés évincées du limiteur (LRU / inactives)", ("reason",))
+_MONGO_ERRORS = Counter("rate_limit_mongo_errors_total", "Repli mémoire faute de Mongo")
+
+class GCRA:
+    """Table TAT en mémoire, bornée en LRU. Thread-safe."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max(1, max_keys)
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, interval: float, tau: float, now: Optional[float] = None) -> Tuple[bool, float]:
+        """(autorisé, secondes avant la prochaine requête autorisée)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tat = self._tat.get(key)
+            new_tat = (now if tat is None or tat < now else tat) + interval
+            if new_tat - now > tau:
+                return False, new_tat - tau - now
+            self._tat[key] = new_tat
+            self._tat.move_to_end(key)
+            if len(self._tat) > self.max_keys:
+                self._evict(now)
+            return True, 0.0
+
+    def _evict(self, now: float) -> None:
+        # tête = moins récemment utilisées ; une clé expirée (TAT passé) ne porte plus d'état
+        while len(self._tat) > self.max_keys:
+            _k, tat = self._tat.popitem(last=False)
+            _EVICTIONS.inc("idle" if tat <= now else "lru")
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+_local = GCRA(settings.RATE_LIMIT_MAX_KEYS)
+gauge("rate_limit_keys", "Clés suivies par le limiteur (mémoire)", lambda: len(_local))
+
+# ============================
+# Mode partagé (Mongo)
+# ============================
+
+_col = db["rate_limits"]
+_indexes_ready = False
+
+def _ensure_indexes() -> None:
+    global _indexes_ready
+    if not _indexes_ready:
+        ensure_ttl_index(_col, "expires_at", 0)  # la clé disparaît quand son TAT est passé
+        _indexes_ready = True
+
+def _mongo_hit(key: str, interval: float, tau: float) -> Tuple[bool, float]:
+    _ensure_indexes()
+    now = {"$divide": [{"$toLong": "$$NOW"}, 1000]}
+    new_tat = {"$add": [{"$max": [{"$ifNull": ["$tat", 0]}, now]}, interval]}
+    ok = {"$lte": [{"$subtract": ["$_new", now]}, tau]}
+    doc = _col.find_one_and_update(
+        {"_id": key},
+        [
+            {"$set": {"_new": new_tat}},
+            {"$set": {"ok": ok, "tat": {"$cond": [ok, "$_new", "$tat"]}}},
+            {"$set": {"retry": {"$cond": ["$ok", 0, {"$subtract": [{"$subtract": ["$_new", tau]}, now]}]},
+                      "expires_at": {"$toDate": {"$multiply": ["$tat", 1000]}}}},
+            {"$unset": "_new"},
+        ],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        projection={"ok": 1, "retry": 1},
+    )
+    return bool(doc["ok"]), max(0.0, float(doc.get("retry") or 0))
+
+def hit(key: str, max_per_min: int, burst: Optional[int] = None) -> Tuple[bool, float]:
+    interval = 60.0 / max(1, max_per_min)
+    tau = interval * max(1, burst or max_per_min)
+    if settings.RATE_LIMIT_BACKEND == "mongo":
+        try:
+            return _mongo_hit(key, interval, tau)
+        except Exception:
+            _MONGO_ERRORS.inc()
+    return _local.hit(key, interval, tau)
+
+# ============================
+# Dépendance FastAPI
+# ============================
+
+def _client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_PROXY:
+        fwd = request.headers.get("x-forwarded-for")
+        if fwd:
+            return fwd.split(",", 1)[0].strip()
+    return request.client.host if request.client else "unknown"
 
-_BUCKET = {}
+def _user(request: Request) -> Optional[str]:
+    if not settings.AUTH_ENABLED:
+        return None  # tout le monde est "dev" : seule l'IP départage
+    auth = request.headers.get("authorization") or ""
+    if not auth.lower().startswith("bearer "):
+        return None
+    try:
+        return verify_access(auth.split(" ", 1)[1]).get("sub")
+    except HTTPException:
+        return None  # rejeté par require_scopes de toute façon
 
-def rate_limit(max_per_min: int):
-    window = 60.0
+def rate_limit(max_per_min: int, bucket: str = "default", burst: Optional[int] = None):
+    """
+    Dépendance : 429 + Retry-After au-delà de `max_per_min` par IP et par utilisateur
+    sur le groupe de routes `bucket` (et non par chemin brut : cardinalité bornée).
+    """
     def dep(request: Request):
-        ip = request.client.host if request.client else "unknown"
-        key = f"{ip}:{request.url.path}"
-        now = time.time()
-        ts = [t for t in _BUCKET.get(key, []) if now - t < window]
-        if len(ts) >= max_per_min:
-            raise HTTPException(status_code=429, detail="Trop de requêtes, réessaie dans une minute.")
-        ts.append(now)
-        _BUCKET[key] = ts
+        if max_per_min <= 0:
+            return
+        keys = [f"ip:{_client_ip(request)}:{bucket}"]
+        user = _user(request)
+        if user:
+            keys.append(f"user:{user}:{bucket}")
+        for key in keys:
+            ok, retry = hit(key, max_per_min, burst)
+            if not ok:
+                _DECISIONS.inc(bucket, "limited")
+                raise HTTPException(status_code=429, detail="Trop de requêtes, réessaie plus tard.",
+                                    headers={"Retry-After": str(max(1, math.ceil(retry)))})
+        _DECISIONS.inc(bucket, "allowed")
     return dep
@@ -0,0 +1,169 @@
+# backend/run_cache.py
+"""
+Mémoïsation des résultats du runner Java (opt-in).
+
+Clé = sha256(code nettoyé, test nettoyé, template POM, empreinte de la chaîne
+d'outils du backend). Backend docker : digest de l'image Maven (docker image
+inspect) + binaire Maven des workers ; backend local : versions mvn/java de
+l'hôte. Si la chaîne change, la clé change et les entrées de l'ancienne
+chaîne sont purgées.
+
+Une entrée garde le verdict, le log (artefact gzip), les artefacts et les lignes
+surefire ; chaque hit rafraîchit leur dernier accès (GC par âge / budget).
+"""
+from __future__ import annotations
+import hashlib, subprocess, threading, time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING
+
+from artifacts import read_bytes, save_bytes, stat as artifact_stat, touch
+from database import db
+from settings import settings
+import exec_backends
+
+cache_col = db["run_cache"]
+_indexes_ready = False
+
+_TOOLCHAIN_TTL_S = 300
+_toolchains: Dict[str, Dict] = {}  # backend -> {"id", "checked_at", "refreshing"}
+_toolchain_lock = threading.Lock()
+
+def ensure_indexes() -> None:
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    cache_col.create_index([("key", ASCENDING)], unique=True)
+    cache_col.create_index([("backend", ASCENDING), ("toolchain", ASCENDING)])
+    _indexes_ready = True
+
+def enabled(requested: Optional[bool] = None) -> bool:
+    """Requête explicite prioritaire, sinon JAVA_RESULT_CACHE."""
+    return settings.JAVA_RESULT_CACHE if requested is None else bool(requested)
+
+# ============================
+# Empreinte de la chaîne d'outils
+# ============================
+
+def _image_digest(image: str) -> Optional[str]:
+    try:
+        p = subprocess.run(["docker", "image", "inspect", "--format", "{{.Id}}", image],
+                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=15)
+    except Exception:
+        return None
+    if p.returncode != 0:
+        return None
+    return p.stdout.strip() or None
+
+def _probe_toolchain(backend: str) -> Optional[str]:
+    if backend == "docker":
+        images = sorted({settings.MAVEN_IMAGE, settings.MAVEN_WORKER_IMAGE or settings.MAVEN_IMAGE})
+        parts = [_image_digest(i) for i in images]
+        if not all(parts):
+            return None  # image absente / Docker indisponible : pas de cache
+        parts.append(settings.MAVEN_WORKER_MVN)
+    else:
+        fp = exec_backends.toolchain_fingerprint(backend)
+        if not fp:
+            return None
+        parts = [fp]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+def _refresh_toolchain(backend: str) -> None:
+    st = _toolchains.setdefault(backend, {"id": None, "checked_at": 0.0, "refreshing": False})
+    try:
+        new = _probe_toolchain(backend)
+        with _toolchain_lock:
+            old = st["id"]
+            st.update({"id": new, "checked_at": time.time()})
+        if new and old and new != old:
+            purge(keep_toolchain=new, backend=backend)
+    finally:
+        st["refreshing"] = False
+
+def toolchain_id(backend: str = "docker") -> Optional[str]:
+    """Empreinte courante ; premier appel synchrone, rafraîchie ensuite en arrière-plan."""
+    st = _toolchains.get(backend)
+    if not st or not st["checked_at"]:
+        _refresh_toolchain(backend)
+    elif time.time() - st["checked_at"] > _TOOLCHAIN_TTL_S and not st["refreshing"]:
+        st["refreshing"] = True
+        threading.Thread(target=_refresh_toolchain, args=(backend,), name="run-cache-toolchain", daemon=True).start()
+    return _toolchains[backend]["id"]
+
+def make_key(code_src: str, test_src: str, pom: str, backend: str = "docker") -> Optional[str]:
+    tc = toolchain_id(backend)
+    if not tc:
+        return None
+    h = hashlib.sha256()
+    for part in (code_src or "", test_src or "", pom, backend, tc):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+# ============================
+# Lecture / écriture
+# ============================
+
+def _drop(doc: Dict) -> None:
+    cache_col.delete_one({"_id": doc["_id"]})
+
+def lookup(key: str) -> Optional[Dict]:
+    """Entrée du cache avec ses logs relus ; None si absente ou si un artefact a été collecté."""
+    doc = cache_col.find_one({"key": key})
+    if not doc:
+        return None
+    # le GC a pu expirer un objet (âge max, budget) : entrée invalide
+    art_ids = [a["artifact_id"] for a in doc.get("artifacts") or [] if a.get("artifact_id")]
+    try:
+        logs = read_bytes(doc["logs_artifact"]).decode("utf-8", errors="replace")
+        for art_id in art_ids:
+            artifact_stat(art_id)
+    except FileNotFoundError:
+        _drop(doc)
+        return None
+    # entrée servie : ses objets repartent en tête du LRU du GC
+    for art_id in [doc["logs_artifact"], *art_ids]:
+        touch(art_id)
+    cache_col.update_one({"_id": doc["_id"]}, {"$inc": {"hits": 1}, "$set": {"last_hit_at": datetime.utcnow()}})
+    return {**doc, "logs": logs}
+
+def store(key: str, ok: bool, logs: str, artifacts: List[Dict], rows: List[Dict], tests: Optional[Dict],
+          exec_id: Optional[str], backend: str = "docker") -> None:
+    ensure_indexes()
+    logs_id = save_bytes((logs or "").encode("utf-8"), suffix=".log", compress=True)
+    doc = {
+        "key": key,
+        "backend": backend,
+        "toolchain": (_toolchains.get(backend) or {}).get("id"),
+        "ok": bool(ok),
+        "logs_artifact": logs_id,
+        "artifacts": artifacts or [],
+        "rows": rows or [],
+        "tests": tests,
+        "source_exec_id": exec_id,
+        "created_at": datetime.utcnow(),
+        "hits": 0,
+    }
+    cache_col.replace_one({"key": key}, doc, upsert=True)
+
+def purge(keep_toolchain: Optional[str] = None, backend: Optional[str] = None) -> int:
+    """Supprime les entrées (toutes, ou celles d'une autre chaîne d'outils du backend)."""
+    query: Dict = {"toolchain": {"$ne": keep_toolchain}} if keep_toolchain else {}
+    if backend:
+        query["backend"] = backend
+    n = 0
+    for doc in cache_col.find(query, {"logs_artifact": 1, "artifacts": 1}):
+        _drop(doc)
+        n += 1
+    return n
+
+def stats() -> Dict:
+    agg = list(cache_col.aggregate([{"$group": {"_id": None, "entries": {"$sum": 1}, "hits": {"$sum": "$hits"}}}]))
+    return {
+        "enabled": settings.JAVA_RESULT_CACHE,
+        "toolchains": {b: st["id"] for b, st in _toolchains.items()},
+        "entries": agg[0]["entries"] if agg else 0,
+        "hits": agg[0]["hits"] if agg else 0,
+    }
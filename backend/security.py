@@ -40,7 +40,8 @@ def require_scopes(required: List[str]):
     Si AUTH_ENABLED=false, bypass (aucune auth nécessaire).
     Sinon, vérifie un Bearer token et la présence des scopes.
     """
-    def dep(authorization: Optional[str] = Header(None)):
+    # async : pas de passage par le threadpool (vérification purement CPU)
+    async def dep(authorization: Optional[str] = Header(None)):
         if not settings.AUTH_ENABLED:
             return {"sub": "dev", "scopes": ["*"]}
         if not authorization or not authorization.lower().startswith("bearer "):
@@ -1,27 +1,146 @@
 # backend/selenium_runner.py
-import os, time
-from typing import Dict, List, Tuple
-from selenium import webdriver
+import json, queue, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
 from selenium.webdriver.common.by import By
-from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from artifacts import save_bytes
+from exec_store import update_execution
+from metrics import RUNNER_PHASE
+from settings import settings
+import page_perf
+import webdriver_pool
+
+SELENIUM_REMOTE_URL = settings.SELENIUM_REMOTE_URL
 
-SELENIUM_REMOTE_URL = os.getenv("SELENIUM_REMOTE_URL", "http://localhost:4444/wd/hub")
+def _ready_condition(spec: str):
+    """
+    Condition d'attente : "load" (readyState complete, défaut), "interactive",
+    "css:<sélecteur>" (élément présent) ou "js:<expression>" (vraie).
+    """
+    spec = (spec or "load").strip()
+    if spec == "load":
+        return lambda d: d.execute_script("return document.readyState") == "complete"
+    if spec == "interactive":
+        return lambda d: d.execute_script("return document.readyState") in ("interactive", "complete")
+    if spec.startswith("css:"):
+        return EC.presence_of_element_located((By.CSS_SELECTOR, spec[4:]))
+    if spec.startswith("js:"):
+        expr = spec[3:]
+        return lambda d: bool(d.execute_script(f"return ({expr});"))
+    raise ValueError(f"Condition d'attente inconnue: {spec!r}")
 
-def run_selenium(params: dict) -> Tuple[bool, str, List[Dict]]:
-    url = params.get("url") or "https://example.org"
-    caps = DesiredCapabilities.CHROME.copy()
-    driver = webdriver.Remote(command_executor=SELENIUM_REMOTE_URL, desired_capabilities=caps)
+def _visit(driver, url: str, params: dict) -> Dict:
+    timeout = float(params.get("wait_timeout_s") or settings.SELENIUM_WAIT_TIMEOUT_S)
+    cold: Dict = {}
+    if params.get("cold_cache"):
+        try:
+            webdriver_pool.cdp(driver, "Network.clearBrowserCache")
+            cold = {"cold_cache": True}
+        except Exception as e:
+            # cache non vidé : la mesure est « chaude », on le signale au lieu de l'ignorer
+            cold = {"cold_cache": False, "cold_cache_error": f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"}
+    t0 = time.time()
+    webdriver_pool.note_visit(driver, url)
     try:
         driver.get(url)
-        time.sleep(1.0)
-        title = driver.title
-        logs = [f"[SELENIUM] Remote {SELENIUM_REMOTE_URL}",
-                f"[SELENIUM] URL: {url}",
-                f"[SELENIUM] Title: {title!r}",
-                "[SELENIUM] SUCCESS"]
-        return True, "\n".join(logs)+"\n", []
+        WebDriverWait(driver, timeout, poll_frequency=0.05).until(_ready_condition(params.get("wait_for")))
+        res = {"url": url, "ok": True, "title": driver.title, "load_s": round(time.time() - t0, 3), "error": None, **cold}
+        RUNNER_PHASE.observe(time.time() - t0, "selenium", "navigate")
+    except Exception as e:
+        RUNNER_PHASE.observe(time.time() - t0, "selenium", "navigate_failed")
+        return {"url": url, "ok": False, "title": None, "load_s": round(time.time() - t0, 3),
+                "error": f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}", **cold}
+    if params.get("perf", True):
+        try:
+            with RUNNER_PHASE.time("selenium", "perf"):
+                res["perf"] = page_perf.summarize(page_perf.collect(driver))
+        except Exception as e:
+            res["perf_error"] = f"{type(e).__name__}: {e}"
+    return res
+
+def _drain(todo: "queue.Queue", params: dict, results: Dict[int, Dict]) -> None:
+    """Un worker = une session du pool, réutilisée pour toutes ses URL."""
+    while not todo.empty():
+        with webdriver_pool.session() as driver:
+            while True:
+                try:
+                    i, url, _rep = todo.get_nowait()
+                except queue.Empty:
+                    return
+                results[i] = _visit(driver, url, params)
+                if not results[i]["ok"] and not webdriver_pool.alive(driver):
+                    break  # session morte : on en reprend une autre
+
+def _fmt(v, unit: str = "ms") -> str:
+    return "-" if v is None else f"{v:g}{unit}"
+
+def run_selenium(params: dict, exec_id: Optional[str] = None) -> Tuple[bool, str, List[Dict]]:
+    urls = list(params.get("urls") or []) or [params.get("url") or "https://example.org"]
+    repeat = max(1, int(params.get("repeat") or 1))
+    todo: "queue.Queue" = queue.Queue()
+    visits = [(u, r) for u in urls for r in range(repeat)]
+    for i, (u, r) in enumerate(visits):
+        todo.put((i, u, r))
+    results: Dict[int, Dict] = {}
+    workers = max(1, min(len(visits), settings.SELENIUM_POOL_SIZE))
+    t0 = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for f in [pool.submit(_drain, todo, params, results) for _ in range(workers)]:
+                f.result()
     except Exception as e:
         return False, f"[SELENIUM] ERREUR: {e}\n", []
-    finally:
-        try: driver.quit()
-        except Exception: pass
+    duration = time.time() - t0
+
+    pages = [results.get(i) or {"url": u, "ok": False, "error": "non visitée"} for i, (u, _r) in enumerate(visits)]
+    ok = all(p["ok"] for p in pages)
+    logs = [f"[SELENIUM] Remote {SELENIUM_REMOTE_URL} (pool {settings.SELENIUM_POOL_SIZE}, workers {workers})"]
+    for p in pages:
+        if p["ok"]:
+            logs.append(f"[SELENIUM] {p['url']} -> {p['title']!r} ({p['load_s']}s)")
+        else:
+            logs.append(f"[SELENIUM] {p['url']} ERREUR: {p['error']}")
+
+    # médianes par URL sur les répétitions réussies
+    per_url: Dict[str, Dict] = {}
+    for u in urls:
+        samples = [p["perf"] for p in pages if p["url"] == u and p.get("perf")]
+        if samples:
+            per_url[u] = page_perf.aggregate(samples)
+            m = per_url[u]["median"]
+            logs.append(f"[PERF] {u} (médiane sur {len(samples)}) TTFB {_fmt(m.get('ttfb_ms'))}, "
+                        f"FCP {_fmt(m.get('fcp_ms'))}, LCP {_fmt(m.get('lcp_ms'))}, CLS {_fmt(m.get('cls'), '')}, "
+                        f"load {_fmt(m.get('load_ms'))}, {_fmt(m.get('transfer_bytes'), ' o')}")
+
+    summary = {"urls": len(urls), "repeat": repeat, "visits": len(pages), "ok": sum(1 for p in pages if p["ok"]),
+               "duration_s": round(duration, 3),
+               "visits_per_s": round(len(pages) / duration, 3) if duration > 0 else None}
+    if params.get("cold_cache"):
+        warm = [p for p in pages if p.get("cold_cache") is False]
+        summary["cold_cache"] = "unavailable" if warm else "ok"
+        summary["cold_cache_failed"] = len(warm)
+        if warm:
+            logs.append(f"[WARN] cold_cache indisponible pour {len(warm)}/{len(pages)} visites "
+                        f"(mesures à cache chaud) : {warm[0].get('cold_cache_error')}")
+    logs.append(f"[SELENIUM] {summary['ok']}/{summary['visits']} OK en {summary['duration_s']}s"
+                f" ({summary['visits_per_s']} visites/s)")
+    logs.append("[SELENIUM] SUCCESS" if ok else "[SELENIUM] FAILURE")
+
+    arts: List[Dict] = []
+    if len(pages) > 1 or per_url:
+        data = json.dumps({**summary, "page_perf": per_url, "pages": pages}, ensure_ascii=False, indent=2).encode("utf-8")
+        art_id = save_bytes(data, suffix=".json", content_type="application/json", compress=True)
+        arts.append({"name": "selenium-results.json", "url": f"/artifact/{art_id}", "artifact_id": art_id,
+                     "size": len(data)})
+    if exec_id:
+        update_execution(exec_id, selenium=summary,
+                         page_perf={u: {"samples": a["samples"], "median": a["median"]} for u, a in per_url.items()} or None)
+        try:
+            page_perf.save(exec_id, per_url)
+        except Exception as e:
+            print("ERROR page_perf.save:", repr(e))
+    return ok, "\n".join(logs) + "\n", arts
@@ -9,6 +9,12 @@ def _bool(s: str, default=False):
 class Settings:
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
     MONGO_DB = os.getenv("MONGO_DB", "llm_tests")
+    # Pools Mongo (client sync des runners + client async des handlers) et délais
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+    MONGO_OP_TIMEOUT_S = float(os.getenv("MONGO_OP_TIMEOUT_S", "5"))  # délai par appel côté handlers async
 
     LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
     OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434/api/generate")
@@ -25,7 +31,114 @@ class Settings:
     CORS_ALLOWED_ORIGINS = [o.strip() for o in os.getenv("CORS_ALLOWED_ORIGINS","").split(",") if o.strip()]
 
     MAX_REQ_BODY_KB = int(os.getenv("MAX_REQ_BODY_KB", "256"))
+    GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))  # réponses plus petites : non compressées
+    GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
     GEN_TIMEOUT = int(os.getenv("GEN_TIMEOUT", "90"))
     MAX_GENERATE_PER_MIN = int(os.getenv("MAX_GENERATE_PER_MIN","60"))
+    MAX_EXECUTE_PER_MIN = int(os.getenv("MAX_EXECUTE_PER_MIN", "30"))
+
+    # Limiteur de débit (GCRA) : memory (par process) | mongo (partagé entre workers)
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    RATE_LIMIT_TRUST_PROXY = _bool(os.getenv("RATE_LIMIT_TRUST_PROXY"), False)  # IP prise dans X-Forwarded-For
+
+    # Logs d'exécution (chunks gzip hors enregistrement)
+    LOG_CHUNK_KB = int(os.getenv("LOG_CHUNK_KB", "256"))
+    LOG_GZIP_LEVEL = int(os.getenv("LOG_GZIP_LEVEL", "6"))
+    LOG_TAIL_CHARS = int(os.getenv("LOG_TAIL_CHARS", "4000"))
+    LOG_RETENTION_MB = int(os.getenv("LOG_RETENTION_MB", "512"))
+    LOG_RETENTION_INTERVAL_S = int(os.getenv("LOG_RETENTION_INTERVAL_S", "60"))
+
+    # Store d'artefacts (sha256, dédupliqué) et quotas du GC
+    ARTIFACT_MAX_MB = int(os.getenv("ARTIFACT_MAX_MB", "2048"))
+    ARTIFACT_MAX_AGE_DAYS = int(os.getenv("ARTIFACT_MAX_AGE_DAYS", "30"))
+    ARTIFACT_GC_INTERVAL_S = int(os.getenv("ARTIFACT_GC_INTERVAL_S", "600"))
+
+    # Plans JMeter existants (params.jmx) : relatifs à ce dossier, vide = refusés
+    JMETER_SCENARIOS_DIR = os.getenv("JMETER_SCENARIOS_DIR", "")
+
+    # Tirs de charge : plafonds des paramètres client, moteur local (trafic depuis l'hôte de l'API)
+    LOAD_MAX_GENERATORS = int(os.getenv("LOAD_MAX_GENERATORS", "4"))
+    LOAD_MAX_WORKERS = int(os.getenv("LOAD_MAX_WORKERS", "64"))
+    LOAD_LOCAL_ENGINE = _bool(os.getenv("LOAD_LOCAL_ENGINE"), False)
+
+    # Tolérances par défaut des comparaisons à la baseline (tirs de charge)
+    LOAD_TOL_LATENCY_PCT = float(os.getenv("LOAD_TOL_LATENCY_PCT", "10"))
+    LOAD_TOL_THROUGHPUT_PCT = float(os.getenv("LOAD_TOL_THROUGHPUT_PCT", "10"))
+    LOAD_TOL_ERROR_RATE_ABS = float(os.getenv("LOAD_TOL_ERROR_RATE_ABS", "0.01"))
+    LOAD_STAT_ALPHA = float(os.getenv("LOAD_STAT_ALPHA", "0.01"))
+
+    # Runner Java : image Maven et dépôt local partagé (volume Docker, vide = désactivé)
+    MAVEN_IMAGE = os.getenv("MAVEN_IMAGE", "maven:3.9-eclipse-temurin-17")
+    MAVEN_REPO_VOLUME = os.getenv("MAVEN_REPO_VOLUME", "ai-tests-m2")
+    MAVEN_OFFLINE = _bool(os.getenv("MAVEN_OFFLINE"), True)
+
+    # Pool de conteneurs Maven persistants (0 = un `docker run` par exécution)
+    MAVEN_WORKERS = int(os.getenv("MAVEN_WORKERS", "2"))
+    MAVEN_WORKER_MAX_RUNS = int(os.getenv("MAVEN_WORKER_MAX_RUNS", "50"))
+    MAVEN_WORKER_RETRY_S = int(os.getenv("MAVEN_WORKER_RETRY_S", "60"))  # pause après un échec de démarrage
+    MAVEN_WORKER_IMAGE = os.getenv("MAVEN_WORKER_IMAGE", "")  # vide = MAVEN_IMAGE
+    MAVEN_WORKER_MVN = os.getenv("MAVEN_WORKER_MVN", "mvn")  # "mvnd" si l'image embarque le Maven Daemon
+    MAVEN_WORKER_OPTS = os.getenv("MAVEN_WORKER_OPTS", "-XX:+TieredCompilation -XX:TieredStopAtLevel=1 -Xshare:auto")
+
+    # Backend d'exécution Java : auto | docker | local | stub (stub seulement si autorisé)
+    EXEC_BACKEND = os.getenv("EXEC_BACKEND", "auto").lower()
+    EXEC_ALLOW_STUB = _bool(os.getenv("EXEC_ALLOW_STUB"), False)
+    EXEC_PROBE_INTERVAL_S = int(os.getenv("EXEC_PROBE_INTERVAL_S", "60"))
+    # Backend local (JDK/Maven de l'hôte) : limites et workspace tmpfs
+    LOCAL_RUNNER_TMPFS = os.getenv("LOCAL_RUNNER_TMPFS", "/dev/shm")
+    LOCAL_RUNNER_MEM_MB = int(os.getenv("LOCAL_RUNNER_MEM_MB", "1024"))
+    LOCAL_RUNNER_CPU_S = int(os.getenv("LOCAL_RUNNER_CPU_S", "600"))
+    LOCAL_RUNNER_NPROC = int(os.getenv("LOCAL_RUNNER_NPROC", "1024"))
+    LOCAL_RUNNER_FSIZE_MB = int(os.getenv("LOCAL_RUNNER_FSIZE_MB", "512"))
+    LOCAL_RUNNER_TIMEOUT_S = int(os.getenv("LOCAL_RUNNER_TIMEOUT_S", "900"))
+    LOCAL_RUNNER_CGROUP = _bool(os.getenv("LOCAL_RUNNER_CGROUP"), True)
+
+    # Runners natifs Python/JS : workers parallèles (pytest-xdist -n / jest --maxWorkers)
+    NATIVE_TEST_WORKERS = os.getenv("NATIVE_TEST_WORKERS", "auto")
+    JEST_CMD = os.getenv("JEST_CMD", "")  # vide = `jest` du PATH ou `npx --no-install jest`
+
+    # Selenium : grille distante et pool de sessions (taille = capacité de la grille)
+    SELENIUM_REMOTE_URL = os.getenv("SELENIUM_REMOTE_URL", "http://localhost:4444/wd/hub")
+    SELENIUM_POOL_SIZE = int(os.getenv("SELENIUM_POOL_SIZE", "1"))
+    SELENIUM_SESSION_MAX_AGE_S = int(os.getenv("SELENIUM_SESSION_MAX_AGE_S", "900"))
+    SELENIUM_SESSION_MAX_USES = int(os.getenv("SELENIUM_SESSION_MAX_USES", "200"))
+    SELENIUM_ACQUIRE_TIMEOUT_S = int(os.getenv("SELENIUM_ACQUIRE_TIMEOUT_S", "300"))
+    SELENIUM_PAGE_TIMEOUT_S = int(os.getenv("SELENIUM_PAGE_TIMEOUT_S", "30"))
+    SELENIUM_WAIT_TIMEOUT_S = float(os.getenv("SELENIUM_WAIT_TIMEOUT_S", "15"))
+    SELENIUM_HEADLESS = _bool(os.getenv("SELENIUM_HEADLESS"), True)
+
+    # Audit : file bornée + écriture par lots (overflow : drop | sample)
+    AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+    AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+    AUDIT_FLUSH_INTERVAL_S = float(os.getenv("AUDIT_FLUSH_INTERVAL_S", "1.0"))
+    AUDIT_OVERFLOW = os.getenv("AUDIT_OVERFLOW", "drop").lower()
+    AUDIT_SAMPLE_EVERY = int(os.getenv("AUDIT_SAMPLE_EVERY", "10"))
+    AUDIT_TTL_DAYS = int(os.getenv("AUDIT_TTL_DAYS", "30"))  # rétention des logs bruts (index TTL)
+
+    # Agrégats de latence (minute / heure) construits à partir d'audit_logs
+    ROLLUP_INTERVAL_S = int(os.getenv("ROLLUP_INTERVAL_S", "60"))
+    ROLLUP_LAG_S = int(os.getenv("ROLLUP_LAG_S", "30"))  # marge pour les lots d'audit pas encore écrits
+    ROLLUP_BACKFILL_H = int(os.getenv("ROLLUP_BACKFILL_H", "24"))
+    ROLLUP_MINUTE_TTL_DAYS = int(os.getenv("ROLLUP_MINUTE_TTL_DAYS", "14"))
+    ROLLUP_HOUR_TTL_DAYS = int(os.getenv("ROLLUP_HOUR_TTL_DAYS", "400"))
+
+    # Corps des test cases dédupliqués (collection blobs)
+    BLOB_MIN_COMPRESS = int(os.getenv("BLOB_MIN_COMPRESS", "256"))
+    BLOB_GZIP_LEVEL = int(os.getenv("BLOB_GZIP_LEVEL", "6"))
+    BLOB_CACHE_MB = int(os.getenv("BLOB_CACHE_MB", "64"))
+
+    # Export / import NDJSON (test cases, exécutions)
+    BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+    BULK_GZIP_LEVEL = int(os.getenv("BULK_GZIP_LEVEL", "6"))
+    IMPORT_MAX_MB = int(os.getenv("IMPORT_MAX_MB", "512"))  # corps d'import (hors MAX_REQ_BODY_KB)
+    IMPORT_MAX_LINE_KB = int(os.getenv("IMPORT_MAX_LINE_KB", "2048"))
+
+    # Mémoïsation des résultats Java (code + test + POM + image) : opt-in
+    JAVA_RESULT_CACHE = _bool(os.getenv("JAVA_RESULT_CACHE"), False)
+
+    # Mode suite : threads du réacteur (-T) et nombre max de cas par invocation
+    MAVEN_SUITE_THREADS = os.getenv("MAVEN_SUITE_THREADS", "1C")
+    MAVEN_SUITE_MAX_CASES = int(os.getenv("MAVEN_SUITE_MAX_CASES", "300"))
 
 settings = Settings()
@@ -0,0 +1,64 @@
+# backend/surefire.py
+"""
+Parsing streaming des rapports surefire (target/surefire-reports/TEST-*.xml).
+iterparse + clear() : la mémoire ne dépend pas de la taille de system-out.
+"""
+from __future__ import annotations
+import os
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_MAX_MSG = 2000
+
+def _status_of(case: ET.Element) -> Tuple[str, Optional[str], Optional[str]]:
+    for tag, status in (("failure", "failed"), ("error", "error"), ("skipped", "skipped")):
+        el = case.find(tag)
+        if el is not None:
+            msg = el.get("message")
+            if not msg and el.text:
+                msg = el.text.strip().split("\n", 1)[0]
+            return status, (msg[:_MAX_MSG] if msg else None), el.get("type")
+    return "passed", None, None
+
+def iter_report(path: str) -> Iterator[Dict]:
+    """Itère sur les <testcase> d'un rapport XML surefire."""
+    for event, el in ET.iterparse(path, events=("end",)):
+        if el.tag != "testcase":
+            # system-out/err des suites peuvent être énormes
+            if el.tag in ("system-out", "system-err"):
+                el.clear()
+            continue
+        status, message, err_type = _status_of(el)
+        try:
+            duration = float(el.get("time") or 0)
+        except ValueError:
+            duration = 0.0
+        yield {
+            "class": el.get("classname") or "",
+            "name": el.get("name") or "",
+            "status": status,
+            "duration_s": duration,
+            "message": message,
+            "error_type": err_type,
+        }
+        el.clear()
+
+def parse_reports_dir(report_dir: str) -> List[Dict]:
+    rows: List[Dict] = []
+    if not os.path.isdir(report_dir):
+        return rows
+    for fn in sorted(os.listdir(report_dir)):
+        if fn.startswith("TEST-") and fn.endswith(".xml"):
+            try:
+                rows.extend(iter_report(os.path.join(report_dir, fn)))
+            except ET.ParseError:
+                continue
+    return rows
+
+def summarize(rows: List[Dict]) -> Dict:
+    out = {"total": len(rows), "passed": 0, "failed": 0, "error": 0, "skipped": 0, "duration_s": 0.0}
+    for r in rows:
+        out[r["status"]] = out.get(r["status"], 0) + 1
+        out["duration_s"] += r["duration_s"]
+    out["duration_s"] = round(out["duration_s"], 3)
+    return out
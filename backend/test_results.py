@@ -0,0 +1,110 @@
+# backend/test_results.py
+"""
+Résultats unitaires (un document par <testcase> surefire) et agrégats.
+Collection indexée : les tableaux de bord n'ont plus à relire les logs.
+"""
+from __future__ import annotations
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING
+
+from database import async_db, db, deadline
+
+results_col = db["test_results"]
+_indexes_ready = False
+
+def ensure_indexes() -> None:
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    results_col.create_index([("exec_id", ASCENDING)])
+    results_col.create_index([("test_case_id", ASCENDING), ("created_at", DESCENDING)])
+    results_col.create_index([("class", ASCENDING), ("name", ASCENDING), ("created_at", DESCENDING)])
+    results_col.create_index([("status", ASCENDING), ("created_at", DESCENDING)])
+    _indexes_ready = True
+
+def save_results(exec_id: str, test_case_id: Optional[str], rows: List[Dict]) -> int:
+    if not rows:
+        return 0
+    ensure_indexes()
+    now = datetime.utcnow()
+    docs = [{**r, "exec_id": exec_id, "test_case_id": test_case_id, "created_at": now} for r in rows]
+    results_col.insert_many(docs, ordered=False)
+    return len(docs)
+
+def _result_out(d: Dict) -> Dict:
+    if isinstance(d.get("created_at"), datetime):
+        d["created_at"] = d["created_at"].isoformat()
+    return d
+
+def list_results(exec_id: str) -> List[Dict]:
+    cur = results_col.find({"exec_id": exec_id}, {"_id": 0}).sort([("class", 1), ("name", 1)])
+    return [_result_out(d) for d in cur]
+
+async def list_results_async(exec_id: str) -> List[Dict]:
+    cur = async_db()["test_results"].find({"exec_id": exec_id}, {"_id": 0}).sort([("class", 1), ("name", 1)])
+    with deadline():
+        return [_result_out(d) async for d in cur]
+
+_BUCKET_FMT = {"hour": "%Y-%m-%dT%H:00", "day": "%Y-%m-%d", "week": "%G-W%V"}
+
+def pass_rate_over_time(since: datetime, bucket: str = "day", test_case_id: Optional[str] = None) -> List[Dict]:
+    match: Dict = {"created_at": {"$gte": since}, "status": {"$ne": "skipped"}}
+    if test_case_id:
+        match["test_case_id"] = test_case_id
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"test_case_id": "$test_case_id",
+                    "bucket": {"$dateToString": {"format": _BUCKET_FMT.get(bucket, _BUCKET_FMT["day"]), "date": "$created_at"}}},
+            "total": {"$sum": 1},
+            "passed": {"$sum": {"$cond": [{"$eq": ["$status", "passed"]}, 1, 0]}},
+        }},
+        {"$sort": {"_id.test_case_id": 1, "_id.bucket": 1}},
+    ]
+    return [{
+        "test_case_id": d["_id"]["test_case_id"],
+        "bucket": d["_id"]["bucket"],
+        "total": d["total"],
+        "passed": d["passed"],
+        "pass_rate": round(d["passed"] / d["total"], 4) if d["total"] else None,
+    } for d in results_col.aggregate(pipeline)]
+
+def slowest_tests(since: datetime, limit: int = 10) -> List[Dict]:
+    pipeline = [
+        {"$match": {"created_at": {"$gte": since}, "status": {"$ne": "skipped"}}},
+        {"$group": {"_id": {"class": "$class", "name": "$name"},
+                    "runs": {"$sum": 1},
+                    "avg_s": {"$avg": "$duration_s"},
+                    "max_s": {"$max": "$duration_s"}}},
+        {"$sort": {"avg_s": -1}},
+        {"$limit": int(limit)},
+    ]
+    return [{"class": d["_id"]["class"], "name": d["_id"]["name"], "runs": d["runs"],
+             "avg_s": round(d["avg_s"] or 0, 3), "max_s": round(d["max_s"] or 0, 3)}
+            for d in results_col.aggregate(pipeline)]
+
+def most_failing(since: datetime, limit: int = 10) -> List[Dict]:
+    pipeline = [
+        {"$match": {"created_at": {"$gte": since}, "test_case_id": {"$ne": None}, "status": {"$ne": "skipped"}}},
+        {"$group": {"_id": "$test_case_id",
+                    "total": {"$sum": 1},
+                    "failures": {"$sum": {"$cond": [{"$in": ["$status", ["failed", "error"]]}, 1, 0]}},
+                    "executions": {"$addToSet": "$exec_id"}}},
+        {"$match": {"failures": {"$gt": 0}}},
+        {"$sort": {"failures": -1, "total": -1}},
+        {"$limit": int(limit)},
+    ]
+    return [{"test_case_id": d["_id"], "total": d["total"], "failures": d["failures"],
+             "fail_rate": round(d["failures"] / d["total"], 4), "executions": len(d["executions"])}
+            for d in results_col.aggregate(pipeline)]
+
+def aggregates(days: int = 30, bucket: str = "day", test_case_id: Optional[str] = None, limit: int = 10) -> Dict:
+    since = datetime.utcnow() - timedelta(days=days)
+    return {
+        "since": since.isoformat(),
+        "pass_rate": pass_rate_over_time(since, bucket, test_case_id),
+        "slowest": slowest_tests(since, limit),
+        "most_failing": most_failing(since, limit),
+    }
@@ -2,6 +2,17 @@
 import os, re, subprocess, tempfile, shutil, time
 from typing import Optional, Tuple, List, Dict
 
+from artifacts import register_dir, save_bytes
+from exec_store import update_execution
+from surefire import parse_reports_dir, summarize
+from test_results import save_results
+from settings import settings
+from metrics import RUNNER_PHASE
+import maven_cache
+import maven_workers
+import run_cache
+import exec_backends
+
 PKG_RE = re.compile(r'^\s*package\s+([\w\.]+)\s*;', re.MULTILINE)
 PUB_CLASS_RE = re.compile(r'^\s*public\s+class\s+([A-Za-z_][A-Za-z0-9_]*)\s*', re.MULTILINE)
 
@@ -84,70 +95,298 @@ public class GeneratedTest {{
 }}"""
     return "GeneratedTest", content
 
-def _docker_available() -> bool:
+def _write_sources(project_dir: str, code_src: str, test_src: str) -> None:
+    """Pose src/main et src/test (package détecté) dans un projet ou module."""
+    pkg = _detect_package(code_src) or _detect_package(test_src)
+    code_cls = _detect_public_class(code_src)
+    code_cls, code_final = _wrap_main_if_needed(code_src, code_cls)
+    test_cls, test_final = _ensure_test_name(test_src, pkg)
+    base_main = os.path.join(project_dir, "src", "main", "java")
+    base_test = os.path.join(project_dir, "src", "test", "java")
+    if pkg:
+        pkg_path = os.path.join(*pkg.split("."))
+        main_dir = os.path.join(base_main, pkg_path)
+        test_dir = os.path.join(base_test, pkg_path)
+        pkg_decl = f"package {pkg};\n\n"
+    else:
+        main_dir, test_dir, pkg_decl = base_main, base_test, ""
+    _safe_write(os.path.join(main_dir, f"{code_cls}.java"), f"{pkg_decl}{code_final}")
+    _safe_write(os.path.join(test_dir, f"{test_cls}.java"), f"{pkg_decl}{test_final}")
+
+def _ingest_surefire(report_dir: str, exec_id: Optional[str], test_case_id: Optional[str]) -> List[Dict]:
+    """Résultats par testcase -> collection test_results + résumé sur l'exécution."""
+    rows = parse_reports_dir(report_dir)
+    if not exec_id:
+        return rows
+    update_execution(exec_id, tests=summarize(rows))
     try:
-        p = subprocess.Popen(["docker","version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        out, err = p.communicate(timeout=10)
-        return p.returncode == 0
-    except Exception:
-        return False
-
-def _run_with_maven_docker(tmpdir: str) -> Tuple[bool, str, List[Dict]]:
-    cmd = [
+        save_results(exec_id, test_case_id, rows)
+    except Exception as e:
+        print("ERROR save_results:", repr(e))
+    return rows
+
+def _run(cmd: List[str]) -> Tuple[int, str, str]:
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    out, err = p.communicate()
+    return p.returncode, out, err
+
+def _mvn_docker_cmd(tmpdir: str, flags: List[str]) -> List[str]:
+    return [
         "docker","run","--rm",
         "-v", f"{tmpdir}:/project",
+        *maven_cache.docker_args(),
         "-w", "/project",
-        "maven:3.9-eclipse-temurin-17",
-        "mvn","-B","test","-DfailIfNoTests=false"
+        settings.MAVEN_IMAGE,
+        "mvn","-B",*flags,"test","-DfailIfNoTests=false"
     ]
-    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    out, err = p.communicate()
-    rc = p.returncode
+
+def _exec_maven(tmpdir: str, offline_flags: List[str], extra: Optional[List[str]] = None,
+                backend: str = "docker") -> Tuple[int, str, str, str]:
+    """Local : Maven de l'hôte sous limites. Docker : worker chaud du pool si possible, sinon conteneur jetable."""
+    args = [*offline_flags, *(extra or []), "test", "-DfailIfNoTests=false"]
+    if backend == "local":
+        return (*exec_backends.run_local(["mvn", "-B", *args], cwd=tmpdir), "local")
+    res = maven_workers.run(tmpdir, args)
+    if res is not None:
+        return (*res, "pool")
+    return (*_run(_mvn_docker_cmd(tmpdir, [*offline_flags, *(extra or [])])), "docker")
+
+def _offline_flags(backend: str) -> List[str]:
+    """Dépôt partagé (docker uniquement) : seed en arrière-plan si absent ou si le POM a changé."""
+    if backend != "docker":
+        return []
+    pom = _pom_xml()
+    maven_cache.ensure_seeded_async(pom, _run)
+    return maven_cache.mvn_flags(pom)
+
+def _run_maven(tmpdir: str, exec_id: Optional[str] = None, test_case_id: Optional[str] = None,
+               backend: str = "docker") -> Tuple[bool, str, List[Dict], List[Dict], bool]:
+    """(ok, logs, artefacts, lignes surefire, résultat mémoïsable)."""
+    flags = _offline_flags(backend)
+    t0 = time.time()
+    rc, out, err, runner = _exec_maven(tmpdir, flags, backend=backend)
     logs = (out or "") + ("\n--- STDERR ---\n" + err if err else "")
-    arts: List[Dict] = []
+    if flags and rc != 0 and maven_cache.looks_like_offline_miss(logs):
+        # volume purgé entre-temps : on repasse en ligne et on re-seed
+        maven_cache.invalidate("artefact manquant en mode hors-ligne")
+        logs += "\n[INFO] Cache Maven incomplet → relance en ligne\n"
+        flags = []
+        t0 = time.time()
+        rc, out, err, runner = _exec_maven(tmpdir, flags, backend=backend)
+        logs += (out or "") + ("\n--- STDERR ---\n" + err if err else "")
+    duration = time.time() - t0
+    RUNNER_PHASE.observe(duration, "maven", "execute")
+    mode = "warm" if flags else "cold"
+    if backend == "docker":
+        maven_cache.record_run(mode, duration)
+    logs += f"\n[INFO] Maven {mode} ({'hors-ligne' if flags else 'en ligne'}, {runner}) : {duration:.1f}s\n"
+    if exec_id:
+        update_execution(exec_id, maven={"mode": mode, "offline": bool(flags), "runner": runner,
+                                         "duration_s": round(duration, 3)})
+    # ingestion dans le store AVANT que run_java_maven ne supprime tmpdir
     surefire = os.path.join(tmpdir, "target", "surefire-reports")
-    if os.path.isdir(surefire):
-        for name in os.listdir(surefire):
-            f = os.path.join(surefire, name)
-            size = os.path.getsize(f) if os.path.isfile(f) else None
-            arts.append({"name": name, "url": None, "size": size})
-    return (rc == 0), (logs or "[INFO] mvn test sans sortie"), arts
+    with RUNNER_PHASE.time("maven", "ingest"):
+        rows = _ingest_surefire(surefire, exec_id, test_case_id)
+        arts: List[Dict] = register_dir(surefire)
+    # rc 0/1 = verdict Maven ; le reste (125 docker, 124 timeout, signal...) est un incident d'infra
+    return (rc == 0), (logs or "[INFO] mvn test sans sortie"), arts, rows, rc in (0, 1)
+
+def maven_cache_stats() -> Dict:
+    return maven_cache.stats(_pom_xml())
+
+def seed_maven_cache(force: bool = True) -> bool:
+    return maven_cache.ensure_seeded_async(_pom_xml(), _run, force=force)
+
+def maven_workers_stats() -> Dict:
+    return maven_workers.stats()
+
+def _no_backend_result() -> Tuple[bool, str, List[Dict]]:
+    caps = exec_backends.capabilities()
+    msg = (f"[ERROR] Aucun backend d'exécution disponible (EXEC_BACKEND={settings.EXEC_BACKEND}) : "
+           f"docker={caps.get('docker')}, mvn={caps.get('maven')}, java={caps.get('java')}.\n"
+           "[ERROR] Installez Docker ou un JDK + Maven sur l'hôte (EXEC_ALLOW_STUB=true pour une exécution simulée).\n")
+    return False, msg, []
 
 def _run_stub(code_src: str, test_src: str) -> Tuple[bool, str, List[Dict]]:
     logs = [
-        "[INFO] Docker indisponible → exécution simulée.",
+        "[WARN] Backend 'stub' → exécution SIMULÉE, aucun test n'a réellement tourné.",
         f"[INFO] Code source: {len(code_src or '')} caractères",
         f"[INFO] Test généré: {len(test_src or '')} caractères",
         "[INFO] Compilation simulée OK",
         "[INFO] Tests simulés OK"
     ]
     full = "\n".join(logs)+"\n"
-    return True, full, [{"name":"surefire-report.txt","url":None,"size":len(full)}]
+    art_id = save_bytes(full.encode("utf-8"), suffix=".txt")
+    return True, full, [{"name":"surefire-report.txt","url":f"/artifact/{art_id}","artifact_id":art_id,"size":len(full)}]
 
-def run_java_maven(code_src: str, test_src: str) -> Tuple[bool, str, List[Dict]]:
-    pkg = _detect_package(code_src) or _detect_package(test_src)
-    code_cls = _detect_public_class(code_src)
-    code_cls, code_final = _wrap_main_if_needed(code_src, code_cls)
-    test_cls, test_final = _ensure_test_name(test_src, pkg)
+def _replay_cached(hit: Dict, exec_id: Optional[str], test_case_id: Optional[str]) -> Tuple[bool, str, List[Dict]]:
+    created = hit.get("created_at")
+    if exec_id:
+        update_execution(exec_id, cached=True, tests=hit.get("tests"), cache={
+            "key": hit["key"],
+            "source_exec_id": hit.get("source_exec_id"),
+            "created_at": created.isoformat() + "Z" if hasattr(created, "isoformat") else created,
+        })
+        try:
+            save_results(exec_id, test_case_id, [dict(r) for r in hit.get("rows") or []])
+        except Exception as e:
+            print("ERROR save_results:", repr(e))
+    head = f"[INFO] Résultat mémoïsé (exécution source {hit.get('source_exec_id') or '?'}) — force=true pour relancer\n"
+    return bool(hit.get("ok")), head + (hit.get("logs") or ""), list(hit.get("artifacts") or [])
 
-    tmpdir = tempfile.mkdtemp(prefix="java-test-")
+def run_java_maven(code_src: str, test_src: str, exec_id: Optional[str] = None, test_case_id: Optional[str] = None,
+                   use_cache: Optional[bool] = None, force: bool = False) -> Tuple[bool, str, List[Dict]]:
+    """
+    use_cache : None = réglage JAVA_RESULT_CACHE ; force : ignore le résultat mémoïsé
+    (le nouveau résultat remplace l'entrée).
+    """
+    backend = exec_backends.select()
+    if exec_id:
+        update_execution(exec_id, backend=backend)
+    if backend is None:
+        return _no_backend_result()
+    if backend == "stub":
+        return _run_stub(code_src, test_src)
+
+    key = None
+    if run_cache.enabled(use_cache):
+        try:
+            with RUNNER_PHASE.time("maven", "cache_lookup"):
+                key = run_cache.make_key(code_src, test_src, _pom_xml(), backend)
+                hit = run_cache.lookup(key) if key and not force else None
+        except Exception as e:
+            print("ERROR run_cache:", repr(e))
+            key, hit = None, None
+        if hit:
+            return _replay_cached(hit, exec_id, test_case_id)
+        if exec_id and key:
+            update_execution(exec_id, cached=False)
+
+    t0 = time.perf_counter()
+    tmpdir = tempfile.mkdtemp(prefix="java-test-", dir=exec_backends.workspace_root() if backend == "local" else None)
     try:
         _safe_write(os.path.join(tmpdir, "pom.xml"), _pom_xml())
-        base_main = os.path.join(tmpdir, "src", "main", "java")
-        base_test = os.path.join(tmpdir, "src", "test", "java")
-        if pkg:
-            pkg_path = os.path.join(*pkg.split("."))
-            main_dir = os.path.join(base_main, pkg_path)
-            test_dir = os.path.join(base_test, pkg_path)
-            pkg_decl = f"package {pkg};\n\n"
-        else:
-            main_dir, test_dir, pkg_decl = base_main, base_test, ""
-        _safe_write(os.path.join(main_dir, f"{code_cls}.java"), f"{pkg_decl}{code_final}")
-        _safe_write(os.path.join(test_dir, f"{test_cls}.java"), f"{pkg_decl}{test_final}")
-
-        if _docker_available():
-            return _run_with_maven_docker(tmpdir)
-        return _run_stub(code_src, test_src)
+        _write_sources(tmpdir, code_src, test_src)
+        RUNNER_PHASE.observe(time.perf_counter() - t0, "maven", "prepare")
+
+        ok, logs, arts, rows, cacheable = _run_maven(tmpdir, exec_id, test_case_id, backend)
+        if key and cacheable:
+            try:
+                run_cache.store(key, ok, logs, arts, rows, summarize(rows), exec_id, backend)
+            except Exception as e:
+                print("ERROR run_cache:", repr(e))
+        return ok, logs, arts
     finally:
         # commente cette ligne si tu veux inspecter le contenu
         shutil.rmtree(tmpdir, ignore_errors=True)
+
+# ============================
+# Mode suite : N test cases, un seul `mvn test`
+# ============================
+# Chaque test case devient un module du réacteur (classpath propre : deux cas
+# qui déclarent la même classe ne se gênent pas). -fae : un module qui ne
+# compile pas n'empêche pas les autres de tourner ; -T : modules en parallèle.
+
+_REACTOR_RE = re.compile(r"^\[\w+\]\s+(case-\d{3,})(?:\s+\S+)?\s+\.+\s+(SUCCESS|FAILURE|SKIPPED)\b", re.MULTILINE)
+
+def _module_name(i: int) -> str:
+    return f"case-{i:03d}"
+
+def _suite_pom(modules: List[str]) -> str:
+    head = "<artifactId>temp-project</artifactId>\n  <version>1.0.0</version>"
+    mods = "".join(f"    <module>{m}</module>\n" for m in modules)
+    return _pom_xml().replace(head, f"{head}\n  <packaging>pom</packaging>\n  <modules>\n{mods}  </modules>", 1)
+
+def _module_pom(name: str) -> str:
+    return f"""<project xmlns="http://maven.apache.org/POM/4.0.0"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    xsi:schemaLocation="http://maven.apache.org/POM/4.0.0
+                        https://maven.apache.org/xsd/maven-4.0.0.xsd">
+  <modelVersion>4.0.0</modelVersion>
+  <parent>
+    <groupId>ai.test.automation</groupId>
+    <artifactId>temp-project</artifactId>
+    <version>1.0.0</version>
+  </parent>
+  <artifactId>{name}</artifactId>
+  <name>{name}</name>
+</project>"""
+
+def _module_logs(name: str, full: str, report_dir: str) -> str:
+    """Extrait du log du réacteur les lignes du module + les résumés surefire."""
+    pat = re.compile(rf"(?<![\w-]){re.escape(name)}(?![\w-])")
+    lines = [l for l in full.splitlines() if pat.search(l)]
+    if os.path.isdir(report_dir):
+        for fn in sorted(os.listdir(report_dir)):
+            if fn.endswith(".txt"):
+                with open(os.path.join(report_dir, fn), encoding="utf-8", errors="replace") as f:
+                    lines.append(f.read().rstrip())
+    return "\n".join(lines)
+
+def run_java_suite(cases: List[Dict], suite_id: Optional[str] = None) -> Tuple[bool, str, Dict[str, Tuple[bool, str, List[Dict]]]]:
+    """
+    cases : [{exec_id, test_case_id, code, test}] (sources déjà nettoyées).
+    Renvoie (ok global, log complet, {exec_id: (ok, logs, artefacts)}).
+    """
+    backend = exec_backends.select()
+    for c in cases:
+        update_execution(c["exec_id"], backend=backend)
+    if suite_id:
+        update_execution(suite_id, backend=backend)
+    if backend is None:
+        res = _no_backend_result()
+        return False, res[1], {c["exec_id"]: res for c in cases}
+    if backend == "stub":
+        per = {c["exec_id"]: _run_stub(c["code"], c["test"]) for c in cases}
+        return all(r[0] for r in per.values()), "[WARN] Backend 'stub' → suite simulée.\n", per
+
+    modules = [_module_name(i) for i in range(len(cases))]
+    t_prep = time.perf_counter()
+    tmpdir = tempfile.mkdtemp(prefix="java-suite-", dir=exec_backends.workspace_root() if backend == "local" else None)
+    try:
+        _safe_write(os.path.join(tmpdir, "pom.xml"), _suite_pom(modules))
+        for m, c in zip(modules, cases):
+            mdir = os.path.join(tmpdir, m)
+            _safe_write(os.path.join(mdir, "pom.xml"), _module_pom(m))
+            _write_sources(mdir, c["code"], c["test"])
+        RUNNER_PHASE.observe(time.perf_counter() - t_prep, "maven-suite", "prepare")
+
+        flags = _offline_flags(backend)
+        extra = ["-fae", "-T", settings.MAVEN_SUITE_THREADS]
+        t0 = time.time()
+        rc, out, err, runner = _exec_maven(tmpdir, flags, extra, backend)
+        logs = (out or "") + ("\n--- STDERR ---\n" + err if err else "")
+        if flags and rc != 0 and maven_cache.looks_like_offline_miss(logs):
+            maven_cache.invalidate("artefact manquant en mode hors-ligne")
+            logs += "\n[INFO] Cache Maven incomplet → relance en ligne\n"
+            flags = []
+            t0 = time.time()
+            rc, out, err, runner = _exec_maven(tmpdir, flags, extra, backend)
+            logs += (out or "") + ("\n--- STDERR ---\n" + err if err else "")
+        duration = time.time() - t0
+        RUNNER_PHASE.observe(duration, "maven-suite", "execute")
+        logs += f"\n[INFO] Suite de {len(cases)} cas ({runner}, -T {settings.MAVEN_SUITE_THREADS}) : {duration:.1f}s\n"
+        if suite_id:
+            update_execution(suite_id, maven={"mode": "warm" if flags else "cold", "offline": bool(flags),
+                                              "runner": runner, "duration_s": round(duration, 3)})
+
+        t_ingest = time.perf_counter()
+        statuses = dict(_REACTOR_RE.findall(logs))
+        per: Dict[str, Tuple[bool, str, List[Dict]]] = {}
+        for m, c in zip(modules, cases):
+            report_dir = os.path.join(tmpdir, m, "target", "surefire-reports")
+            rows = _ingest_surefire(report_dir, c["exec_id"], c.get("test_case_id"))
+            st = statuses.get(m)
+            if st:
+                ok = st == "SUCCESS"
+            else:
+                # résumé du réacteur absent (build interrompu) : on s'en tient aux rapports
+                ok = bool(rows) and all(r["status"] in ("passed", "skipped") for r in rows)
+            head = f"[INFO] Exécution groupée{f' (suite {suite_id})' if suite_id else ''} : module {m} → {st or 'inconnu'}\n"
+            if suite_id:
+                head += f"[INFO] Log complet du réacteur : /executions/{suite_id}/logs\n"
+            per[c["exec_id"]] = (ok, head + _module_logs(m, logs, report_dir) + "\n", register_dir(report_dir))
+        RUNNER_PHASE.observe(time.perf_counter() - t_ingest, "maven-suite", "ingest")
+        return (rc == 0), logs, per
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
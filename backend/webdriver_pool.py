@@ -0,0 +1,167 @@
+# backend/webdriver_pool.py
+"""
+Pool de sessions WebDriver réutilisées entre exécutions.
+
+- plafond de concurrence = capacité de la grille (SELENIUM_POOL_SIZE, cf.
+  SE_NODE_MAX_SESSIONS dans docker-compose.yml) ;
+- entre deux utilisations : cookies (CDP, tous domaines), stockage des origines
+  visitées (Storage.clearDataForOrigin), puis about:blank ;
+- contrôle de santé à la prise, recyclage après SELENIUM_SESSION_MAX_AGE_S
+  ou SELENIUM_SESSION_MAX_USES utilisations, ou si la session est cassée.
+"""
+from __future__ import annotations
+import threading, time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set
+from urllib.parse import urlsplit
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+
+from metrics import RUNNER_PHASE
+from settings import settings
+
+class _Session:
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.time()
+        self.uses = 0
+        self.origins: Set[str] = set()
+
+    def expired(self) -> bool:
+        return (time.time() - self.created_at > settings.SELENIUM_SESSION_MAX_AGE_S
+                or self.uses >= settings.SELENIUM_SESSION_MAX_USES)
+
+    def healthy(self) -> bool:
+        return alive(self.driver)
+
+    def quit(self) -> None:
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+
+_idle: List[_Session] = []
+_LOCK = threading.Lock()
+_slots = threading.BoundedSemaphore(max(1, settings.SELENIUM_POOL_SIZE))
+_busy: Dict[int, _Session] = {}  # id(driver) -> session prêtée
+_stats = {"created": 0, "reused": 0, "recycled": 0, "broken": 0, "reset_failed": 0}
+
+def alive(driver) -> bool:
+    try:
+        return driver.execute_script("return 1") == 1
+    except Exception:
+        return False
+
+def _options() -> ChromeOptions:
+    opts = ChromeOptions()
+    if settings.SELENIUM_HEADLESS:
+        opts.add_argument("--headless=new")
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
+    return opts
+
+def _create() -> _Session:
+    driver = webdriver.Remote(command_executor=settings.SELENIUM_REMOTE_URL, options=_options())
+    driver.set_page_load_timeout(settings.SELENIUM_PAGE_TIMEOUT_S)
+    _stats["created"] += 1
+    return _Session(driver)
+
+def cdp(driver, cmd: str, params: Optional[Dict] = None):
+    """Commande Chrome DevTools via la grille (webdriver.Remote n'a pas execute_cdp_cmd)."""
+    return driver.execute("executeCdpCommand", {"cmd": cmd, "params": params or {}})["value"]
+
+def _origin(url: str) -> Optional[str]:
+    parts = urlsplit(url or "")
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+def note_visit(driver, url: str) -> None:
+    """Retient l'origine d'une URL visitée : son stockage sera effacé au retour dans le pool."""
+    origin = _origin(url)
+    s = _busy.get(id(driver))
+    if origin and s is not None:
+        s.origins.add(origin)
+
+def _reset(s: _Session) -> bool:
+    """Remet la session à zéro pour l'exécution suivante ; False si elle est inutilisable."""
+    d = s.driver
+    try:
+        origins = set(s.origins)
+        current = _origin(d.current_url)
+        if current:
+            origins.add(current)  # redirections / navigation depuis la page
+        # Chrome : tous les cookies, pas seulement ceux du domaine courant
+        cdp(d, "Network.clearBrowserCookies")
+        for origin in sorted(origins):
+            cdp(d, "Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        s.origins.clear()
+        d.get("about:blank")
+        return True
+    except Exception as e:
+        _stats["reset_failed"] += 1
+        print("ERROR webdriver_pool reset:", repr(e))
+        return False
+
+def _take() -> _Session:
+    while True:
+        with _LOCK:
+            s = _idle.pop() if _idle else None
+        if s is None:
+            return _create()
+        if s.expired():
+            _stats["recycled"] += 1
+            s.quit()
+            continue
+        if not s.healthy():
+            _stats["broken"] += 1
+            s.quit()
+            continue
+        _stats["reused"] += 1
+        return s
+
+@contextmanager
+def session(timeout: Optional[float] = None) -> Iterator:
+    """Prête un driver ; bloque tant que la grille est pleine."""
+    t0 = time.perf_counter()
+    if not _slots.acquire(timeout=timeout or settings.SELENIUM_ACQUIRE_TIMEOUT_S):
+        raise TimeoutError("Aucune session WebDriver disponible (grille saturée)")
+    s: Optional[_Session] = None
+    broken = False
+    try:
+        s = _take()
+        _busy[id(s.driver)] = s
+        RUNNER_PHASE.observe(time.perf_counter() - t0, "selenium", "acquire")
+        yield s.driver
+    except Exception:
+        broken = s is not None and not s.healthy()
+        raise
+    finally:
+        if s is not None:
+            _busy.pop(id(s.driver), None)
+            s.uses += 1
+            with RUNNER_PHASE.time("selenium", "reset"):
+                reset = not broken and _reset(s)
+            if not reset:
+                _stats["broken"] += 1
+                s.quit()
+            else:
+                with _LOCK:
+                    _idle.append(s)
+        _slots.release()
+
+def shutdown() -> None:
+    with _LOCK:
+        sessions = list(_idle)
+        _idle.clear()
+    for s in sessions:
+        s.quit()
+
+def stats() -> Dict:
+    return {
+        "size": settings.SELENIUM_POOL_SIZE,
+        "idle": len(_idle),
+        "remote": settings.SELENIUM_REMOTE_URL,
+        **_stats,
+    }
@@ -53,11 +53,15 @@ export default function ExecutionDetail() {
           <p className="text-sm opacity-70">Aucun artefact.</p>
         ) : (
           <ul className="list-disc pl-5 text-sm">
-            {item.artifacts.map((id) => (
-              <li key={id}>
-                <a className="underline" href={`${base}/artifact/${id}`} target="_blank" rel="noreferrer">
-                  {id}
-                </a>
+            {item.artifacts.map((a, idx) => (
+              <li key={a.artifact_id || a.name || idx}>
+                {a.url ? (
+                  <a className="underline" href={`${base}${a.url}`} target="_blank" rel="noreferrer">
+                    {a.name || a.artifact_id}
+                  </a>
+                ) : (
+                  <span>{a.name || `artifact-${idx}`}</span>
+                )}
               </li>
             ))}
           </ul>